@@ -1,5 +1,7 @@
 from flask import Flask, request, jsonify, render_template, redirect, url_for, session, flash, send_file
-from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity
+from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import PyJWTError
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 import os
@@ -7,12 +9,24 @@ import json
 import logging
 from datetime import timedelta
 import uuid
+import threading
+from bson import ObjectId
 from config import Config
-from database import Database
+from database import Database, CONTENT_SCHEMA_VERSION
 from services.content_processor import ContentProcessor
 from services.ai_service import AIService
+from services.ai_cache import AICache
 from services.pdf_generator import PDFGenerator
+from services.pdf_cache import PDFCache
+from services.pdf_render_service import PDFRenderService
+from services.job_queue import JobQueue
+from services.single_flight import SingleFlight
+from services.transcription_worker import get_transcription_worker
+from services.graph_layout import layout_graph, LAYOUT_VERSION
+from services.chunking import is_complete
 from utils.validators import validate_upload, validate_content_request
+from utils.study_text import extract_text_from_content, build_study_text
+from utils.graph_codec import encode_graph, COLUMNAR_MIMETYPE
 from functools import wraps
 
 app = Flask(__name__)
@@ -41,56 +55,22 @@ app.jinja_env.filters['nl2br'] = nl2br
 # Initialize services
 db = Database()
 content_processor = ContentProcessor()
-ai_service = AIService()
-pdf_generator = PDFGenerator()
+ai_service = AIService(cache=AICache(
+    collection_factory=lambda: db.ai_cache_collection,
+    max_entries=Config.AI_CACHE_MAX_ENTRIES,
+    ttl_seconds=Config.AI_CACHE_TTL_SECONDS
+))
+pdf_renderer = PDFRenderService()
+artifact_flight = SingleFlight()
+pdf_cache = PDFCache(Config.PDF_CACHE_DIR, max_bytes=Config.PDF_CACHE_MAX_BYTES)
+pdf_renderer_warming = threading.Lock()
 
-def extract_text_from_content(content_data):
-    """Extract raw text from content data (handles both structured and raw text)"""
-    if isinstance(content_data, str):
-        try:
-            # Try to parse as JSON first
-            parsed_content = json.loads(content_data)
-            if isinstance(parsed_content, dict):
-                # If it's structured content, extract text from various sections
-                text_parts = []
-                
-                # Add executive summary
-                if 'executive_summary' in parsed_content:
-                    text_parts.append(parsed_content['executive_summary'])
-                
-                # Add introduction
-                if 'introduction' in parsed_content:
-                    text_parts.append(parsed_content['introduction'])
-                
-                # Add main sections content
-                if 'main_sections' in parsed_content:
-                    for section in parsed_content['main_sections']:
-                        if 'content' in section:
-                            text_parts.append(section['content'])
-                
-                # Add conclusion
-                if 'conclusion' in parsed_content:
-                    text_parts.append(parsed_content['conclusion'])
-                
-                # If we extracted parts, join them
-                if text_parts:
-                    return ' '.join(text_parts)
-                
-                # If it's just a simple structure with 'content' field
-                if 'content' in parsed_content:
-                    return parsed_content['content']
-                
-                # If none of the above, return the JSON as string
-                return content_data
-            else:
-                # If parsed JSON is not a dict, return original string
-                return content_data
-        except json.JSONDecodeError:
-            # If it's not JSON, return as is
-            return content_data
-    else:
-        # If it's already not a string, convert to string
-        return str(content_data)
+@app.before_request
+def warm_pdf_renderer():
+    """Start render processes in the background on the first request (not at import, which CLI scripts also pay for)"""
+    # Never released: only the first request to take it starts the warm-up
+    if pdf_renderer_warming.acquire(blocking=False):
+        threading.Thread(target=pdf_renderer.warm, name='pdf-render-warmup', daemon=True).start()
 
 def generate_graph_data(content):
     """Generate hierarchical graph data from content using AI"""
@@ -267,17 +247,11 @@ def generate_graph_data(content):
 def generate_legacy_graph_data(content):
     """Generate hierarchical graph data from content"""
     try:
-        # Parse content data
-        content_data = content['content']
-        
-        if isinstance(content_data, str):
-            try:
-                structured_data = json.loads(content_data)
-            except json.JSONDecodeError:
-                # Create simple graph from text content
-                return create_simple_graph_from_text(content_data, content.get('title', 'Content'))
-        else:
-            structured_data = content_data
+        structured_data = Database.decode_content(content['content'], content.get('schema_version'))
+        
+        if isinstance(structured_data, str):
+            # Create simple graph from text content
+            return create_simple_graph_from_text(structured_data, content.get('title', 'Content'))
         
         # Extract nodes and links from structured data
         nodes = []
@@ -431,7 +405,56 @@ def generate_legacy_graph_data(content):
         
     except Exception as e:
         # Fallback to simple graph
-        return create_simple_graph_from_text(extract_text_from_content(content['content']), content.get('title', 'Content'))
+        return create_simple_graph_from_text(extract_text_from_content(content['content'], content.get('schema_version')), content.get('title', 'Content'))
+
+# Artifact kinds generated through AIService's prompt cache (graphs are built without it)
+PROMPT_CACHED_KINDS = ('summary', 'notes', 'quiz')
+
+def get_or_generate_artifact(content, kind, language, params, generate, refresh=False):
+    """Serve a stored generation for content, generating and storing it when missing, stale or refresh is requested
+    
+    content must carry 'study_text' (see Database.get_study_text); an artifact built from
+    different study text is stale and regenerated.
+    """
+    content_id = str(content['_id'])
+    source_hash = content['study_text']['hash']
+    
+    if refresh:
+        # Explicit regeneration must not be answered from the prompt cache either; other kinds stay cached
+        if kind in PROMPT_CACHED_KINDS:
+            ai_service.invalidate_generation(kind, content['study_text']['text'], language, params)
+    else:
+        artifact = db.get_artifact(content_id, kind, language, params, source_hash)
+        if artifact:
+            return artifact['payload']
+    
+    def generate_and_store():
+        payload = generate()
+        if is_complete(payload):
+            db.save_artifact(content_id, kind, language, params, ai_service.model_name, source_hash, payload)
+        return payload
+    
+    # Concurrent requests for the same missing artifact generate and store it once
+    flight_key = json.dumps([content_id, kind, language, params, source_hash], sort_keys=True, default=str)
+    return artifact_flight.do(flight_key, generate_and_store)
+
+def wants_refresh():
+    """Whether the request explicitly asks to regenerate instead of serving the stored artifact"""
+    data = request.get_json(silent=True) if request.is_json else None
+    value = (data or {}).get('refresh', request.args.get('refresh', ''))
+    return str(value).lower() in ('1', 'true', 'yes')
+
+def redirect_without_refresh():
+    """Redirect to the current page without ?refresh, so reloading it serves the stored result"""
+    args = request.args.to_dict()
+    args.pop('refresh', None)
+    return redirect(url_for(request.endpoint, **request.view_args, **args))
+
+def wants_compact_graph():
+    """Whether the client asked for the columnar graph encoding (?format=compact or by Accept header)"""
+    if request.args.get('format') == 'compact':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', COLUMNAR_MIMETYPE]) == COLUMNAR_MIMETYPE
 
 def create_simple_graph_from_text(text, title):
     """Create a simple graph structure from plain text"""
@@ -482,6 +505,161 @@ if not os.path.exists(UPLOAD_FOLDER):
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+def process_upload_job(job, report_progress):
+    """Background job handler: extract text, structure it with AI and store the result"""
+    payload = job['payload']
+    content_type = payload['content_type']
+    content_id = job['content_id']
+    user_id = job['user_id']
+    file_path = payload.get('file_path')
+    
+    try:
+        # Extract text based on content type
+        report_progress('extracting', 10)
+        if content_type == 'text':
+            processed_content = content_processor.process_text(payload['text'])
+        elif content_type == 'video':
+            processed_content = content_processor.process_video(file_path)
+        else:  # pdf
+            processed_content = content_processor.process_pdf(file_path)
+        
+        # Generate structured content using AI
+        report_progress('structuring', 40)
+        structured_content = ai_service.generate_structured_content(
+            processed_content['text'], 
+            content_type=content_type
+        )
+        
+        # Generate title from structured content or use fallback
+        if isinstance(structured_content, dict) and 'title' in structured_content:
+            title = structured_content['title']
+        else:
+            title = ai_service.generate_title(processed_content['text'])
+        
+        # Combine metadata
+        final_metadata = processed_content.get('metadata', {})
+        if isinstance(structured_content, dict) and 'metadata' in structured_content:
+            final_metadata.update(structured_content['metadata'])
+        
+        # Store in database with structured content
+        report_progress('storing', 90)
+        # A partial structure would silently lose text, so fall back to the raw text
+        content_to_store = structured_content if is_complete(structured_content) else processed_content['text']
+        
+        db.update_content(content_id, user_id, {
+            'title': title,
+            'content': content_to_store,
+            'study_text': build_study_text(content_to_store, CONTENT_SCHEMA_VERSION),
+            'schema_version': CONTENT_SCHEMA_VERSION,
+            'metadata': final_metadata,
+            'status': 'ready'
+        })
+        
+        # The content is usable now; build its graph in a job of its own so the upload completes
+        # first and the first graph view is still served from storage
+        if Config.GRAPH_PRECOMPUTE_ON_UPLOAD:
+            job_queue.enqueue(user_id, content_id, 'precompute_graph', {})
+        
+        return {'title': title}
+        
+    except Exception as e:
+        db.update_content(content_id, user_id, {'status': 'failed', 'error': str(e)})
+        raise
+        
+    finally:
+        # Clean up uploaded file after processing
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+
+def lay_out_graph(graph):
+    """Add precomputed node positions so the graph page starts near equilibrium"""
+    return layout_graph(
+        graph,
+        refine_iterations=Config.GRAPH_LAYOUT_ITERATIONS,
+        refine_max_nodes=Config.GRAPH_LAYOUT_REFINE_MAX_NODES
+    )
+
+def get_or_generate_graph(content, user_id, refresh=False):
+    """Stored graph (hierarchy, node/link arrays and layout) for content, generated on first use"""
+    content_id = str(content['_id'])
+    # The full structured document is only read when the graph has to be generated
+    graph = get_or_generate_artifact(
+        content, 'graph', None, {},
+        lambda: lay_out_graph(generate_graph_data(db.get_content(content_id, user_id))),
+        refresh=refresh
+    )
+    
+    if 'error' not in graph and graph.get('layout', {}).get('version') != LAYOUT_VERSION:
+        # Graphs stored without a current layout are laid out once; no AI call is needed
+        lay_out_graph(graph)
+        db.save_artifact(content_id, 'graph', None, {}, ai_service.model_name, content['study_text']['hash'], graph)
+    return graph
+
+def precompute_graph_job(job, report_progress):
+    """Background job handler: generate and store the graph of freshly processed content
+    
+    A failure only fails this job; the first graph view generates the graph instead.
+    """
+    report_progress('graphing', 50)
+    content = db.get_study_text(job['content_id'], job['user_id'])
+    if content:
+        get_or_generate_graph(content, job['user_id'])
+    return {}
+
+JOB_HANDLERS = {
+    'process_upload': process_upload_job,
+    'precompute_graph': precompute_graph_job
+}
+
+def run_job(job, report_progress):
+    """Dispatch a background job to the handler for its type"""
+    return JOB_HANDLERS[job['job_type']](job, report_progress)
+
+job_queue = JobQueue(db, run_job, num_workers=Config.JOB_WORKERS,
+                     heartbeat_interval=Config.JOB_HEARTBEAT_SECONDS, stale_after=Config.JOB_STALE_SECONDS)
+
+@app.before_request
+def start_job_queue():
+    """Start upload workers with the first request, so jobs left by a previous run resume without a new upload"""
+    job_queue.start()
+
+def enqueue_upload(user_id, content_type, file=None, text_content=None):
+    """Persist an upload, create its placeholder content and queue it for processing"""
+    payload = {'content_type': content_type}
+    
+    if file is not None:
+        # Save file so a worker can pick it up
+        filename = secure_filename(file.filename)
+        unique_filename = f"{uuid.uuid4()}_{filename}"
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+        file.save(file_path)
+        payload['file_path'] = file_path
+    else:
+        payload['text'] = text_content
+    
+    content_id = db.store_content(
+        user_id=user_id,
+        title='Processing...',
+        content='',
+        content_type=content_type,
+        status='processing'
+    )
+    
+    job_id = job_queue.enqueue(user_id, content_id, 'process_upload', payload)
+    return content_id, job_id
+
+def get_request_user_id():
+    """Get the current user from the session or, for API clients, the JWT"""
+    if 'user_id' in session:
+        return session['user_id']
+    
+    try:
+        verify_jwt_in_request(optional=True)
+    except (JWTExtendedException, PyJWTError):
+        # A malformed or expired token is the same as no credentials
+        return None
+    return get_jwt_identity()
+
 # Login required decorator for frontend
 def login_required(f):
     @wraps(f)
@@ -581,8 +759,7 @@ def frontend_upload():
         
         if text_content:
             content_type = 'text'
-            # Process text content
-            processed_content = content_processor.process_text(text_content)
+            content_id, job_id = enqueue_upload(session['user_id'], content_type, text_content=text_content)
         elif file:
             filename = secure_filename(file.filename)
             if filename.lower().endswith(('.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv', '.wmv')):
@@ -599,47 +776,8 @@ def frontend_upload():
                 flash(validation_result['error'], 'error')
                 return redirect(url_for('dashboard'))
             
-            # Save and process file
-            unique_filename = f"{uuid.uuid4()}_{filename}"
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-            file.save(file_path)
-            
-            # Process content based on type
-            if content_type == 'video':
-                processed_content = content_processor.process_video(file_path)
-            else:  # pdf
-                processed_content = content_processor.process_pdf(file_path)
-            
-            # Clean up uploaded file after processing
-            os.remove(file_path)
-        
-        # Generate structured content using AI
-        structured_content = ai_service.generate_structured_content(
-            processed_content['text'], 
-            content_type=content_type
-        )
-        
-        # Generate title from structured content or use fallback
-        if isinstance(structured_content, dict) and 'title' in structured_content:
-            title = structured_content['title']
-        else:
-            title = ai_service.generate_title(processed_content['text'])
-        
-        # Combine metadata
-        final_metadata = processed_content.get('metadata', {})
-        if isinstance(structured_content, dict) and 'metadata' in structured_content:
-            final_metadata.update(structured_content['metadata'])
-        
-        # Store in database with structured content
-        content_to_store = structured_content if isinstance(structured_content, dict) and 'error' not in structured_content else processed_content['text']
-        
-        content_id = db.store_content(
-            user_id=session['user_id'],
-            title=title,
-            content=json.dumps(content_to_store) if isinstance(content_to_store, dict) else content_to_store,
-            content_type=content_type,
-            metadata=final_metadata
-        )
+            # Save file and queue it for background processing
+            content_id, job_id = enqueue_upload(session['user_id'], content_type, file=file)
         
         # Redirect to processing page
         return redirect(url_for('processing', content_id=content_id))
@@ -651,8 +789,38 @@ def frontend_upload():
 @app.route('/processing/<content_id>')
 @login_required
 def processing(content_id):
-    """Processing page with loading screen"""
-    return render_template('processing.html', content_id=content_id)
+    """Processing page that polls the background job until content is ready"""
+    job = db.get_latest_job_for_content(content_id, session['user_id'])
+    if not job:
+        return redirect(url_for('content_options', content_id=content_id))
+    
+    return render_template('processing.html', content_id=content_id, job_id=str(job['_id']))
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Get status of a background processing job"""
+    try:
+        user_id = get_request_user_id()
+        if not user_id:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        job = db.get_job(job_id, user_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        return jsonify({
+            'job_id': job_id,
+            'content_id': job['content_id'],
+            'status': job['status'],
+            'stage': job.get('stage'),
+            'progress': job.get('progress', 0),
+            'error': job.get('error'),
+            'created_at': job.get('created_at'),
+            'updated_at': job.get('updated_at')
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/options/<content_id>')
 @login_required
@@ -664,6 +832,9 @@ def content_options(content_id):
         flash('Content not found', 'error')
         return redirect(url_for('dashboard'))
     
+    if content.get('status') == 'processing':
+        return redirect(url_for('processing', content_id=content_id))
+    
     return render_template('content_options.html', content_id=content_id, content=content)
 
 @app.route('/structured/<content_id>')
@@ -675,29 +846,24 @@ def view_structured_content(content_id):
         flash('Content not found', 'error')
         return redirect(url_for('dashboard'))
     
-    # Try to parse structured content
     try:
-        content_data = content['content']
-        if isinstance(content_data, str):
-            try:
-                structured_data = json.loads(content_data)
-            except json.JSONDecodeError:
-                # If it's not JSON, create a basic structure
-                structured_data = {
-                    "title": content['title'],
-                    "executive_summary": content_data[:300] + "..." if len(content_data) > 300 else content_data,
-                    "main_sections": [
-                        {
-                            "section_title": "Content",
-                            "content": content_data,
-                            "key_points": []
-                        }
-                    ],
-                    "content_type": content.get('content_type', 'text')
-                }
-        else:
-            structured_data = content_data
-            
+        structured_data = Database.decode_content(content['content'], content.get('schema_version'))
+        if isinstance(structured_data, str):
+            # If it's plain text, create a basic structure
+            content_data = structured_data
+            structured_data = {
+                "title": content['title'],
+                "executive_summary": content_data[:300] + "..." if len(content_data) > 300 else content_data,
+                "main_sections": [
+                    {
+                        "section_title": "Content",
+                        "content": content_data,
+                        "key_points": []
+                    }
+                ],
+                "content_type": content.get('content_type', 'text')
+            }
+        
         return render_template('structured_content.html', content=content, structured_data=structured_data)
     except Exception as e:
         flash(f'Error loading structured content: {str(e)}', 'error')
@@ -719,13 +885,21 @@ def view_graph_content(content_id):
 def get_graph_data(content_id):
     """API endpoint to get graph data for content"""
     try:
-        content = db.get_content(content_id, session['user_id'])
+        # Only the source hash is needed to validate the stored graph
+        content = db.get_content(content_id, session['user_id'], projection={'study_text.hash': 1})
+        if content and 'study_text' not in content:
+            content = db.get_study_text(content_id, session['user_id'])
         if not content:
             return jsonify({'error': 'Content not found'}), 404
         
-        # Generate graph data from content
-        graph_data = generate_graph_data(content)
-        return jsonify(graph_data)
+        graph_data = get_or_generate_graph(content, session['user_id'], refresh=wants_refresh())
+        if 'error' in graph_data or not wants_compact_graph():
+            response = jsonify(graph_data)
+        else:
+            response = jsonify(encode_graph(graph_data))
+            response.mimetype = COLUMNAR_MIMETYPE
+        response.vary.add('Accept')
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -733,16 +907,22 @@ def get_graph_data(content_id):
 @login_required
 def frontend_summary(content_id):
     """Summary page"""
-    content = db.get_content(content_id, session['user_id'])
+    content = db.get_study_text(content_id, session['user_id'])
     if not content:
         flash('Content not found', 'error')
         return redirect(url_for('dashboard'))
     
     # Generate summary using AI service
     try:
-        # Extract text from structured content
-        content_text = extract_text_from_content(content['content'])
-        summary_data = ai_service.generate_summary(content_text, 'english')
+        # Flattened study text precomputed at ingest
+        content_text = content['study_text']['text']
+        summary_data = get_or_generate_artifact(
+            content, 'summary', 'english', {},
+            lambda: ai_service.generate_summary(content_text, 'english'),
+            refresh=wants_refresh()
+        )
+        if wants_refresh() and is_complete(summary_data):
+            return redirect_without_refresh()
         return render_template('summary.html', content=content, summary=summary_data)
     except Exception as e:
         flash(f'Error generating summary: {str(e)}', 'error')
@@ -752,16 +932,22 @@ def frontend_summary(content_id):
 @login_required
 def frontend_notes(content_id):
     """Notes page"""
-    content = db.get_content(content_id, session['user_id'])
+    content = db.get_study_text(content_id, session['user_id'])
     if not content:
         flash('Content not found', 'error')
         return redirect(url_for('dashboard'))
     
     # Generate notes using AI service
     try:
-        # Extract text from structured content
-        content_text = extract_text_from_content(content['content'])
-        notes_data = ai_service.generate_notes(content_text, 'english')
+        # Flattened study text precomputed at ingest
+        content_text = content['study_text']['text']
+        notes_data = get_or_generate_artifact(
+            content, 'notes', 'english', {},
+            lambda: ai_service.generate_notes(content_text, 'english'),
+            refresh=wants_refresh()
+        )
+        if wants_refresh() and is_complete(notes_data):
+            return redirect_without_refresh()
         return render_template('notes.html', content=content, notes=notes_data)
     except Exception as e:
         flash(f'Error generating notes: {str(e)}', 'error')
@@ -773,16 +959,22 @@ def frontend_quiz(content_id):
     """Quiz page"""
     num_questions = request.args.get('num_questions', 5, type=int)
     
-    content = db.get_content(content_id, session['user_id'])
+    content = db.get_study_text(content_id, session['user_id'])
     if not content:
         flash('Content not found', 'error')
         return redirect(url_for('dashboard'))
     
     # Generate quiz using AI service
     try:
-        # Extract text from structured content
-        content_text = extract_text_from_content(content['content'])
-        quiz_data = ai_service.generate_quiz(content_text, 'english', num_questions)
+        # Flattened study text precomputed at ingest
+        content_text = content['study_text']['text']
+        quiz_data = get_or_generate_artifact(
+            content, 'quiz', 'english', {'num_questions': num_questions},
+            lambda: ai_service.generate_quiz(content_text, 'english', num_questions),
+            refresh=wants_refresh()
+        )
+        if wants_refresh() and is_complete(quiz_data):
+            return redirect_without_refresh()
         return render_template('quiz.html', content=content, quiz=quiz_data)
     except Exception as e:
         flash(f'Error generating quiz: {str(e)}', 'error')
@@ -793,8 +985,12 @@ def frontend_quiz(content_id):
 def my_content():
     """Page showing all user's content"""
     try:
-        user_content = db.get_user_contents(session['user_id'])
-        return render_template('my_content.html', content_list=user_content)
+        user_content, next_cursor = db.get_user_contents_page(
+            session['user_id'],
+            limit=Config.LIST_PAGE_SIZE,
+            after=request.args.get('after')
+        )
+        return render_template('my_content.html', content_list=user_content, next_cursor=next_cursor)
     except Exception as e:
         flash(f'Error loading content: {str(e)}', 'error')
         return redirect(url_for('dashboard'))
@@ -895,7 +1091,7 @@ def upload_content():
             if not content_text:
                 return jsonify({'error': 'Content text is required'}), 400
             
-            processed_content = content_processor.process_text(content_text)
+            content_id, job_id = enqueue_upload(user_id, content_type, text_content=content_text)
             
         elif content_type in ['video', 'pdf']:
             if 'file' not in request.files:
@@ -910,55 +1106,16 @@ def upload_content():
             if not validation_result['valid']:
                 return jsonify({'error': validation_result['error']}), 400
             
-            # Save file
-            filename = secure_filename(file.filename)
-            unique_filename = f"{uuid.uuid4()}_{filename}"
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-            file.save(file_path)
-            
-            # Process content based on type
-            if content_type == 'video':
-                processed_content = content_processor.process_video(file_path)
-            else:  # pdf
-                processed_content = content_processor.process_pdf(file_path)
-            
-            # Clean up uploaded file after processing
-            os.remove(file_path)
-        
-        # Generate structured content using AI
-        structured_content = ai_service.generate_structured_content(
-            processed_content['text'], 
-            content_type=content_type
-        )
-        
-        # Generate title from structured content or use fallback
-        if isinstance(structured_content, dict) and 'title' in structured_content:
-            title = structured_content['title']
-        else:
-            title = ai_service.generate_title(processed_content['text'])
-        
-        # Combine metadata
-        final_metadata = processed_content.get('metadata', {})
-        if isinstance(structured_content, dict) and 'metadata' in structured_content:
-            final_metadata.update(structured_content['metadata'])
-        
-        # Store in database with structured content
-        content_to_store = structured_content if isinstance(structured_content, dict) and 'error' not in structured_content else processed_content['text']
-        
-        # Store in database
-        content_id = db.store_content(
-            user_id=user_id,
-            title=title,
-            content=json.dumps(content_to_store) if isinstance(content_to_store, dict) else content_to_store,
-            content_type=content_type,
-            metadata=final_metadata
-        )
+            # Save file and queue it for background processing
+            content_id, job_id = enqueue_upload(user_id, content_type, file=file)
         
         return jsonify({
-            'message': 'Content uploaded and processed successfully',
+            'message': 'Content uploaded and queued for processing',
             'content_id': content_id,
-            'title': title
-        }), 201
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': url_for('get_job_status', job_id=job_id)
+        }), 202
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -966,13 +1123,36 @@ def upload_content():
 @app.route('/api/list', methods=['GET'])
 @jwt_required()
 def list_content():
-    """Get all content for the authenticated user"""
+    """Get the authenticated user's content, newest first, one page at a time"""
     try:
         user_id = get_jwt_identity()
-        contents = db.get_user_contents(user_id)
+        
+        # ?count=true returns only the total number of items
+        if request.args.get('count', '').lower() in ('1', 'true', 'yes'):
+            return jsonify({'total': db.count_user_contents(user_id)}), 200
+        
+        limit = request.args.get('limit', Config.LIST_PAGE_SIZE, type=int)
+        if limit < 1 or limit > Config.LIST_MAX_PAGE_SIZE:
+            return jsonify({'error': f'Limit must be between 1 and {Config.LIST_MAX_PAGE_SIZE}'}), 400
+        
+        try:
+            contents, next_cursor = db.get_user_contents_page(user_id, limit=limit, after=request.args.get('after'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         return jsonify({
-            'contents': contents
+            'contents': [
+                {
+                    '_id': content['_id'],
+                    'title': content.get('title'),
+                    'content_type': content.get('content_type'),
+                    'status': content.get('status', 'ready'),
+                    'created_at': content.get('created_at'),
+                    'word_count': content.get('metadata', {}).get('word_count')
+                }
+                for content in contents
+            ],
+            'next_cursor': next_cursor
         }), 200
         
     except Exception as e:
@@ -993,15 +1173,19 @@ def generate_summary():
             return jsonify({'error': 'Content ID is required'}), 400
         
         # Get content from database
-        content = db.get_content(content_id, user_id)
+        content = db.get_study_text(content_id, user_id)
         if not content:
             return jsonify({'error': 'Content not found'}), 404
         
-        # Extract text from structured content
-        content_text = extract_text_from_content(content['content'])
+        # Flattened study text precomputed at ingest
+        content_text = content['study_text']['text']
         
         # Generate summary using AI
-        summary = ai_service.generate_summary(content_text, language)
+        summary = get_or_generate_artifact(
+            content, 'summary', language, {},
+            lambda: ai_service.generate_summary(content_text, language),
+            refresh=wants_refresh()
+        )
         
         return jsonify({
             'content_id': content_id,
@@ -1032,15 +1216,19 @@ def generate_quiz():
             return jsonify({'error': 'Number of questions must be between 1 and 50'}), 400
         
         # Get content from database
-        content = db.get_content(content_id, user_id)
+        content = db.get_study_text(content_id, user_id)
         if not content:
             return jsonify({'error': 'Content not found'}), 404
         
-        # Extract text from structured content
-        content_text = extract_text_from_content(content['content'])
+        # Flattened study text precomputed at ingest
+        content_text = content['study_text']['text']
         
         # Generate quiz using AI
-        quiz = ai_service.generate_quiz(content_text, language, num_questions)
+        quiz = get_or_generate_artifact(
+            content, 'quiz', language, {'num_questions': num_questions},
+            lambda: ai_service.generate_quiz(content_text, language, num_questions),
+            refresh=wants_refresh()
+        )
         
         return jsonify({
             'content_id': content_id,
@@ -1068,15 +1256,19 @@ def generate_notes():
             return jsonify({'error': 'Content ID is required'}), 400
         
         # Get content from database
-        content = db.get_content(content_id, user_id)
+        content = db.get_study_text(content_id, user_id)
         if not content:
             return jsonify({'error': 'Content not found'}), 404
         
-        # Extract text from structured content
-        content_text = extract_text_from_content(content['content'])
+        # Flattened study text precomputed at ingest
+        content_text = content['study_text']['text']
         
         # Generate notes using AI
-        notes = ai_service.generate_notes(content_text, language)
+        notes = get_or_generate_artifact(
+            content, 'notes', language, {},
+            lambda: ai_service.generate_notes(content_text, language),
+            refresh=wants_refresh()
+        )
         
         return jsonify({
             'content_id': content_id,
@@ -1095,20 +1287,31 @@ def get_structured_content(content_id):
     try:
         user_id = get_jwt_identity()
         
+        # Optional ?fields=main_sections,executive_summary returns only those parts of the structure
+        projection = None
+        fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+        if fields:
+            if any(field.startswith('$') for field in fields):
+                return jsonify({'error': 'Invalid fields parameter'}), 400
+            projection = {'title': 1, 'content_type': 1, 'metadata': 1, 'created_at': 1, 'schema_version': 1}
+            projection.update({f'content.{field}': 1 for field in fields})
+        
         # Get content from database
-        content = db.get_content(content_id, user_id)
+        content = db.get_content(content_id, user_id, projection)
         if not content:
             return jsonify({'error': 'Content not found'}), 404
+        if projection and 'content' not in content:
+            # Sub-field projections drop string content entirely; plain text has no parts, so send it whole
+            content['content'] = (db.get_content(content_id, user_id, {'content': 1}) or {}).get('content')
         
-        # Try to parse structured content if it's JSON
-        content_data = content['content']
-        try:
-            if isinstance(content_data, str):
-                structured_data = json.loads(content_data)
-            else:
-                structured_data = content_data
-        except (json.JSONDecodeError, TypeError):
-            # If it's not structured JSON, create a basic structure
+        content_data = Database.decode_content(content.get('content'), content.get('schema_version'))
+        if isinstance(content_data, dict):
+            structured_data = content_data
+            if fields and isinstance(content['content'], str):
+                # A legacy JSON string comes back whole, so select the fields here
+                structured_data = {field: content_data[field] for field in fields if field in content_data}
+        else:
+            # If it's not structured, create a basic structure
             structured_data = {
                 "title": content['title'],
                 "content": content_data,
@@ -1152,37 +1355,93 @@ def api_delete_content(content_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/content/bulk-delete', methods=['POST'])
+def api_bulk_delete_content():
+    """Delete several contents at once and purge what was generated from them"""
+    try:
+        user_id = get_request_user_id()
+        if not user_id:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        data = request.get_json(silent=True) or {}
+        content_ids = data.get('content_ids')
+        if not isinstance(content_ids, list) or not content_ids:
+            return jsonify({'error': 'content_ids must be a non-empty list'}), 400
+        if len(content_ids) > Config.BULK_DELETE_MAX:
+            return jsonify({'error': f'At most {Config.BULK_DELETE_MAX} items can be deleted at once'}), 400
+        
+        # Preserve request order while dropping duplicates
+        content_ids = list(dict.fromkeys(str(content_id) for content_id in content_ids))
+        results = {content_id: 'invalid_id' for content_id in content_ids if not ObjectId.is_valid(content_id)}
+        valid_ids = [content_id for content_id in content_ids if content_id not in results]
+        
+        deleted = db.delete_contents(valid_ids, user_id) if valid_ids else {}
+        for content_id in valid_ids:
+            results[content_id] = 'deleted' if content_id in deleted else 'not_found'
+        
+        # Cached generations are keyed by the study text they were produced from
+        ai_service.cache.invalidate_content(deleted.values())
+        
+        return jsonify({
+            'message': f'{len(deleted)} item(s) deleted',
+            'deleted_count': len(deleted),
+            'results': [{'content_id': content_id, 'status': results[content_id]} for content_id in content_ids]
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # PDF Download Routes
+def send_cached_pdf(kind, content, data, render):
+    """Send a rendered PDF from the cache (rendering it on a miss) with a strong ETag
+    
+    render(path) writes the PDF to path. A request whose If-None-Match matches gets a 304 without touching the cache or renderer.
+    """
+    etag = PDFCache.make_key(kind, content.get('title'), data, PDFGenerator.TEMPLATE_VERSION)
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    
+    pdf_file = pdf_cache.open(etag)
+    if pdf_file is None:
+        # The renderer writes into the cache file, which is then streamed from disk
+        pdf_file = pdf_cache.put_file(etag, render)
+    
+    filename = f"{kind}_{content.get('title', 'content')}.pdf"
+    filename = "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.')).rstrip()
+    
+    response = send_file(
+        pdf_file,
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=filename,
+        etag=etag,
+        max_age=0
+    )
+    response.cache_control.private = True
+    return response
+
 @app.route('/download/summary/<content_id>/pdf')
 @login_required
 def download_summary_pdf(content_id):
     """Download summary as PDF"""
     try:
-        content = db.get_content(content_id, session['user_id'])
+        content = db.get_study_text(content_id, session['user_id'])
         if not content:
             flash('Content not found', 'error')
             return redirect(url_for('dashboard'))
         
-        # Generate summary data
-        summary_data = ai_service.generate_summary(
-            extract_text_from_content(content['content']),
-            content.get('title', 'Untitled Content')
+        # Serve the summary shown on the summary page
+        summary_data = get_or_generate_artifact(
+            content, 'summary', 'english', {},
+            lambda: ai_service.generate_summary(content['study_text']['text'], 'english'),
+            refresh=wants_refresh()
         )
         
         if isinstance(summary_data, dict) and 'error' not in summary_data:
-            # Generate PDF
-            pdf_buffer = pdf_generator.generate_summary_pdf(content, summary_data)
-            
-            # Return PDF as download
-            filename = f"summary_{content.get('title', 'content')}.pdf"
-            filename = "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.')).rstrip()
-            
-            return send_file(
-                pdf_buffer,
-                mimetype='application/pdf',
-                as_attachment=True,
-                download_name=filename
-            )
+            # Render (or reuse the cached render of) the PDF
+            return send_cached_pdf('summary', content, summary_data, lambda path: pdf_renderer.render('summary', content, summary_data, output_path=path))
         else:
             flash('Error generating summary PDF', 'error')
             return redirect(url_for('frontend_summary', content_id=content_id))
@@ -1196,31 +1455,21 @@ def download_summary_pdf(content_id):
 def download_notes_pdf(content_id):
     """Download notes as PDF"""
     try:
-        content = db.get_content(content_id, session['user_id'])
+        content = db.get_study_text(content_id, session['user_id'])
         if not content:
             flash('Content not found', 'error')
             return redirect(url_for('dashboard'))
         
-        # Generate notes data
-        notes_data = ai_service.generate_notes(
-            extract_text_from_content(content['content']),
-            content.get('title', 'Untitled Content')
+        # Serve the notes shown on the notes page
+        notes_data = get_or_generate_artifact(
+            content, 'notes', 'english', {},
+            lambda: ai_service.generate_notes(content['study_text']['text'], 'english'),
+            refresh=wants_refresh()
         )
         
         if isinstance(notes_data, dict) and 'error' not in notes_data:
-            # Generate PDF
-            pdf_buffer = pdf_generator.generate_notes_pdf(content, notes_data)
-            
-            # Return PDF as download
-            filename = f"notes_{content.get('title', 'content')}.pdf"
-            filename = "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.')).rstrip()
-            
-            return send_file(
-                pdf_buffer,
-                mimetype='application/pdf',
-                as_attachment=True,
-                download_name=filename
-            )
+            # Render (or reuse the cached render of) the PDF
+            return send_cached_pdf('notes', content, notes_data, lambda path: pdf_renderer.render('notes', content, notes_data, output_path=path))
         else:
             flash('Error generating notes PDF', 'error')
             return redirect(url_for('frontend_notes', content_id=content_id))
@@ -1234,7 +1483,7 @@ def download_notes_pdf(content_id):
 def download_quiz_pdf(content_id):
     """Download quiz as PDF"""
     try:
-        content = db.get_content(content_id, session['user_id'])
+        content = db.get_study_text(content_id, session['user_id'])
         if not content:
             flash('Content not found', 'error')
             return redirect(url_for('dashboard'))
@@ -1242,27 +1491,16 @@ def download_quiz_pdf(content_id):
         # Get number of questions from query parameter
         num_questions = request.args.get('num_questions', 10, type=int)
         
-        # Generate quiz data
-        quiz_data = ai_service.generate_quiz(
-            extract_text_from_content(content['content']),
-            content.get('title', 'Untitled Content'),
-            num_questions=num_questions
+        # Serve the stored quiz for this question count
+        quiz_data = get_or_generate_artifact(
+            content, 'quiz', 'english', {'num_questions': num_questions},
+            lambda: ai_service.generate_quiz(content['study_text']['text'], 'english', num_questions),
+            refresh=wants_refresh()
         )
         
         if isinstance(quiz_data, dict) and 'error' not in quiz_data:
-            # Generate PDF
-            pdf_buffer = pdf_generator.generate_quiz_pdf(content, quiz_data)
-            
-            # Return PDF as download
-            filename = f"quiz_{content.get('title', 'content')}.pdf"
-            filename = "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.')).rstrip()
-            
-            return send_file(
-                pdf_buffer,
-                mimetype='application/pdf',
-                as_attachment=True,
-                download_name=filename
-            )
+            # Render (or reuse the cached render of) the PDF
+            return send_cached_pdf('quiz', content, quiz_data, lambda path: pdf_renderer.render('quiz', content, quiz_data, output_path=path))
         else:
             flash('Error generating quiz PDF', 'error')
             return redirect(url_for('generate_quiz', content_id=content_id))
@@ -1276,31 +1514,37 @@ def download_quiz_pdf(content_id):
 def download_report_pdf(content_id):
     """Download comprehensive report as PDF"""
     try:
-        content = db.get_content(content_id, session['user_id'])
+        content = db.get_study_text(content_id, session['user_id'])
         if not content:
             flash('Content not found', 'error')
             return redirect(url_for('dashboard'))
         
-        content_text = extract_text_from_content(content['content'])
-        content_title = content.get('title', 'Untitled Content')
-        
-        # Generate all data types
-        summary_data = ai_service.generate_summary(content_text, content_title)
-        notes_data = ai_service.generate_notes(content_text, content_title)
-        quiz_data = ai_service.generate_quiz(content_text, content_title, num_questions=5)
-        
-        # Generate comprehensive PDF
-        pdf_buffer = pdf_generator.generate_report_pdf(content, summary_data, notes_data, quiz_data)
-        
-        # Return PDF as download
-        filename = f"report_{content.get('title', 'content')}.pdf"
-        filename = "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.')).rstrip()
-        
-        return send_file(
-            pdf_buffer,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=filename
+        content_text = content['study_text']['text']
+        refresh = wants_refresh()
+        
+        # Stored parts are reused; missing ones are generated concurrently and failed parts are left out of the report
+        materials = ai_service.run_concurrently({
+            'summary': lambda: get_or_generate_artifact(
+                content, 'summary', 'english', {},
+                lambda: ai_service.generate_summary(content_text, 'english'), refresh=refresh
+            ),
+            'notes': lambda: get_or_generate_artifact(
+                content, 'notes', 'english', {},
+                lambda: ai_service.generate_notes(content_text, 'english'), refresh=refresh
+            ),
+            'quiz': lambda: get_or_generate_artifact(
+                content, 'quiz', 'english', {'num_questions': 5},
+                lambda: ai_service.generate_quiz(content_text, 'english', 5), refresh=refresh
+            )
+        })
+        summary_data = materials['summary']
+        notes_data = materials['notes']
+        quiz_data = materials['quiz']
+        
+        # Render (or reuse the cached render of) the comprehensive PDF
+        return send_cached_pdf(
+            'report', content, [summary_data, notes_data, quiz_data],
+            lambda path: pdf_renderer.render('report', content, summary_data, notes_data, quiz_data, output_path=path)
         )
         
     except Exception as e:
@@ -1310,7 +1554,17 @@ def download_report_pdf(content_id):
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'service': 'StudySahayak API'}), 200
+    return jsonify({
+        'status': 'healthy',
+        'service': 'StudySahayak API',
+        'ai_cache': ai_service.cache_stats(),
+        'ai_single_flight': ai_service.single_flight_stats(),
+        'ai_upstream': ai_service.upstream_stats(),
+        'artifact_single_flight': artifact_flight.stats(),
+        'pdf_cache': pdf_cache.stats(),
+        'pdf_renderer': pdf_renderer.stats(),
+        'transcription': get_transcription_worker().stats()
+    }), 200
 
 @app.errorhandler(404)
 def not_found(error):
@@ -1320,5 +1574,18 @@ def not_found(error):
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
+@app.cli.command('create-indexes')
+def create_indexes_command():
+    """Create the MongoDB indexes the app relies on (run on every deploy; safe to re-run)"""
+    db.ensure_indexes()
+    print("Indexes are up to date")
+
+@app.cli.command('migrate-content')
+def migrate_content_command():
+    """Create indexes and convert stored content to the current schema (run once after upgrading)"""
+    db.ensure_indexes()
+    migrated = db.migrate_content_documents()
+    print(f"Migrated {migrated} content documents to schema version {CONTENT_SCHEMA_VERSION}")
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
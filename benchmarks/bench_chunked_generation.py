@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark single-prompt vs map-reduce chunked generation against document size.
+
+Gemini is replaced by a simulated model whose latency grows with prompt length
+(fixed overhead + per-token cost), which is the behaviour that makes one huge
+prompt slow. Run from the repository root:
+
+    python benchmarks/bench_chunked_generation.py
+"""
+
+import os
+import sys
+import json
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from services.ai_cache import AICache
+from services.ai_service import AIService
+from services.chunking import estimate_tokens
+
+# Simulated model cost: 50 ms per call + 10 ms per 1000 prompt tokens
+CALL_OVERHEAD = 0.05
+SECONDS_PER_1K_TOKENS = 0.01
+WORDS_PER_PAGE = 500
+
+class SimulatedResponse:
+    def __init__(self, text):
+        self.text = text
+
+class SimulatedModel:
+    """Fake Gemini model with size-proportional latency"""
+
+    def generate_content(self, prompt):
+        time.sleep(CALL_OVERHEAD + SECONDS_PER_1K_TOKENS * estimate_tokens(prompt) / 1000)
+        return SimulatedResponse(json.dumps({
+            'main_topic': 'Benchmark',
+            'key_points': ['point'],
+            'concepts': {},
+            'conclusion': 'done'
+        }))
+
+def make_document(pages):
+    """Synthetic document of the given page count"""
+    sentence = 'The lecture explains an important concept with a worked example. '
+    words_per_sentence = len(sentence.split())
+    return sentence * (pages * WORDS_PER_PAGE // words_per_sentence)
+
+def time_summary(service, content):
+    start = time.perf_counter()
+    service.generate_summary(content, 'english')
+    return time.perf_counter() - start
+
+def main():
+    print(f"Chunk budget: {Config.AI_CHUNK_TOKENS} tokens, concurrency: {Config.AI_MAX_CONCURRENCY}")
+    print(f"{'pages':>6} {'tokens':>9} {'single (s)':>11} {'chunked (s)':>12} {'speedup':>8}")
+
+    for pages in (10, 50, 100, 200, 300):
+        content = make_document(pages)
+
+        # Single prompt: disable chunking by raising the budget above the document size
+        original_budget = Config.AI_CHUNK_TOKENS
+        Config.AI_CHUNK_TOKENS = estimate_tokens(content) + 1
+        single_service = AIService(cache=AICache(max_entries=0))
+        single_service.model = SimulatedModel()
+        single = time_summary(single_service, content)
+        Config.AI_CHUNK_TOKENS = original_budget
+
+        chunked_service = AIService(cache=AICache(max_entries=0))
+        chunked_service.model = SimulatedModel()
+        chunked = time_summary(chunked_service, content)
+
+        print(f"{pages:>6} {estimate_tokens(content):>9} {single:>11.2f} {chunked:>12.2f} {single / chunked:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
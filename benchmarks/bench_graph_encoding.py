@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark verbose vs columnar graph payloads: JSON size (raw and gzipped) and
+encode time against concept-map size.
+
+Graphs are synthesised with the same node/link shape generate_graph_data produces.
+Run from the repository root:
+
+    python benchmarks/bench_graph_encoding.py
+"""
+
+import os
+import sys
+import gzip
+import json
+import random
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.graph_codec import encode_graph, decode_graph
+
+NODE_TYPES = ['concept', 'definition', 'principle', 'example', 'application']
+TYPE_COLORS = ['#3b82f6', '#10b981', '#f59e0b', '#ef4444', '#8b5cf6']
+IMPORTANCE_SIZES = {'high': 35, 'medium': 28, 'low': 22}
+REPEATS = 20
+
+def make_graph(node_count, seed=0):
+    """Synthetic concept map with hierarchy links to the root and ~2 relationships per node"""
+    rng = random.Random(seed)
+    nodes = [{
+        'id': '0', 'name': 'Main Topic', 'type': 'main_topic', 'level': 0, 'size': 50,
+        'content': 'Central concept', 'complexity': 'intermediate', 'color': '#1e3a8a'
+    }]
+    links = []
+    for i in range(1, node_count):
+        kind = rng.randrange(len(NODE_TYPES))
+        importance = rng.choice(list(IMPORTANCE_SIZES))
+        level = rng.randint(1, 4)
+        nodes.append({
+            'id': str(i),
+            'name': f'Concept {i}',
+            'type': NODE_TYPES[kind],
+            'level': level,
+            'size': IMPORTANCE_SIZES[importance],
+            'content': f'Description of concept {i} in one sentence.',
+            'importance': importance,
+            'prerequisites': [f'Concept {rng.randrange(1, i)}'] if i > 1 and rng.random() < 0.3 else [],
+            'examples': [],
+            'applications': [],
+            'color': TYPE_COLORS[kind]
+        })
+        if level == 1:
+            links.append({'source': '0', 'target': str(i), 'value': 3, 'type': 'hierarchy'})
+    for _ in range(2 * node_count):
+        source, target = rng.sample(range(node_count), 2)
+        links.append({
+            'source': str(source), 'target': str(target),
+            'value': rng.randint(1, 3), 'type': rng.choice(['related', 'prerequisite', 'builds_on']),
+            'description': ''
+        })
+    return {'nodes': nodes, 'links': links, 'learning_path': [], 'metadata': {'total_concepts': node_count}}
+
+def best_time(fn):
+    best = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    print(f"{'nodes':>6} {'verbose KB':>11} {'compact KB':>11} {'gzip v/c KB':>14} "
+          f"{'verbose ms':>11} {'compact ms':>11}")
+
+    for node_count in (50, 200, 1000, 5000):
+        graph = make_graph(node_count)
+        verbose = json.dumps(graph, separators=(',', ':'))
+        compact = json.dumps(encode_graph(graph), separators=(',', ':'))
+        assert decode_graph(json.loads(compact)) == graph
+
+        # Compact time includes building the columnar form from the stored verbose graph
+        verbose_time = best_time(lambda: json.dumps(graph, separators=(',', ':')))
+        compact_time = best_time(lambda: json.dumps(encode_graph(graph), separators=(',', ':')))
+
+        gzip_sizes = f"{len(gzip.compress(verbose.encode())) / 1024:.1f}/{len(gzip.compress(compact.encode())) / 1024:.1f}"
+        print(f"{node_count:>6} {len(verbose) / 1024:>11.1f} {len(compact) / 1024:>11.1f} {gzip_sizes:>14} "
+              f"{verbose_time * 1000:>11.2f} {compact_time * 1000:>11.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark serial vs process-pool PDF text extraction on synthetic textbooks.
+
+Generates multi-hundred-page PDFs with ReportLab into a temporary directory and
+times ContentProcessor.process_pdf with one worker and with a pool. Run from
+the repository root:
+
+    python benchmarks/bench_pdf_extraction.py [worker_count]
+"""
+
+import os
+import sys
+import time
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from services.content_processor import ContentProcessor
+
+LINES_PER_PAGE = 45
+LINE = 'Photosynthesis converts light energy into chemical energy stored in glucose molecules.'
+
+def make_pdf(path, pages):
+    """Write a synthetic text-heavy PDF"""
+    pdf = canvas.Canvas(path, pagesize=A4)
+    for page in range(pages):
+        y = 800
+        for line in range(LINES_PER_PAGE):
+            pdf.drawString(40, y, f"{page}.{line} {LINE}")
+            y -= 17
+        pdf.showPage()
+    pdf.save()
+
+def time_extraction(processor, path, repeats=3):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        processor.process_pdf(path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1)
+    serial = ContentProcessor(pdf_workers=1)
+    parallel = ContentProcessor(pdf_workers=workers)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Warm up the pool so process start-up is not counted against the first size
+        warmup = os.path.join(tmp, 'warmup.pdf')
+        make_pdf(warmup, 64)
+        parallel.process_pdf(warmup)
+
+        print(f"workers: {workers}")
+        print(f"{'pages':>6} {'serial (s)':>11} {'parallel (s)':>13} {'speedup':>8}")
+        for pages in (100, 300, 600):
+            path = os.path.join(tmp, f'book_{pages}.pdf')
+            make_pdf(path, pages)
+            serial_time = time_extraction(serial, path)
+            parallel_time = time_extraction(parallel, path)
+            print(f"{pages:>6} {serial_time:>11.2f} {parallel_time:>13.2f} {serial_time / parallel_time:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
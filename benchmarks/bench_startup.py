@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Benchmark app import time with lazy Mongo connection versus the previous eager
+start-up (client creation plus index creation at import).
+
+Each run imports the app in a fresh interpreter. By default MONGO_URI points at an
+unreachable host with a short server selection timeout, standing in for a slow or
+down database; pass a real URI to measure against it. Run from the repository root:
+
+    python benchmarks/bench_startup.py [mongo_uri]
+"""
+
+import os
+import sys
+import statistics
+import subprocess
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_URI = 'mongodb://10.255.255.1:27017/?serverSelectionTimeoutMS=2000'
+RUNS = 5
+
+# Eager reproduces the old import path: the client and indexes were set up by Database()
+SCENARIOS = {
+    'lazy (import only)': 'import app',
+    'eager (import + indexes)': 'import app; app.db.ensure_indexes()'
+}
+
+SCRIPT = """
+import logging
+logging.disable(logging.CRITICAL)
+try:
+    {code}
+except Exception:
+    pass  # An unreachable database still counts: the time spent waiting on it is what is measured
+"""
+
+def time_import(code, uri):
+    env = dict(os.environ, MONGO_URI=uri)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', SCRIPT.format(code=code)],
+                   cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def main():
+    uri = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_URI
+    print(f"MONGO_URI: {uri}")
+    print(f"{'scenario':<26} {'median (s)':>11} {'min (s)':>9} {'max (s)':>9}")
+    for name, code in SCENARIOS.items():
+        times = [time_import(code, uri) for _ in range(RUNS)]
+        print(f"{name:<26} {statistics.median(times):>11.2f} {min(times):>9.2f} {max(times):>9.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 from dotenv import load_dotenv
 
@@ -28,5 +29,59 @@ class Config:
     ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'avi', 'mov', 'wmv', 'flv', 'webm'}
     ALLOWED_PDF_EXTENSIONS = {'pdf'}
     
+    # PDF extraction settings
+    PDF_EXTRACT_WORKERS = int(os.environ.get('PDF_EXTRACT_WORKERS', os.cpu_count() or 1))  # Extraction processes
+    PDF_PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', 32))  # Smaller PDFs are extracted in-process
+    
+    # Rendered PDF cache settings
+    PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'studysahayak_pdf_cache')
+    PDF_CACHE_MAX_BYTES = int(os.environ.get('PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    
+    # PDF rendering settings
+    PDF_RENDER_WORKERS = int(os.environ.get('PDF_RENDER_WORKERS', 2))  # Render processes; 0 renders on the request thread
+    PDF_RENDER_TIMEOUT = int(os.environ.get('PDF_RENDER_TIMEOUT', 60))  # Seconds before a render is abandoned
+    PDF_SPOOL_MAX_BYTES = int(os.environ.get('PDF_SPOOL_MAX_BYTES', 1024 * 1024))  # Larger renders spill to disk
+    
+    # Video transcription settings
+    FFMPEG_BINARY = os.environ.get('FFMPEG_BINARY', 'ffmpeg')
+    WHISPER_MODEL = os.environ.get('WHISPER_MODEL', 'base')  # tiny, base, small, medium or large
+    WHISPER_TIMEOUT = int(os.environ.get('WHISPER_TIMEOUT', 3600))  # Seconds to wait for a queued transcription
+    TRANSCRIBE_SEGMENT_SECONDS = float(os.environ.get('TRANSCRIBE_SEGMENT_SECONDS', 45))  # Max segment length for speech recognition
+    TRANSCRIBE_OVERLAP_SECONDS = float(os.environ.get('TRANSCRIBE_OVERLAP_SECONDS', 0.5))
+    TRANSCRIBE_WORKERS = int(os.environ.get('TRANSCRIBE_WORKERS', 4))  # Segments recognised concurrently
+    
+    # Content listing settings
+    LIST_PAGE_SIZE = int(os.environ.get('LIST_PAGE_SIZE', 50))  # Default items per /api/list and /my-content page
+    LIST_MAX_PAGE_SIZE = int(os.environ.get('LIST_MAX_PAGE_SIZE', 200))
+    BULK_DELETE_MAX = int(os.environ.get('BULK_DELETE_MAX', 100))  # Most IDs accepted by one bulk delete
+    
+    # Background job settings
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))  # Local worker threads for upload processing
+    JOB_HEARTBEAT_SECONDS = int(os.environ.get('JOB_HEARTBEAT_SECONDS', 60))  # How often running jobs are marked alive
+    JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', 300))  # A running job silent this long is requeued
+    GRAPH_PRECOMPUTE_ON_UPLOAD = os.environ.get('GRAPH_PRECOMPUTE_ON_UPLOAD', 'true').lower() == 'true'  # Build the concept graph at ingest
+    GRAPH_HIERARCHY_ENGINE = os.environ.get('GRAPH_HIERARCHY_ENGINE', 'local')  # 'local' keyphrase extraction, or 'ai' (Gemini, local on failure)
+    GRAPH_MAX_CONCEPTS = int(os.environ.get('GRAPH_MAX_CONCEPTS', 24))  # Concepts extracted by the local engine
+    GRAPH_LAYOUT_ITERATIONS = int(os.environ.get('GRAPH_LAYOUT_ITERATIONS', 60))  # Force refinement passes over the radial layout (0 disables)
+    GRAPH_LAYOUT_REFINE_MAX_NODES = int(os.environ.get('GRAPH_LAYOUT_REFINE_MAX_NODES', 300))  # Larger graphs keep the plain radial layout (refinement is O(n^2))
+    
+    # AI generation cache settings
+    AI_CACHE_MAX_ENTRIES = int(os.environ.get('AI_CACHE_MAX_ENTRIES', 512))  # In-process LRU size
+    AI_CACHE_TTL_SECONDS = int(os.environ.get('AI_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+    
+    # Concurrent generation settings
+    AI_MAX_CONCURRENCY = int(os.environ.get('AI_MAX_CONCURRENCY', 4))  # Parallel Gemini calls per process
+    AI_TASK_TIMEOUT = int(os.environ.get('AI_TASK_TIMEOUT', 120))  # Seconds before a generation is abandoned
+    AI_CHUNK_TOKENS = int(os.environ.get('AI_CHUNK_TOKENS', 8000))  # Token budget per prompt for long documents
+    
+    # Gemini quota and resilience settings
+    GEMINI_REQUESTS_PER_MINUTE = int(os.environ.get('GEMINI_REQUESTS_PER_MINUTE', 60))  # Client-side request budget
+    GEMINI_TOKENS_PER_MINUTE = int(os.environ.get('GEMINI_TOKENS_PER_MINUTE', 1000000))  # Client-side prompt token budget
+    AI_MAX_RETRIES = int(os.environ.get('AI_MAX_RETRIES', 3))  # Retries for rate-limit, overload and timeout errors
+    AI_RETRY_BASE_DELAY = float(os.environ.get('AI_RETRY_BASE_DELAY', 1.0))  # Seconds, doubled per attempt with jitter
+    AI_RETRY_MAX_DELAY = float(os.environ.get('AI_RETRY_MAX_DELAY', 30.0))
+    AI_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('AI_BREAKER_FAILURE_THRESHOLD', 5))  # Failed calls before failing fast
+    AI_BREAKER_RESET_SECONDS = int(os.environ.get('AI_BREAKER_RESET_SECONDS', 60))  # Cool-down before a trial call
+    
     # Search API settings (SerpAPI for web search)
     SERP_API_KEY = os.environ.get('SERP_API_KEY') or ''
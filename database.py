@@ -1,33 +1,86 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument, UpdateOne
 from bson import ObjectId
 from datetime import datetime
 from config import Config
-import logging
+import threading
+from utils.study_text import decode_content, build_study_text
+
+# Index backing per-user listings, newest first
+USER_CONTENT_INDEX = [('user_id', 1), ('created_at', -1)]
+
+# Fields needed to render a content listing
+LIST_PROJECTION = {
+    'title': 1,
+    'content_type': 1,
+    'status': 1,
+    'created_at': 1,
+    'metadata.word_count': 1,
+    'metadata.character_count': 1
+}
+
+# Version 2: structured content is stored as a native sub-document instead of a JSON string
+# Version 3: flattened study text is stored alongside it
+CONTENT_SCHEMA_VERSION = 3
 
 class Database:
     """Database operations for MongoDB"""
     
     def __init__(self):
-        self.client = MongoClient(Config.MONGO_URI)
-        self.db = self.client[Config.MONGO_DB_NAME]
-        self.collection = self.db[Config.MONGO_COLLECTION_NAME]
-        self.users_collection = self.db['users']
-        
-        # Create indexes
-        self._create_indexes()
+        # The client is created on first use, so importing the app never waits on the network
+        self._client = None
+        self._client_lock = threading.Lock()
     
-    def _create_indexes(self):
-        """Create database indexes for better performance"""
-        try:
-            # Index for users collection
-            self.users_collection.create_index('username', unique=True)
-            
-            # Indexes for content collection
-            self.collection.create_index([('user_id', 1), ('created_at', -1)])
-            self.collection.create_index('content_id')
-            
-        except Exception as e:
-            logging.warning(f"Could not create indexes: {e}")
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = MongoClient(Config.MONGO_URI)
+        return self._client
+    
+    @property
+    def db(self):
+        return self.client[Config.MONGO_DB_NAME]
+    
+    @property
+    def collection(self):
+        return self.db[Config.MONGO_COLLECTION_NAME]
+    
+    @property
+    def users_collection(self):
+        return self.db['users']
+    
+    @property
+    def jobs_collection(self):
+        return self.db['jobs']
+    
+    @property
+    def ai_cache_collection(self):
+        return self.db['ai_cache']
+    
+    @property
+    def artifacts_collection(self):
+        return self.db['artifacts']
+    
+    def ensure_indexes(self):
+        """Create every index the application relies on; safe to re-run (run via `flask create-indexes`)"""
+        # Index for users collection
+        self.users_collection.create_index('username', unique=True)
+        
+        # Indexes for content collection
+        self.collection.create_index(USER_CONTENT_INDEX)
+        self.collection.create_index('content_id')
+        
+        # Indexes for background jobs collection
+        self.jobs_collection.create_index([('status', 1), ('created_at', 1)])
+        self.jobs_collection.create_index('content_id')
+        
+        # Expire cached AI generations automatically
+        self.ai_cache_collection.create_index('expires_at', expireAfterSeconds=0)
+        self.ai_cache_collection.create_index('content_hash')
+        
+        # Stored summaries, notes, quizzes and graphs per content
+        self.artifacts_collection.create_index([('content_id', 1), ('kind', 1), ('language', 1)])
     
     def create_user(self, username, password_hash):
         """Create a new user"""
@@ -48,14 +101,22 @@ class Database:
         """Get user by ID"""
         return self.users_collection.find_one({'_id': ObjectId(user_id)})
     
-    def store_content(self, user_id, title, content, content_type, metadata=None):
+    @staticmethod
+    def decode_content(content, schema_version=None):
+        """Structured content as a dict; plain text stays a string (JSON strings are parsed for legacy rows only)"""
+        return decode_content(content, schema_version)
+    
+    def store_content(self, user_id, title, content, content_type, metadata=None, status='ready'):
         """Store processed content in database"""
         content_data = {
             'user_id': user_id,
             'title': title,
             'content': content,
+            'study_text': build_study_text(content, CONTENT_SCHEMA_VERSION),
+            'schema_version': CONTENT_SCHEMA_VERSION,
             'content_type': content_type,
             'metadata': metadata or {},
+            'status': status,
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow()
         }
@@ -63,22 +124,65 @@ class Database:
         result = self.collection.insert_one(content_data)
         return str(result.inserted_id)
     
-    def get_content(self, content_id, user_id):
-        """Get specific content by ID and user ID"""
+    def get_content(self, content_id, user_id, projection=None):
+        """Get specific content by ID and user ID
+        
+        projection limits the returned fields, e.g. {'content.main_sections': 1}.
+        """
         try:
             return self.collection.find_one({
                 '_id': ObjectId(content_id),
                 'user_id': user_id
-            })
+            }, projection)
         except:
             return None
     
+    def get_study_text(self, content_id, user_id):
+        """Get content without the structured document; 'study_text' holds the flattened text
+        
+        Rows stored before study text existed get it computed and saved on first access.
+        """
+        try:
+            query = {'_id': ObjectId(content_id), 'user_id': user_id}
+        except:
+            return None
+        
+        content = self.collection.find_one(query, {'content': 0})
+        if content and 'study_text' not in content:
+            document = self.collection.find_one(query, {'content': 1, 'schema_version': 1})
+            content['study_text'] = build_study_text(document.get('content'), document.get('schema_version'))
+            self.collection.update_one(query, {'$set': {'study_text': content['study_text']}})
+        return content
+    
     def get_user_contents(self, user_id):
         """Get all contents for a specific user"""
-        contents = list(self.collection.find(
-            {'user_id': user_id},
-            {'content': 0}  # Exclude full content for listing
-        ).sort('created_at', -1))
+        contents, _ = self.get_user_contents_page(user_id, limit=0)
+        return contents
+    
+    def get_user_contents_page(self, user_id, limit=50, after=None):
+        """Get one page of a user's contents, newest first, using keyset pagination
+        
+        after is the cursor returned with the previous page. Returns (contents, next_cursor);
+        next_cursor is None on the last page. limit=0 returns everything.
+        """
+        query = {'user_id': user_id}
+        if after:
+            created_at, last_id = self._decode_list_cursor(after)
+            query['$or'] = [
+                {'created_at': {'$lt': created_at}},
+                {'created_at': created_at, '_id': {'$lt': last_id}}
+            ]
+        
+        cursor = self.collection.find(query, LIST_PROJECTION).sort([('created_at', -1), ('_id', -1)])
+        if limit:
+            # One extra row tells us whether another page exists
+            cursor = cursor.limit(limit + 1)
+        contents = list(cursor)
+        
+        next_cursor = None
+        if limit and len(contents) > limit:
+            contents = contents[:limit]
+            next_cursor = self._encode_list_cursor(contents[-1])
         
         # Convert ObjectId to string for JSON serialization
         for content in contents:
@@ -86,7 +190,25 @@ class Database:
             # Keep datetime objects for template formatting
             # Only convert to string for API responses if needed
         
-        return contents
+        return contents, next_cursor
+    
+    def count_user_contents(self, user_id):
+        """Count a user's contents (served by the listing index)"""
+        return self.collection.count_documents({'user_id': user_id})
+    
+    @staticmethod
+    def _encode_list_cursor(content):
+        """Opaque cursor for the position after the given listing row"""
+        return f"{content['created_at'].strftime('%Y%m%d%H%M%S%f')}_{content['_id']}"
+    
+    @staticmethod
+    def _decode_list_cursor(cursor):
+        """Parse a listing cursor; raises ValueError if it is malformed"""
+        try:
+            timestamp, last_id = cursor.split('_', 1)
+            return datetime.strptime(timestamp, '%Y%m%d%H%M%S%f'), ObjectId(last_id)
+        except Exception:
+            raise ValueError('Invalid pagination cursor')
     
     def update_content(self, content_id, user_id, updates):
         """Update content"""
@@ -106,8 +228,164 @@ class Database:
             'user_id': user_id
         })
         
+        if result.deleted_count > 0:
+            self.delete_artifacts([content_id])
         return result.deleted_count > 0
     
+    def delete_contents(self, content_ids, user_id):
+        """Delete several contents owned by a user with a single delete_many
+        
+        Returns {content_id: study text hash} for the documents that were deleted, so
+        callers can purge anything derived from them.
+        """
+        query = {'_id': {'$in': [ObjectId(content_id) for content_id in content_ids]}, 'user_id': user_id}
+        found = list(self.collection.find(query, {'study_text.hash': 1}))
+        if not found:
+            return {}
+        
+        self.collection.delete_many({'_id': {'$in': [document['_id'] for document in found]}, 'user_id': user_id})
+        self.delete_artifacts([str(document['_id']) for document in found])
+        return {str(document['_id']): document.get('study_text', {}).get('hash') for document in found}
+    
+    def get_artifact(self, content_id, kind, language=None, params=None, source_hash=None):
+        """Get a stored generation for content; with source_hash, only if it was built from that text"""
+        query = {'content_id': content_id, 'kind': kind, 'language': language, 'params': params or {}}
+        if source_hash is not None:
+            query['source_hash'] = source_hash
+        return self.artifacts_collection.find_one(query)
+    
+    def save_artifact(self, content_id, kind, language, params, model, source_hash, payload):
+        """Store a generation, replacing the previous one for the same request and bumping its version"""
+        return self.artifacts_collection.find_one_and_update(
+            {'content_id': content_id, 'kind': kind, 'language': language, 'params': params or {}},
+            {
+                '$set': {
+                    'model': model,
+                    'source_hash': source_hash,
+                    'payload': payload,
+                    'created_at': datetime.utcnow()
+                },
+                '$inc': {'version': 1}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    
+    def delete_artifacts(self, content_ids):
+        """Delete every stored generation for the given contents"""
+        result = self.artifacts_collection.delete_many({'content_id': {'$in': list(content_ids)}})
+        return result.deleted_count
+    
+    def migrate_content_documents(self, batch_size=500):
+        """One-shot migration of older content rows to the current schema; safe to re-run"""
+        migrated = 0
+        batch = []
+        outdated = {'schema_version': {'$not': {'$gte': CONTENT_SCHEMA_VERSION}}}
+        cursor = self.collection.find(outdated, {'content': 1, 'schema_version': 1})
+        
+        for document in cursor:
+            content = decode_content(document.get('content'), document.get('schema_version'))
+            batch.append(UpdateOne(
+                dict(outdated, _id=document['_id']),
+                {'$set': {
+                    'content': content,
+                    'study_text': build_study_text(content, CONTENT_SCHEMA_VERSION),
+                    'schema_version': CONTENT_SCHEMA_VERSION
+                }}
+            ))
+            if len(batch) >= batch_size:
+                migrated += self.collection.bulk_write(batch, ordered=False).modified_count
+                batch = []
+        
+        if batch:
+            migrated += self.collection.bulk_write(batch, ordered=False).modified_count
+        
+        return migrated
+    
+    def create_job(self, user_id, content_id, job_type, payload):
+        """Create a queued background job record"""
+        job_data = {
+            'user_id': user_id,
+            'content_id': content_id,
+            'job_type': job_type,
+            'payload': payload,
+            'status': 'queued',
+            'stage': 'queued',
+            'progress': 0,
+            'error': None,
+            'attempts': 0,
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow()
+        }
+        
+        result = self.jobs_collection.insert_one(job_data)
+        return str(result.inserted_id)
+    
+    def get_job(self, job_id, user_id=None):
+        """Get a job by ID, optionally restricted to its owner"""
+        try:
+            query = {'_id': ObjectId(job_id)}
+            if user_id is not None:
+                query['user_id'] = user_id
+            return self.jobs_collection.find_one(query)
+        except:
+            return None
+    
+    def get_latest_job_for_content(self, content_id, user_id):
+        """Get the most recent job that produces the given content (follow-up jobs such as graph builds are ignored)"""
+        return self.jobs_collection.find_one(
+            {'content_id': content_id, 'user_id': user_id, 'job_type': 'process_upload'},
+            sort=[('created_at', -1)]
+        )
+    
+    def claim_job(self, job_id, stale_before=None):
+        """Atomically move a queued job to running; returns None if already claimed
+        
+        With stale_before, a running job not updated since then is claimed too: its
+        worker is assumed to have died.
+        """
+        claimable = [{'status': 'queued'}]
+        if stale_before is not None:
+            claimable.append({'status': 'running', 'updated_at': {'$lt': stale_before}})
+        return self.jobs_collection.find_one_and_update(
+            {'_id': ObjectId(job_id), '$or': claimable},
+            {
+                '$set': {'status': 'running', 'started_at': datetime.utcnow(), 'updated_at': datetime.utcnow()},
+                '$inc': {'attempts': 1}
+            },
+            return_document=ReturnDocument.AFTER
+        )
+    
+    def update_job(self, job_id, updates):
+        """Update job status, stage or progress"""
+        updates['updated_at'] = datetime.utcnow()
+        
+        result = self.jobs_collection.update_one(
+            {'_id': ObjectId(job_id)},
+            {'$set': updates}
+        )
+        
+        return result.modified_count > 0
+    
+    def get_pending_job_ids(self):
+        """Get IDs of jobs that are still waiting to be processed"""
+        jobs = self.jobs_collection.find({'status': 'queued'}, {'_id': 1}).sort('created_at', 1)
+        return [str(job['_id']) for job in jobs]
+    
+    def get_stale_job_ids(self, stale_before):
+        """Get IDs of running jobs not updated since stale_before (their worker died)"""
+        jobs = self.jobs_collection.find(
+            {'status': 'running', 'updated_at': {'$lt': stale_before}}, {'_id': 1}
+        ).sort('created_at', 1)
+        return [str(job['_id']) for job in jobs]
+    
+    def touch_jobs(self, job_ids):
+        """Refresh updated_at of running jobs so they are not taken for abandoned ones"""
+        self.jobs_collection.update_many(
+            {'_id': {'$in': [ObjectId(job_id) for job_id in job_ids]}, 'status': 'running'},
+            {'$set': {'updated_at': datetime.utcnow()}}
+        )
+    
     def close_connection(self):
         """Close database connection"""
         self.client.close()
@@ -0,0 +1,158 @@
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+
+class AICache:
+    """Two-tier cache for AI generations: in-process LRU backed by a MongoDB collection"""
+
+    def __init__(self, collection=None, max_entries=512, ttl_seconds=7 * 24 * 3600, collection_factory=None):
+        # collection_factory is called on first use instead, so the Mongo client can be created lazily
+        self._collection = collection
+        self._collection_factory = collection_factory
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._stats = {
+            'memory_hits': 0,
+            'persistent_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0
+        }
+
+    @property
+    def collection(self):
+        if self._collection is None and self._collection_factory is not None:
+            self._collection = self._collection_factory()
+        return self._collection
+
+    @staticmethod
+    def make_key(operation, content, language, params=None, model_name=None):
+        """Build a cache key from the content hash and everything that shapes the prompt"""
+        content_hash = hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+        descriptor = json.dumps({
+            'operation': operation,
+            'language': language,
+            'params': params or {},
+            'model': model_name
+        }, sort_keys=True, default=str)
+        return f"{operation}:{content_hash}:{hashlib.sha256(descriptor.encode('utf-8')).hexdigest()[:16]}"
+
+    def get(self, key):
+        """Return a cached value or None"""
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    # Callers get their own copy so they can't corrupt the cached entry
+                    return copy.deepcopy(value)
+                del self._entries[key]
+
+        value = self._get_persistent(key)
+        with self._lock:
+            if value is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['persistent_hits'] += 1
+            self._put_memory(key, copy.deepcopy(value), now)
+        return value
+
+    def set(self, key, value):
+        """Store a value in both tiers"""
+        now = time.time()
+        with self._lock:
+            self._put_memory(key, copy.deepcopy(value), now)
+            self._stats['stores'] += 1
+        self._set_persistent(key, value)
+
+    def invalidate(self, key):
+        """Drop a single entry from both tiers"""
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.collection is not None:
+            try:
+                self.collection.delete_one({'_id': key})
+            except Exception as e:
+                logging.warning(f"Could not invalidate AI cache entry: {e}")
+
+    def invalidate_content(self, content_hashes):
+        """Drop every entry generated from the given content (sha256 of the prompt text) from both tiers"""
+        content_hashes = {content_hash for content_hash in content_hashes if content_hash}
+        if not content_hashes:
+            return
+        
+        with self._lock:
+            for key in [key for key in self._entries if self._content_hash(key) in content_hashes]:
+                del self._entries[key]
+        if self.collection is not None:
+            try:
+                self.collection.delete_many({'content_hash': {'$in': list(content_hashes)}})
+            except Exception as e:
+                logging.warning(f"Could not invalidate AI cache entries: {e}")
+    
+    def stats(self):
+        """Hit/miss counters and current in-memory size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._entries)
+        lookups = stats['memory_hits'] + stats['persistent_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['persistent_hits']) / lookups, 3) if lookups else 0.0
+        return stats
+
+    @staticmethod
+    def _content_hash(key):
+        """Content hash component of a key built by make_key"""
+        parts = key.split(':')
+        return parts[1] if len(parts) == 3 else None
+    
+    def _put_memory(self, key, value, now):
+        """Insert into the LRU tier, evicting the least recently used entries (lock held)"""
+        self._entries[key] = (now + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _get_persistent(self, key):
+        """Look up an unexpired entry in MongoDB"""
+        if self.collection is None:
+            return None
+        try:
+            document = self.collection.find_one({'_id': key, 'expires_at': {'$gt': datetime.utcnow()}})
+            if document:
+                return json.loads(document['payload'])
+        except Exception as e:
+            logging.warning(f"AI cache lookup failed: {e}")
+        return None
+
+    def _set_persistent(self, key, value):
+        """Upsert an entry into MongoDB; expiry is enforced by a TTL index on expires_at"""
+        if self.collection is None:
+            return
+        try:
+            now = datetime.utcnow()
+            self.collection.replace_one(
+                {'_id': key},
+                {
+                    '_id': key,
+                    'content_hash': self._content_hash(key),
+                    'payload': json.dumps(value),
+                    'created_at': now,
+                    'expires_at': now + timedelta(seconds=self.ttl_seconds)
+                },
+                upsert=True
+            )
+        except Exception as e:
+            logging.warning(f"AI cache store failed: {e}")
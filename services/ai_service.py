@@ -3,19 +3,221 @@ from config import Config
 import json
 import logging
 import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from services.ai_cache import AICache
+from services.single_flight import SingleFlight
+from services.concept_extractor import extract_hierarchy
+from utils.study_text import extract_text_from_content
+from services.resilience import TokenBucketLimiter, CircuitBreaker, CircuitOpenError, backoff_delay
+from google.api_core import exceptions as google_exceptions
+from services.chunking import (estimate_tokens, split_into_chunks, allocate_questions, merge_structured_content,
+                               merge_summaries, merge_notes, merge_quizzes, is_complete)
+
+# Errors worth retrying: quota exhaustion, overload and timeouts
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+    TimeoutError,
+    ConnectionError
+)
 
 class AIService:
     """Service for AI-powered content generation using Gemini API"""
     
-    def __init__(self):
+    def __init__(self, cache=None):
+        self.model_name = 'gemini-1.5-flash'
         if Config.GEMINI_API_KEY:
             genai.configure(api_key=Config.GEMINI_API_KEY)
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
+            self.model = genai.GenerativeModel(self.model_name)
         else:
             logging.warning("Gemini API key not configured")
             self.model = None
         
         self.serp_api_key = Config.SERP_API_KEY
+        self.cache = cache if cache is not None else AICache()
+        # Identical generations requested at the same time share one Gemini call
+        self._single_flight = SingleFlight()
+        
+        # Shared by every Gemini call from this process
+        self._limiter = TokenBucketLimiter(Config.GEMINI_REQUESTS_PER_MINUTE, Config.GEMINI_TOKENS_PER_MINUTE)
+        self._breaker = CircuitBreaker(Config.AI_BREAKER_FAILURE_THRESHOLD, Config.AI_BREAKER_RESET_SECONDS)
+        self._retries = 0
+        self._retries_lock = threading.Lock()
+        
+        # Shared pool so concurrent generations are bounded across all requests
+        self._executor = ThreadPoolExecutor(
+            max_workers=Config.AI_MAX_CONCURRENCY,
+            thread_name_prefix='ai-generation'
+        )
+        # Chunk map tasks get their own pool: they are submitted from inside
+        # generation tasks, and sharing one bounded pool could deadlock
+        self._chunk_executor = ThreadPoolExecutor(
+            max_workers=Config.AI_MAX_CONCURRENCY,
+            thread_name_prefix='ai-chunk'
+        )
+    
+    def _cached_generation(self, operation, content, language, params, generate):
+        """Return a cached result for this exact request, or generate and cache it"""
+        cache_key = AICache.make_key(operation, content, language, params, self.model_name)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        def generate_and_cache():
+            # A flight that finished between our lookup and joining has already cached the result
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+            result = generate()
+            
+            # Never cache failures or partial merges so the next request can retry
+            if is_complete(result):
+                self.cache.set(cache_key, result)
+            return result
+        
+        return self._single_flight.do(cache_key, generate_and_cache)
+    
+    def invalidate_generation(self, operation, content, language, params):
+        """Drop the cached result of one generation, so the next request for it calls the model"""
+        self.cache.invalidate(AICache.make_key(operation, content, language, params, self.model_name))
+    
+    def cache_stats(self):
+        """Hit/miss counters for the generation cache"""
+        return self.cache.stats()
+    
+    def single_flight_stats(self):
+        """How many identical concurrent generations were collapsed into one call"""
+        return self._single_flight.stats()
+    
+    def upstream_stats(self):
+        """Circuit breaker state, rate limiter levels and retry count for Gemini calls"""
+        return {
+            'circuit_breaker': self._breaker.stats(),
+            'rate_limiter': self._limiter.stats(),
+            'retries': self._retries
+        }
+    
+    def _call_model(self, prompt):
+        """Call Gemini through the rate limiter, retrying transient errors with jittered backoff
+        
+        Raises CircuitOpenError without calling the model while the upstream is unhealthy.
+        """
+        self._breaker.before_call()
+        tokens = estimate_tokens(prompt)
+        
+        for attempt in range(Config.AI_MAX_RETRIES + 1):
+            self._limiter.acquire(tokens)
+            try:
+                response = self.model.generate_content(prompt)
+            except RETRYABLE_ERRORS as e:
+                if attempt == Config.AI_MAX_RETRIES:
+                    self._breaker.record_failure()
+                    raise
+                delay = backoff_delay(attempt, Config.AI_RETRY_BASE_DELAY, Config.AI_RETRY_MAX_DELAY)
+                logging.warning(f"Gemini call failed ({e}), retrying in {delay:.1f}s")
+                with self._retries_lock:
+                    self._retries += 1
+                time.sleep(delay)
+            except Exception:
+                # Not an availability problem (e.g. invalid request), so it says nothing about upstream health
+                self._breaker.release()
+                raise
+            else:
+                self._breaker.record_success()
+                return response
+    
+    def run_concurrently(self, tasks, timeout=None, executor=None):
+        """Run independent generations in parallel and return their results by name
+        
+        tasks maps a name to a zero-argument callable. A task that raises or does not
+        finish within `timeout` seconds of starting yields an error dict instead of failing
+        the batch; time spent queued behind other tasks does not count.
+        """
+        timeout = timeout if timeout is not None else Config.AI_TASK_TIMEOUT
+        executor = executor or self._executor
+        started = {}
+        
+        def timed(name, task):
+            started[name] = time.monotonic()
+            return task()
+        
+        futures = {name: executor.submit(timed, name, task) for name, task in tasks.items()}
+        
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = self._await_started(future, lambda: started.get(name), timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                logging.error(f"Generation task '{name}' timed out after {timeout}s")
+                results[name] = {"error": f"Timed out generating {name}"}
+            except Exception as e:
+                logging.error(f"Generation task '{name}' failed: {e}")
+                results[name] = {"error": f"Failed to generate {name}: {str(e)}"}
+        
+        return results
+    
+    @staticmethod
+    def _await_started(future, started_at, timeout):
+        """Result of a future, allowing it `timeout` seconds from when it started running"""
+        while True:
+            start = started_at()
+            remaining = timeout if start is None else start + timeout - time.monotonic()
+            if start is not None and remaining <= 0 and not future.done():
+                raise FutureTimeoutError()
+            try:
+                return future.result(timeout=max(0, remaining))
+            except FutureTimeoutError:
+                if start is not None:
+                    raise
+                # Still queued when we stopped waiting; its clock has not started yet
+    
+    def _map_reduce(self, content, generate_chunk, merge, chunk_args=None, chunks=None):
+        """Generate per chunk in parallel and merge, or make a single call for short content
+        
+        chunk_args optionally supplies an extra per-chunk argument (e.g. a question budget);
+        the arguments of the chunks that succeeded are passed to merge after the parts.
+        A merge missing any chunk is marked 'partial' so it is never cached or stored.
+        """
+        if chunks is None:
+            chunks = split_into_chunks(content, Config.AI_CHUNK_TOKENS)
+        if len(chunks) <= 1:
+            return generate_chunk(content, chunk_args[0]) if chunk_args else generate_chunk(content)
+        
+        logging.info(f"Generating over {len(chunks)} chunks")
+        tasks = {}
+        for i, chunk in enumerate(chunks):
+            if chunk_args:
+                tasks[i] = lambda chunk=chunk, arg=chunk_args[i]: generate_chunk(chunk, arg)
+            else:
+                tasks[i] = lambda chunk=chunk: generate_chunk(chunk)
+        results = self.run_concurrently(tasks, executor=self._chunk_executor)
+        
+        # Keep chunk order; drop chunks that failed
+        kept = [i for i in range(len(chunks))
+                if isinstance(results[i], dict) and 'error' not in results[i]]
+        if not kept:
+            return results[0]
+        parts = [results[i] for i in kept]
+        merged = merge(parts, [chunk_args[i] for i in kept]) if chunk_args else merge(parts)
+        if len(kept) < len(chunks):
+            logging.warning(f"Merged {len(kept)} of {len(chunks)} chunks; the result is partial")
+            merged['partial'] = True
+            merged['missing_chunks'] = [i for i in range(len(chunks)) if i not in kept]
+        return merged
+    
+    def generate_study_materials(self, content, language="english", num_questions=None, timeout=None):
+        """Generate summary, notes and quiz concurrently"""
+        return self.run_concurrently({
+            'summary': lambda: self.generate_summary(content, language),
+            'notes': lambda: self.generate_notes(content, language),
+            'quiz': lambda: self.generate_quiz(content, language, num_questions)
+        }, timeout=timeout)
     
     def _clean_json_response(self, response_text):
         """Clean AI response to extract valid JSON"""
@@ -47,7 +249,7 @@ class AIService:
             Return only the title, nothing else.
             """
             
-            response = self.model.generate_content(prompt)
+            response = self._call_model(prompt)
             title = response.text.strip().replace('"', '').replace("'", "")
             return title[:60] if len(title) > 60 else title
             
@@ -60,6 +262,17 @@ class AIService:
         if not self.model:
             return {"error": "AI service not available"}
         
+        return self._map_reduce(
+            raw_content,
+            lambda chunk: self._generate_structured_content(chunk, content_type, language),
+            merge_structured_content
+        )
+    
+    def _generate_structured_content(self, raw_content, content_type, language):
+        """Call the model to structure a single piece of content"""
+        if not self.model:
+            return {"error": "AI service not available"}
+        
         try:
             # Create a comprehensive prompt based on content type
             type_specific_instruction = {
@@ -111,7 +324,7 @@ class AIService:
             Ensure the content is educational, comprehensive, and well-organized.
             """
             
-            response = self.model.generate_content(prompt)
+            response = self._call_model(prompt)
             
             try:
                 # Clean the response before parsing
@@ -122,6 +335,9 @@ class AIService:
                 # If JSON parsing fails, create a structured format from plain text
                 return self._create_fallback_structure(response.text, content_type, language)
             
+        except CircuitOpenError:
+            # Upstream is unhealthy: fail fast to a locally built structure
+            return self._create_fallback_structure(raw_content, content_type, language)
         except Exception as e:
             logging.error(f"Error generating structured content: {e}")
             return {"error": f"Failed to generate structured content: {str(e)}"}
@@ -151,6 +367,14 @@ class AIService:
     
     def generate_summary(self, content, language="english"):
         """Generate a summary of the content in specified language"""
+        return self._cached_generation('summary', content, language, {}, lambda: self._map_reduce(
+            content,
+            lambda chunk: self._generate_summary(chunk, language),
+            merge_summaries
+        ))
+    
+    def _generate_summary(self, content, language):
+        """Call the model to summarise content (uncached)"""
         if not self.model:
             return {"error": "AI service not available"}
         
@@ -176,7 +400,7 @@ class AIService:
             }}
             """
             
-            response = self.model.generate_content(prompt)
+            response = self._call_model(prompt)
             
             try:
                 # Clean and parse JSON response
@@ -197,21 +421,46 @@ class AIService:
     
     def generate_quiz(self, content, language="english", num_questions=None):
         """Generate a quiz from the content"""
+        return self._cached_generation('quiz', content, language, {'num_questions': num_questions},
+                                       lambda: self._generate_chunked_quiz(content, language, num_questions))
+    
+    def _default_num_questions(self, content):
+        """Determine number of questions based on content length"""
+        content_length = len(content.split())
+        if content_length < 200:
+            return 5
+        elif content_length < 500:
+            return 10
+        elif content_length < 1000:
+            return 15
+        else:
+            return 20
+    
+    def _generate_chunked_quiz(self, content, language, num_questions):
+        """Spread the question budget over chunks of long content and merge the quizzes"""
+        # Ensure within limits
+        num_questions = min(max(num_questions or self._default_num_questions(content), 1), 50)
+        
+        chunks = split_into_chunks(content, Config.AI_CHUNK_TOKENS)
+        return self._map_reduce(
+            content,
+            # Chunks left without a share of the budget are not sent to the model
+            lambda chunk, chunk_questions: (self._generate_quiz(chunk, language, chunk_questions)
+                                            if chunk_questions else {'questions': []}),
+            merge_quizzes,
+            chunk_args=allocate_questions(chunks, num_questions) if len(chunks) > 1 else [num_questions],
+            chunks=chunks
+        )
+    
+    def _generate_quiz(self, content, language, num_questions):
+        """Call the model to build a quiz (uncached)"""
         if not self.model:
             return {"error": "AI service not available"}
         
         try:
             # Determine number of questions based on content length if not specified
             if not num_questions:
-                content_length = len(content.split())
-                if content_length < 200:
-                    num_questions = 5
-                elif content_length < 500:
-                    num_questions = 10
-                elif content_length < 1000:
-                    num_questions = 15
-                else:
-                    num_questions = 20
+                num_questions = self._default_num_questions(content)
             
             # Ensure within limits
             num_questions = min(max(num_questions, 1), 50)
@@ -249,7 +498,7 @@ class AIService:
             }}
             """
             
-            response = self.model.generate_content(prompt)
+            response = self._call_model(prompt)
             
             try:
                 # Clean and parse JSON response
@@ -272,6 +521,14 @@ class AIService:
     
     def generate_notes(self, content, language="english"):
         """Generate comprehensive, detailed notes from the content"""
+        return self._cached_generation('notes', content, language, {}, lambda: self._map_reduce(
+            content,
+            lambda chunk: self._generate_notes(chunk, language),
+            merge_notes
+        ))
+    
+    def _generate_notes(self, content, language):
+        """Call the model to write study notes (uncached)"""
         if not self.model:
             return {"error": "AI service not available"}
         
@@ -321,7 +578,7 @@ class AIService:
             IMPORTANT: Use plain text with newlines for formatting. Do NOT use markdown syntax like *, **, #, etc. Use actual line breaks and spacing for structure.
             """
             
-            response = self.model.generate_content(prompt)
+            response = self._call_model(prompt)
             
             try:
                 # Clean and parse JSON response
@@ -400,7 +657,7 @@ class AIService:
             Ensure the enhanced content flows naturally and maintains accuracy.
             """
             
-            response = self.model.generate_content(prompt)
+            response = self._call_model(prompt)
             return response.text.strip()
             
         except Exception as e:
@@ -408,10 +665,13 @@ class AIService:
             return original_content
 
     def generate_hierarchical_graph_structure(self, content, language="english"):
-        """Generate a detailed hierarchical structure for graph visualization"""
-        if not self.model:
-            logging.warning("AI model not available, using fallback")
-            return self._create_enhanced_fallback_hierarchy(content)
+        """Generate a detailed hierarchical structure for graph visualization
+        
+        With GRAPH_HIERARCHY_ENGINE=local (the default) or no model, concepts are extracted
+        offline from the whole document; the model path falls back to that on any failure.
+        """
+        if Config.GRAPH_HIERARCHY_ENGINE == 'local' or not self.model:
+            return self._create_local_hierarchy(content)
 
         try:
             # Extract text content
@@ -468,7 +728,7 @@ class AIService:
             }}
             """
             
-            response = self.model.generate_content(prompt)
+            response = self._call_model(prompt)
             
             try:
                 cleaned_response = self._clean_json_response(response.text)
@@ -476,136 +736,21 @@ class AIService:
                 
                 # Validate and enhance the response
                 if not hierarchy_data.get('hierarchy_levels'):
-                    return self._create_enhanced_fallback_hierarchy(content)
+                    return self._create_local_hierarchy(content)
                     
                 return hierarchy_data
                 
             except json.JSONDecodeError as e:
                 logging.error(f"JSON decode error: {e}")
-                return self._create_enhanced_fallback_hierarchy(content)
+                return self._create_local_hierarchy(content)
                 
         except Exception as e:
             logging.error(f"Error generating hierarchical structure: {e}")
-            return self._create_enhanced_fallback_hierarchy(content)
+            return self._create_local_hierarchy(content)
 
-    def _create_enhanced_fallback_hierarchy(self, content):
-        """Create an enhanced fallback hierarchical structure"""
-        try:
-            # Extract text content
-            if isinstance(content, dict):
-                text_content = self._extract_from_structured_content(content)
-            else:
-                text_content = str(content)
-            
-            # Split into concepts
-            sentences = [s.strip() for s in text_content.split('.') if s.strip() and len(s.strip()) > 20]
-            paragraphs = [p.strip() for p in text_content.split('\n\n') if p.strip()]
-            
-            # Create a more structured hierarchy
-            main_concepts = sentences[:4] if len(sentences) >= 4 else paragraphs[:4]
-            sub_concepts = sentences[4:8] if len(sentences) >= 8 else paragraphs[4:8] if len(paragraphs) >= 8 else []
-            
-            hierarchy_levels = []
-            
-            # Level 1: Main Concepts
-            if main_concepts:
-                level_1_nodes = []
-                for i, concept in enumerate(main_concepts):
-                    level_1_nodes.append({
-                        "id": f"main_{i}",
-                        "title": concept[:60] + "..." if len(concept) > 60 else concept,
-                        "description": concept,
-                        "type": "concept",
-                        "importance": "high" if i < 2 else "medium"
-                    })
-                
-                hierarchy_levels.append({
-                    "level": 1,
-                    "title": "Main Concepts",
-                    "nodes": level_1_nodes
-                })
-            
-            # Level 2: Sub Concepts
-            if sub_concepts:
-                level_2_nodes = []
-                for i, concept in enumerate(sub_concepts):
-                    level_2_nodes.append({
-                        "id": f"sub_{i}",
-                        "title": concept[:50] + "..." if len(concept) > 50 else concept,
-                        "description": concept,
-                        "type": "definition",
-                        "importance": "medium"
-                    })
-                
-                hierarchy_levels.append({
-                    "level": 2,
-                    "title": "Supporting Details",
-                    "nodes": level_2_nodes
-                })
-            
-            # Create relationships
-            relationships = []
-            if len(hierarchy_levels) >= 2:
-                # Connect main concepts to sub concepts
-                for i in range(min(len(main_concepts), len(sub_concepts))):
-                    relationships.append({
-                        "source": f"main_{i}",
-                        "target": f"sub_{i}",
-                        "relationship_type": "related",
-                        "strength": "medium"
-                    })
-            
-            return {
-                "main_topic": {
-                    "title": "Content Analysis",
-                    "description": "Structured breakdown of the content"
-                },
-                "hierarchy_levels": hierarchy_levels,
-                "relationships": relationships,
-                "learning_path": [
-                    {
-                        "step": 1,
-                        "focus": "main_0" if main_concepts else "concept_0",
-                        "description": "Start with the fundamental concepts"
-                    }
-                ] if main_concepts else [],
-                "difficulty_progression": {
-                    "beginner_nodes": [f"main_{i}" for i in range(min(2, len(main_concepts)))],
-                    "intermediate_nodes": [f"main_{i}" for i in range(2, len(main_concepts))] + [f"sub_{i}" for i in range(min(2, len(sub_concepts)))],
-                    "advanced_nodes": [f"sub_{i}" for i in range(2, len(sub_concepts))]
-                }
-            }
-            
-        except Exception as e:
-            logging.error(f"Error creating fallback hierarchy: {e}")
-            return {
-                "main_topic": {
-                    "title": "Content",
-                    "description": "Basic content structure"
-                },
-                "hierarchy_levels": [
-                    {
-                        "level": 1,
-                        "title": "Main Topic",
-                        "nodes": [
-                            {
-                                "id": "main_topic",
-                                "title": "Main Content",
-                                "description": "Primary content area",
-                                "type": "concept",
-                                "importance": "high"
-                            }
-                        ]
-                    }
-                ],
-                "relationships": [],
-                "learning_path": [],
-                "difficulty_progression": {
-                    "beginner_nodes": ["main_topic"],
-                    "intermediate_nodes": [],
-                    "advanced_nodes": []
-                }
-            }
+    def _create_local_hierarchy(self, content):
+        """Build the graph hierarchy offline from keyphrases of the whole document (no model call)"""
+        return extract_hierarchy(extract_text_from_content(content), max_concepts=Config.GRAPH_MAX_CONCEPTS)
 
     def _extract_from_structured_content(self, structured_content):
         """Extract text from structured content"""
@@ -637,48 +782,3 @@ class AIService:
             text_parts.extend(structured_content['key_takeaways'])
         
         return ' '.join(text_parts)
-
-    def _create_fallback_hierarchy(self, content):
-        """Create a fallback hierarchical structure"""
-        # Extract key sentences/concepts
-        sentences = [s.strip() for s in content.split('.') if s.strip() and len(s.strip()) > 20]
-        
-        return {
-            "main_topic": {
-                "title": "Content Analysis",
-                "description": "Structured breakdown of the provided content",
-                "complexity_level": "intermediate"
-            },
-            "hierarchy_levels": [
-                {
-                    "level": 1,
-                    "title": "Main Concepts",
-                    "nodes": [
-                        {
-                            "id": f"concept_{i}",
-                            "title": sentence[:50] + "..." if len(sentence) > 50 else sentence,
-                            "description": sentence,
-                            "type": "concept",
-                            "importance": "high" if i < 3 else "medium",
-                            "prerequisites": [],
-                            "related_concepts": [],
-                            "examples": [],
-                            "applications": []
-                        } for i, sentence in enumerate(sentences[:6])
-                    ]
-                }
-            ],
-            "relationships": [],
-            "learning_path": [
-                {
-                    "step": 1,
-                    "focus": "concept_0",
-                    "description": "Start with the fundamental concepts"
-                }
-            ],
-            "difficulty_progression": {
-                "beginner_nodes": [f"concept_{i}" for i in range(min(2, len(sentences)))],
-                "intermediate_nodes": [f"concept_{i}" for i in range(2, min(4, len(sentences)))],
-                "advanced_nodes": [f"concept_{i}" for i in range(4, min(6, len(sentences)))]
-            }
-        }
@@ -0,0 +1,78 @@
+import numpy as np
+
+FRAME_SECONDS = 0.03  # Energy is measured over 30 ms frames
+SILENCE_FLOOR_RMS = 100  # Absolute RMS below which a frame always counts as silence
+
+
+def frame_energy(samples, sample_rate):
+    """RMS energy of consecutive non-overlapping frames"""
+    frame_length = max(1, int(sample_rate * FRAME_SECONDS))
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        return np.zeros(0), frame_length
+
+    frames = samples[:frame_count * frame_length].astype(np.float32).reshape(frame_count, frame_length)
+    return np.sqrt(np.mean(frames * frames, axis=1)), frame_length
+
+
+def find_segments(pcm_audio, sample_rate, max_seconds=45.0, min_seconds=15.0, overlap_seconds=0.5):
+    """Split 16-bit mono PCM into bounded-length segments, cutting at the quietest point
+
+    Each cut is placed at the lowest-energy frame between min_seconds and max_seconds
+    after the segment start, so words are rarely split. Consecutive segments overlap
+    by overlap_seconds to protect words that straddle a cut anyway.
+
+    Returns a list of (start_sample, end_sample) tuples in order.
+    """
+    samples = np.frombuffer(pcm_audio, dtype=np.int16)
+    total = len(samples)
+    max_samples = int(max_seconds * sample_rate)
+    if total <= max_samples:
+        return [(0, total)] if total else []
+
+    energy, frame_length = frame_energy(samples, sample_rate)
+    # Pauses are quiet relative to the recording; the median caps the threshold when speech is continuous
+    threshold = max(SILENCE_FLOOR_RMS, min(float(np.percentile(energy, 15)) * 2.0, float(np.median(energy)) * 0.25))
+    # Frames under the silence threshold tie at zero, so the earliest real pause wins
+    cut_cost = np.where(energy < threshold, 0.0, energy)
+
+    min_frames = max(1, int(min_seconds * sample_rate) // frame_length)
+    max_frames = max(min_frames + 1, max_samples // frame_length)
+    overlap_samples = int(overlap_seconds * sample_rate)
+
+    segments = []
+    start = 0
+    while total - start > max_samples:
+        window_start = start // frame_length + min_frames
+        window_end = min(start // frame_length + max_frames, len(cut_cost))
+        cut = (window_start + int(np.argmin(cut_cost[window_start:window_end]))) * frame_length
+        segments.append((start, cut))
+        start = max(cut - overlap_samples, start + 1)
+    segments.append((start, total))
+
+    return segments
+
+
+def stitch_transcripts(texts, max_overlap_words=6):
+    """Join ordered segment transcripts, dropping words repeated across an overlapping cut
+
+    Returns (text, offsets) where offsets[i] is the character offset of segment i in text.
+    """
+    words = []
+    offsets = []
+    length = 0
+
+    for text in texts:
+        segment_words = (text or '').split()
+        # Remove the longest prefix of this segment that repeats the tail of the previous one
+        for size in range(min(max_overlap_words, len(words), len(segment_words)), 0, -1):
+            if [w.lower() for w in words[-size:]] == [w.lower() for w in segment_words[:size]]:
+                segment_words = segment_words[size:]
+                break
+
+        offsets.append(length + 1 if words else 0)
+        for word in segment_words:
+            length += len(word) + (1 if words else 0)
+            words.append(word)
+
+    return ' '.join(words), offsets
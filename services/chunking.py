@@ -0,0 +1,200 @@
+import math
+import re
+
+# Rough characters-per-token ratio for English text with Gemini tokenizers
+CHARS_PER_TOKEN = 4
+
+_PARAGRAPH_SPLIT = re.compile(r'\n\s*\n|\f')
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+
+def estimate_tokens(text):
+    """Cheap token estimate used for chunk budgeting"""
+    return math.ceil(len(text or '') / CHARS_PER_TOKEN)
+
+
+def split_into_chunks(text, max_tokens):
+    """Split text into chunks under a token budget, preferring page/paragraph then sentence boundaries"""
+    if not text:
+        return []
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+    return list(iter_chunks([text], max_tokens))
+
+
+def iter_chunks(texts, max_tokens):
+    """Incrementally pack a stream of texts (e.g. PDF pages) into chunks under a token budget
+
+    A chunk is yielded as soon as it is full, so callers can start prompting on the
+    first pages while later ones are still being extracted.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    current = []
+    current_len = 0
+
+    for text in texts:
+        for unit in _split_units(text, max_chars):
+            if current and current_len + len(unit) + 1 > max_chars:
+                yield ' '.join(current)
+                current = []
+                current_len = 0
+            current.append(unit)
+            current_len += len(unit) + 1
+
+    if current:
+        yield ' '.join(current)
+
+
+def _split_units(text, max_chars):
+    """Break text into paragraph/sentence units that each fit within max_chars"""
+    for block in _PARAGRAPH_SPLIT.split(text or ''):
+        block = block.strip()
+        if not block:
+            continue
+        if len(block) <= max_chars:
+            yield block
+            continue
+        # Extracted text is usually whitespace-collapsed, so fall back to sentences
+        for sentence in _SENTENCE_SPLIT.split(block):
+            if len(sentence) <= max_chars:
+                yield sentence
+            else:
+                # Pathological run-on text: hard split on the budget
+                for i in range(0, len(sentence), max_chars):
+                    yield sentence[i:i + max_chars]
+
+
+def is_complete(result):
+    """Whether a generation succeeded with every chunk, and so may be cached or stored"""
+    return isinstance(result, dict) and 'error' not in result and not result.get('partial')
+
+
+def _unique(items):
+    """De-duplicate list items while keeping their first-seen order"""
+    seen = set()
+    result = []
+    for item in items:
+        marker = item.strip().lower() if isinstance(item, str) else repr(item)
+        if marker not in seen:
+            seen.add(marker)
+            result.append(item)
+    return result
+
+
+def _join_text(parts, key):
+    """Join a text field across partial results"""
+    return ' '.join(part[key] for part in parts if part.get(key))
+
+
+def _merge_dicts(parts, key):
+    """Merge a dict field across partial results; earlier chunks win on conflicts"""
+    merged = {}
+    for part in parts:
+        for name, value in (part.get(key) or {}).items():
+            merged.setdefault(name, value)
+    return merged
+
+
+def _concat_lists(parts, key):
+    """Concatenate a list field across partial results"""
+    return [item for part in parts for item in (part.get(key) or [])]
+
+
+def merge_structured_content(parts):
+    """Reduce per-chunk structured documents into one"""
+    first = parts[0]
+    metadata = dict(first.get('metadata') or {})
+    metadata['chunk_count'] = len(parts)
+
+    return {
+        'title': first.get('title', 'Structured Content'),
+        'executive_summary': _join_text(parts, 'executive_summary'),
+        'introduction': first.get('introduction', ''),
+        'main_sections': _concat_lists(parts, 'main_sections'),
+        'key_takeaways': _unique(_concat_lists(parts, 'key_takeaways')),
+        'conclusion': parts[-1].get('conclusion', ''),
+        'concepts_glossary': _merge_dicts(parts, 'concepts_glossary'),
+        'metadata': metadata
+    }
+
+
+def merge_summaries(parts):
+    """Reduce per-chunk summaries into one"""
+    merged = {
+        'main_topic': parts[0].get('main_topic', 'Summary'),
+        'key_points': _unique(_concat_lists(parts, 'key_points')),
+        'concepts': _merge_dicts(parts, 'concepts'),
+        'conclusion': _join_text(parts, 'conclusion')
+    }
+    summary_text = _join_text(parts, 'summary_text')
+    if summary_text:
+        merged['summary_text'] = summary_text
+    return merged
+
+
+def merge_notes(parts):
+    """Reduce per-chunk notes into one"""
+    sections = []
+    for part in parts:
+        if part.get('sections'):
+            sections.extend(part['sections'])
+        elif part.get('content'):
+            # Plain-text fallback from a chunk becomes its own section
+            sections.append({'heading': part.get('title', 'Notes'), 'content': part['content']})
+
+    return {
+        'title': parts[0].get('title', 'Generated Notes'),
+        'sections': sections,
+        'summary': _join_text(parts, 'summary'),
+        'key_takeaways': _unique(_concat_lists(parts, 'key_takeaways')),
+        'study_tips': _unique(_concat_lists(parts, 'study_tips')),
+        'further_reading': _unique(_concat_lists(parts, 'further_reading'))
+    }
+
+
+def merge_quizzes(parts, budgets):
+    """Reduce per-chunk quizzes into one, keeping at most each chunk's question budget and renumbering them"""
+    questions = []
+    seen = set()
+    for part, budget in zip(parts, budgets):
+        kept = 0
+        for question in part.get('questions') or []:
+            if kept == budget:
+                break
+            marker = str(question.get('question', '')).strip().lower()
+            if marker in seen:
+                continue
+            seen.add(marker)
+            questions.append(question)
+            kept += 1
+
+    for i, question in enumerate(questions, 1):
+        question['id'] = i
+
+    return {
+        'quiz_title': parts[0].get('quiz_title', 'Generated Quiz'),
+        'total_questions': len(questions),
+        'questions': questions
+    }
+
+
+def allocate_questions(chunks, num_questions):
+    """Split a question budget across chunks in proportion to their length
+
+    The shares add up to num_questions exactly. Every chunk gets at least one question
+    when there are enough to go round; otherwise the largest chunks get one each and
+    the rest get none (callers skip those chunks).
+    """
+    if num_questions < len(chunks):
+        largest = sorted(range(len(chunks)), key=lambda i: len(chunks[i]), reverse=True)[:num_questions]
+        return [1 if i in largest else 0 for i in range(len(chunks))]
+
+    total = sum(len(chunk) for chunk in chunks) or 1
+    spare = num_questions - len(chunks)
+    shares = [spare * len(chunk) / total for chunk in chunks]
+    budgets = [1 + math.floor(share) for share in shares]
+    leftover = spare - sum(budget - 1 for budget in budgets)
+    by_remainder = sorted(range(len(chunks)), key=lambda i: shares[i] - math.floor(shares[i]), reverse=True)
+    for i in by_remainder[:leftover]:
+        budgets[i] += 1
+    return budgets
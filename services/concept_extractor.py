@@ -0,0 +1,234 @@
+import math
+import re
+import numpy as np
+
+MAX_PHRASE_WORDS = 3
+PASSAGE_SENTENCES = 3  # Sentences per passage for document frequency and co-occurrence
+LEVEL_ONE_SHARE = 4  # About one concept in four becomes a main (level 1) concept
+DESCRIPTION_CHARS = 240
+MIN_RECURRING_PHRASES = 4  # Below this many repeated phrases, one-off phrases are kept as candidates
+MIN_SHARED_PASSAGES = 2  # Cross links need concepts to meet in at least this many passages
+
+STOPWORDS = frozenset("""
+a about above after again against all also although am an and any are as at be because been before
+being below between both but by can could did do does doing down during each either else etc even
+ever every few for from further had has have having he her here hers herself him himself his how
+however i if in into is it its itself just let like made make many may me might more most much must
+my myself need no nor not now of off often on once one only or other our ours ourselves out over own
+per rather same several she should since so some such than that the their theirs them themselves then
+there therefore these they this those though through thus to too under until up upon us use used
+uses using very via was we were what when where whether which while who whom whose why will with
+within without would yet you your yours yourself yourselves called known example examples various
+different important way ways thing things lot lots well first second third new include includes
+including contain contains convert converts occur occurs produce produces provide provides show shows
+shown help helps allow allows become becomes get gets give gives go goes makes take takes taken place
+see seen need needs
+""".split())
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?\u0964])\s+|\n+')
+_PHRASE_BREAK = re.compile(r'[,;:()\[\]{}"“”]|\s[-–—]\s')
+# Letters plus Indic combining marks, which \w alone does not match
+_WORD = re.compile(r"[^\W\d_][\w\u0900-\u0DFF'-]*")
+_DEFINITION = r"(?:the |an |a )?{}\s+(?:is|are|refers to|means)\b"
+_EXAMPLE = re.compile(r"\b(for example|for instance|such as|e\.g\.)", re.IGNORECASE)
+
+
+def split_sentences(text):
+    """Non-empty sentences of text, in order"""
+    return [sentence.strip() for sentence in _SENTENCE_SPLIT.split(text or '') if sentence.strip()]
+
+
+def candidate_phrases(sentence):
+    """(key, surface) pairs for every 1-3 word run of content words in a sentence
+
+    Stopwords and punctuation end a run, so phrases never span them. Keys are normalised
+    (see _normalise); surfaces keep the original spelling for display.
+    """
+    phrases = []
+    for fragment in _PHRASE_BREAK.split(sentence):
+        run = []
+        for word in _WORD.findall(fragment) + ['']:
+            word = word.strip("'-")
+            if len(word) > 2 and word.lower() not in STOPWORDS:
+                run.append(word)
+                continue
+            keys = [_normalise(word) for word in run]
+            for start in range(len(run)):
+                for length in range(1, min(MAX_PHRASE_WORDS, len(run) - start) + 1):
+                    phrases.append((' '.join(keys[start:start + length]), ' '.join(run[start:start + length])))
+            run = []
+    return phrases
+
+
+def _normalise(word):
+    """Lower-case a word and fold simple plurals, so 'Cells' and 'cell' are one concept"""
+    word = word.lower()
+    if len(word) > 4 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def extract_hierarchy(text, max_concepts=24):
+    """Offline concept hierarchy in the schema of AIService.generate_hierarchical_graph_structure
+
+    Keyphrases are scored by TF-IDF over passages of the whole document, the best
+    non-overlapping ones become concepts, and concepts that share passages are linked.
+    The top concept is the main topic, the next quarter are level 1 and the rest hang
+    off the level 1 concept they co-occur with most. Runs in time linear in the text length.
+    """
+    sentences = split_sentences(text)
+
+    # Vocabulary of candidate phrases and one (term, passage) entry per occurrence
+    vocabulary = {}
+    surfaces = []
+    first_sentence = []
+    terms = []
+    passages = []
+    for sentence_index, sentence in enumerate(sentences):
+        for key, surface in candidate_phrases(sentence):
+            term = vocabulary.setdefault(key, len(vocabulary))
+            if term == len(surfaces):
+                surfaces.append(surface)
+                first_sentence.append(sentence_index)
+            terms.append(term)
+            passages.append(sentence_index // PASSAGE_SENTENCES)
+
+    if not terms:
+        return _hierarchy(None, [], [], sentences)
+
+    keys = list(vocabulary)
+    terms = np.array(terms, dtype=np.int64)
+    passages = np.array(passages, dtype=np.int64)
+    vocabulary_size = len(keys)
+    passage_count = int(passages.max()) + 1
+
+    term_frequency = np.bincount(terms, minlength=vocabulary_size)
+    document_frequency = np.bincount(np.unique(passages * vocabulary_size + terms) % vocabulary_size,
+                                     minlength=vocabulary_size)
+    inverse_frequency = np.log((1 + passage_count) / (1 + document_frequency)) + 1
+    word_counts = np.array([key.count(' ') + 1 for key in keys])
+    # Recurring multi-word phrases are rarer but more specific than their parts; one-off ones are just word runs
+    scores = term_frequency * inverse_frequency * (1 + 0.5 * (word_counts - 1) * (term_frequency > 1))
+
+    # Phrases seen once are noise unless the document is too short to repeat anything
+    if np.count_nonzero(term_frequency > 1) >= MIN_RECURRING_PHRASES:
+        scores[term_frequency < 2] = 0
+    selected = _select_concepts(keys, scores, max_concepts)
+    if not selected:
+        return _hierarchy(None, [], [], sentences)
+
+    # Passage co-occurrence between the selected concepts, as Jaccard similarity
+    column = np.full(vocabulary_size, -1)
+    column[selected] = np.arange(len(selected))
+    occurrence = column[terms] >= 0
+    membership = np.zeros((passage_count, len(selected)))
+    membership[passages[occurrence], column[terms[occurrence]]] = 1
+    shared = membership.T @ membership
+    frequency = np.diag(shared)
+    similarity = shared / np.maximum(frequency[:, None] + frequency[None, :] - shared, 1)
+    np.fill_diagonal(similarity, 0)
+
+    concepts = [{
+        'surface': surfaces[term].lower(),
+        'title': surfaces[term][:1].upper() + surfaces[term][1:],
+        'sentence': sentences[first_sentence[term]],
+        'first_sentence': first_sentence[term]
+    } for term in selected]
+    return _hierarchy(concepts[0], concepts[1:], similarity[1:, 1:], sentences, shared[1:, 1:])
+
+
+def _select_concepts(keys, scores, max_concepts):
+    """Highest scoring phrases, skipping any that contain or are contained in one already chosen"""
+    selected = []
+    padded = []
+    for term in np.argsort(-scores, kind='stable'):
+        if scores[term] <= 0:
+            break
+        key = f' {keys[term]} '
+        if len(keys[term]) < 3 or any(key in other or other in key for other in padded):
+            continue
+        selected.append(int(term))
+        padded.append(key)
+        if len(selected) == max_concepts:
+            break
+    return selected
+
+
+def _hierarchy(main, concepts, similarity, sentences, shared=None):
+    """Assemble main topic, levels and relationships from ranked concepts"""
+    words_per_sentence = sum(len(sentence.split()) for sentence in sentences) / max(len(sentences), 1)
+    complexity = 'beginner' if words_per_sentence < 15 else 'intermediate' if words_per_sentence < 25 else 'advanced'
+    main_topic = {
+        'title': main['title'] if main else 'Content',
+        'description': (main['sentence'] if main else 'Basic content structure')[:DESCRIPTION_CHARS],
+        'complexity_level': complexity
+    }
+
+    level_one_count = min(len(concepts), max(1, math.ceil(len(concepts) / LEVEL_ONE_SHARE)))
+    nodes = []
+    for rank, concept in enumerate(concepts):
+        sentence = concept['sentence']
+        if re.match(_DEFINITION.format(re.escape(concept['surface'])), sentence.lower()):
+            node_type = 'definition'
+        elif _EXAMPLE.search(sentence):
+            node_type = 'example'
+        else:
+            node_type = 'concept'
+        nodes.append({
+            'id': f'concept_{rank}',
+            'title': concept['title'],
+            'description': sentence[:DESCRIPTION_CHARS],
+            'type': node_type,
+            'importance': ('high', 'medium', 'low')[min(2, 3 * rank // max(len(concepts), 1))],
+            'prerequisites': [],
+            'examples': [],
+            'applications': []
+        })
+
+    relationships = []
+    parents = {}
+    for child in range(level_one_count, len(concepts)):
+        # Attach to the level 1 concept it shares most passages with (ties go to the higher ranked)
+        parent = int(np.argmax(similarity[child, :level_one_count]))
+        parents[child] = parent
+        relationships.append(_relationship(nodes, parent, child, 'subtopic', similarity, shared))
+
+    # Strongest remaining co-occurrences become cross links
+    pairs = [(similarity[i, j], i, j) for i in range(len(concepts)) for j in range(i + 1, len(concepts))
+             if shared[i, j] >= MIN_SHARED_PASSAGES and parents.get(j) != i and parents.get(i) != j]
+    pairs.sort(key=lambda pair: -pair[0])
+    for _, i, j in pairs[:len(concepts)]:
+        relationships.append(_relationship(nodes, i, j, 'related', similarity, shared))
+
+    level_one = nodes[:level_one_count]
+    level_two = nodes[level_one_count:]
+    hierarchy_levels = [{'level': 1, 'title': 'Main Concepts', 'nodes': level_one}] if level_one else []
+    if level_two:
+        hierarchy_levels.append({'level': 2, 'title': 'Supporting Concepts', 'nodes': level_two})
+
+    path = sorted(range(level_one_count), key=lambda rank: concepts[rank]['first_sentence'])
+    return {
+        'main_topic': main_topic,
+        'hierarchy_levels': hierarchy_levels,
+        'relationships': relationships,
+        'learning_path': [
+            {'step': step, 'focus': nodes[rank]['id'], 'description': f"Understand {nodes[rank]['title']}"}
+            for step, rank in enumerate(path, 1)
+        ],
+        'difficulty_progression': {
+            'beginner_nodes': [node['id'] for node in level_one],
+            'intermediate_nodes': [node['id'] for node in level_two if node['importance'] != 'low'],
+            'advanced_nodes': [node['id'] for node in level_two if node['importance'] == 'low']
+        }
+    }
+
+
+def _relationship(nodes, source, target, relationship_type, similarity, shared):
+    strength = similarity[source, target]
+    return {
+        'source': nodes[source]['id'],
+        'target': nodes[target]['id'],
+        'relationship_type': relationship_type,
+        'strength': 'strong' if strength >= 0.5 else 'medium' if strength >= 0.2 else 'weak',
+        'description': f"Discussed together in {int(shared[source, target])} passage(s)" if shared[source, target] else ''
+    }
@@ -1,20 +1,109 @@
 import os
+import math
+import time
 import subprocess
 import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from PIL import Image
 import PyPDF2
 import requests
 from io import BytesIO
 import logging
 from config import Config
+from services.transcription_worker import get_transcription_worker, WHISPER_SAMPLE_RATE
+from services.audio_segmentation import find_segments, stitch_transcripts
 import speech_recognition as sr
-import moviepy.editor as mp
+import wave
+
+# ffmpeg stdout is read in 1 MiB chunks (about 33 s of 16 kHz mono PCM)
+PCM_READ_CHUNK_BYTES = 1 << 20
+
+class PDFPageExtractor:
+    """Extracts single pages with PyPDF2, falling back to pdfplumber only for pages that fail"""
+    
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._file = open(file_path, 'rb')
+        self._plumber_pdf = None
+        
+        try:
+            self.pdf_reader = PyPDF2.PdfReader(self._file)
+            self.page_count = len(self.pdf_reader.pages)
+        except Exception as e:
+            # Unreadable by PyPDF2 at all: every page goes to pdfplumber
+            logging.warning(f"PyPDF2 could not open PDF: {e}, using pdfplumber for all pages")
+            self.pdf_reader = None
+            try:
+                self.page_count = len(self._get_plumber_pdf().pages)
+            except Exception:
+                # The caller never gets an extractor to close, so release the file here
+                self.close()
+                raise
+    
+    def extract(self, page_index):
+        """Return (raw_text, backend) for one zero-based page"""
+        if self.pdf_reader is not None:
+            try:
+                page = self.pdf_reader.pages[page_index]
+                text = page.extract_text() or ''
+                self._release_page_streams(page)
+                return text, 'PyPDF2'
+            except Exception as e:
+                logging.warning(f"PyPDF2 failed on page {page_index + 1}: {e}, trying pdfplumber")
+        
+        try:
+            return self._get_plumber_pdf().pages[page_index].extract_text() or '', 'pdfplumber'
+        except Exception as e:
+            logging.error(f"pdfplumber failed on page {page_index + 1}: {e}")
+            return '', 'failed'
+    
+    def close(self):
+        if self._plumber_pdf is not None:
+            self._plumber_pdf.close()
+        self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def _get_plumber_pdf(self):
+        """Open pdfplumber on first use only"""
+        if self._plumber_pdf is None:
+            import pdfplumber
+            self._plumber_pdf = pdfplumber.open(self.file_path)
+        return self._plumber_pdf
+    
+    def _release_page_streams(self, page):
+        """Drop a page's content streams from PyPDF2's object cache once extracted"""
+        pending = [page.raw_get('/Contents')] if '/Contents' in page else []
+        
+        while pending:
+            reference = pending.pop()
+            if isinstance(reference, PyPDF2.generic.ArrayObject):
+                pending.extend(reference)
+            elif isinstance(reference, PyPDF2.generic.IndirectObject):
+                cached = self.pdf_reader.resolved_objects.pop((reference.generation, reference.idnum), None)
+                # /Contents may itself be a reference to an array of streams
+                if isinstance(cached, PyPDF2.generic.ArrayObject):
+                    pending.extend(cached)
+
+def _extract_pdf_page_range(file_path, start, end):
+    """Extract (raw_text, backend) for pages [start, end); runs inside a worker process"""
+    with PDFPageExtractor(file_path) as extractor:
+        return [extractor.extract(page_index) for page_index in range(start, end)]
 
 class ContentProcessor:
     """Service for processing different types of content"""
     
-    def __init__(self):
+    def __init__(self, pdf_workers=None):
         self.serp_api_key = Config.SERP_API_KEY
+        self.pdf_workers = pdf_workers if pdf_workers is not None else Config.PDF_EXTRACT_WORKERS
+        self._pdf_pool = None
+        self._pdf_pool_lock = threading.Lock()
     
     def process_text(self, text_content):
         """Process raw text content"""
@@ -36,24 +125,14 @@ class ContentProcessor:
             raise Exception(f"Failed to process text content: {str(e)}")
     
     def process_pdf(self, file_path):
-        """Extract text from PDF file using multiple methods"""
+        """Extract text from PDF file, falling back between backends page by page"""
         try:
-            text_content = ""
+            with PDFPageExtractor(file_path) as extractor:
+                page_count = extractor.page_count
             
-            # Try PyPDF2 first
-            try:
-                with open(file_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    page_count = len(pdf_reader.pages)
-                    
-                    for page_num in range(page_count):
-                        page = pdf_reader.pages[page_num]
-                        page_text = page.extract_text()
-                        if page_text.strip():  # Only add non-empty pages
-                            text_content += page_text + "\n"
-            except Exception as e:
-                logging.warning(f"PyPDF2 extraction failed: {e}, trying alternative method")
-                text_content = self._extract_pdf_with_pdfplumber(file_path)
+            # Shard pages across worker processes for large files
+            pages = self._extract_pdf_pages(file_path, page_count)
+            text_content = "\n".join(page_text for page_text, _ in pages if page_text.strip())
             
             # Clean the extracted text
             cleaned_text = self._clean_text(text_content)
@@ -61,14 +140,19 @@ class ContentProcessor:
             if not cleaned_text.strip():
                 raise Exception("No text could be extracted from the PDF")
             
+            backends = [backend for _, backend in pages]
+            backend_counts = {backend: backends.count(backend) for backend in set(backends)}
+            
             return {
                 'text': cleaned_text,
                 'metadata': {
-                    'page_count': page_count if 'page_count' in locals() else 'unknown',
+                    'page_count': page_count,
                     'word_count': len(cleaned_text.split()),
                     'character_count': len(cleaned_text),
                     'type': 'pdf',
-                    'extraction_method': 'PyPDF2'
+                    'extraction_method': backends[0] if len(backend_counts) == 1 else 'mixed',
+                    'page_backends': backend_counts,
+                    'fallback_pages': [i + 1 for i, backend in enumerate(backends) if backend != 'PyPDF2']
                 }
             }
             
@@ -76,55 +160,63 @@ class ContentProcessor:
             logging.error(f"Error processing PDF: {e}")
             raise Exception(f"Failed to process PDF file: {str(e)}")
     
-    def _extract_pdf_with_pdfplumber(self, file_path):
-        """Alternative PDF extraction using pdfplumber (better for complex layouts)"""
-        try:
-            import pdfplumber
-            
-            text_content = ""
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_content += page_text + "\n"
-            
-            return text_content
-            
-        except ImportError:
-            logging.warning("pdfplumber not available, using basic extraction")
-            # Fallback to basic text extraction if pdfplumber is not available
-            return self._basic_pdf_extraction(file_path)
-        except Exception as e:
-            logging.error(f"pdfplumber extraction failed: {e}")
-            return self._basic_pdf_extraction(file_path)
-    
-    def _basic_pdf_extraction(self, file_path):
-        """Basic PDF text extraction fallback"""
-        try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text_content = ""
-                
-                for page in pdf_reader.pages:
-                    text_content += page.extract_text() + "\n"
+    def iter_pdf_pages(self, file_path):
+        """Lazily yield (page_number, cleaned_text, stats) for each page of a PDF
+        
+        Pages are parsed one at a time and their content streams are released
+        after extraction, so memory stays around one page even for huge scans.
+        """
+        with PDFPageExtractor(file_path) as extractor:
+            for page_index in range(extractor.page_count):
+                start = time.perf_counter()
+                page_text, backend = extractor.extract(page_index)
+                page_text = self._clean_text(page_text)
                 
-                return text_content
-        except Exception as e:
-            logging.error(f"Basic PDF extraction failed: {e}")
-            return "Failed to extract text from PDF file."
+                yield page_index + 1, page_text, {
+                    'page_count': extractor.page_count,
+                    'word_count': len(page_text.split()),
+                    'character_count': len(page_text),
+                    'extract_seconds': round(time.perf_counter() - start, 4),
+                    'extraction_method': backend
+                }
+    
+    def _extract_pdf_pages(self, file_path, page_count):
+        """Extract per-page (text, backend) in page order, in parallel when the document is large enough"""
+        if self.pdf_workers <= 1 or page_count < Config.PDF_PARALLEL_MIN_PAGES:
+            return _extract_pdf_page_range(file_path, 0, page_count)
+        
+        # A few ranges per worker keeps the pool busy when page complexity varies
+        range_count = min(self.pdf_workers * 2, math.ceil(page_count / 8))
+        range_size = math.ceil(page_count / range_count)
+        ranges = [(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)]
+        
+        pool = self._get_pdf_pool()
+        futures = [pool.submit(_extract_pdf_page_range, file_path, start, end) for start, end in ranges]
+        
+        pages = []
+        for future in futures:
+            pages.extend(future.result())
+        return pages
+    
+    def _get_pdf_pool(self):
+        """Lazily create the extraction process pool, reused across uploads"""
+        with self._pdf_pool_lock:
+            if self._pdf_pool is None:
+                # spawn avoids forking a process that already runs request and job threads
+                self._pdf_pool = ProcessPoolExecutor(
+                    max_workers=self.pdf_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pdf_pool
     
     def process_video(self, file_path):
         """Process video file - extract audio and transcribe"""
         try:
-            # Extract audio from video
-            audio_path = self._extract_audio_from_video(file_path)
+            # Extract 16 kHz mono PCM audio from video
+            pcm_audio, audio_source = self._extract_audio_from_video(file_path)
             
             # Transcribe audio to text
-            transcription = self._transcribe_audio(audio_path)
-            
-            # Clean up temporary audio file
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
+            transcription, transcription_metadata = self._transcribe_audio(pcm_audio)
             
             # Clean the transcribed text
             cleaned_text = self._clean_text(transcription)
@@ -135,7 +227,8 @@ class ContentProcessor:
                     'word_count': len(cleaned_text.split()),
                     'character_count': len(cleaned_text),
                     'type': 'video',
-                    'transcription_source': 'whisper'
+                    'audio_extraction': audio_source,
+                    **transcription_metadata
                 }
             }
             
@@ -144,130 +237,188 @@ class ContentProcessor:
             raise Exception(f"Failed to process video file: {str(e)}")
     
     def _extract_audio_from_video(self, video_path):
-        """Extract audio from video file using moviepy"""
+        """Extract audio as raw 16 kHz mono 16-bit PCM bytes
+        
+        ffmpeg decodes only the audio stream and streams PCM to stdout, so no
+        video frames are decoded and nothing is written to disk. moviepy is an
+        optional fallback when ffmpeg is unavailable.
+        
+        Returns (pcm_bytes, extraction_method).
+        """
+        try:
+            return self._extract_audio_with_ffmpeg(video_path), 'ffmpeg'
+        except Exception as e:
+            logging.warning(f"ffmpeg audio extraction failed: {e}, trying moviepy")
+            return self._extract_audio_with_moviepy(video_path), 'moviepy'
+    
+    def _extract_audio_with_ffmpeg(self, video_path):
+        """Decode the audio stream with a single ffmpeg call and read PCM from its stdout"""
+        command = [
+            Config.FFMPEG_BINARY, '-nostdin',
+            '-i', video_path,
+            '-vn',  # No video
+            '-f', 's16le',  # Raw PCM container
+            '-acodec', 'pcm_s16le',  # Audio codec
+            '-ar', str(WHISPER_SAMPLE_RATE),  # Sample rate
+            '-ac', '1',  # Mono channel
+            '-loglevel', 'error',
+            'pipe:1'
+        ]
+        
+        # Read stdout in chunks into one growing buffer; communicate() would hold every
+        # chunk and then a joined copy, doubling peak memory. stderr goes to a file so a
+        # chatty ffmpeg can never block on a full pipe while we read.
+        pcm_audio = bytearray()
+        with tempfile.TemporaryFile() as stderr:
+            with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr) as process:
+                for chunk in iter(lambda: process.stdout.read(PCM_READ_CHUNK_BYTES), b''):
+                    pcm_audio += chunk
+            
+            if process.returncode != 0:
+                stderr.seek(0)
+                raise Exception(f"FFmpeg error: {stderr.read().decode(errors='replace')}")
+        if not pcm_audio:
+            raise Exception("Video has no audio stream")
+        
+        return pcm_audio
+    
+    def _extract_audio_with_moviepy(self, video_path):
+        """Fallback extraction through moviepy (optional dependency) via a temporary WAV file"""
+        try:
+            import moviepy.editor as mp
+        except ImportError:
+            raise Exception("Failed to extract audio from video: ffmpeg failed and moviepy is not installed")
+        
+        temp_audio = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
+        audio_path = temp_audio.name
+        temp_audio.close()
+        
         try:
-            # Create temporary file for audio
-            temp_audio = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
-            audio_path = temp_audio.name
-            temp_audio.close()
-            
-            # Use moviepy to extract audio
             video = mp.VideoFileClip(video_path)
             audio = video.audio
-            audio.write_audiofile(audio_path, verbose=False, logger=None)
+            audio.write_audiofile(audio_path, fps=WHISPER_SAMPLE_RATE, nbytes=2,
+                                  ffmpeg_params=['-ac', '1'], verbose=False, logger=None)
             
             # Clean up
             audio.close()
             video.close()
             
-            return audio_path
+            with wave.open(audio_path, 'rb') as wav:
+                return wav.readframes(wav.getnframes())
             
         except Exception as e:
             logging.error(f"Error extracting audio with moviepy: {e}")
-            # Fallback to ffmpeg if moviepy fails
-            return self._extract_audio_with_ffmpeg(video_path)
-    
-    def _extract_audio_with_ffmpeg(self, video_path):
-        """Fallback method to extract audio using ffmpeg"""
-        try:
-            # Create temporary file for audio
-            temp_audio = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
-            audio_path = temp_audio.name
-            temp_audio.close()
-            
-            # Use ffmpeg to extract audio
-            command = [
-                'ffmpeg', '-i', video_path, 
-                '-vn',  # No video
-                '-acodec', 'pcm_s16le',  # Audio codec
-                '-ar', '16000',  # Sample rate
-                '-ac', '1',  # Mono channel
-                '-y',  # Overwrite output file
-                audio_path
-            ]
-            
-            result = subprocess.run(command, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                raise Exception(f"FFmpeg error: {result.stderr}")
-            
-            return audio_path
-            
-        except Exception as e:
-            logging.error(f"Error extracting audio: {e}")
             raise Exception(f"Failed to extract audio from video: {str(e)}")
+        finally:
+            if os.path.exists(audio_path):
+                os.remove(audio_path)
     
-    def _transcribe_audio(self, audio_path):
-        """Transcribe audio using multiple methods (Whisper preferred, fallback to Google Speech Recognition)"""
+    def _transcribe_audio(self, pcm_audio):
+        """Transcribe 16 kHz mono PCM audio (Whisper preferred, fallback to Google Speech Recognition)
+        
+        Returns (text, metadata) where metadata names the transcription source.
+        """
         try:
             # Try using OpenAI Whisper first (if available)
-            whisper_result = self._transcribe_with_whisper(audio_path)
-            if whisper_result and len(whisper_result.strip()) > 0:
-                return whisper_result
+            whisper_result = self._transcribe_with_whisper(pcm_audio)
+            if whisper_result and len(whisper_result['text'].strip()) > 0:
+                return whisper_result['text'], {
+                    'transcription_source': 'whisper',
+                    'audio_seconds': whisper_result['audio_seconds'],
+                    'transcription_seconds': whisper_result['processing_seconds'],
+                    'real_time_factor': whisper_result['real_time_factor'],
+                    'segments': self._segment_metadata(whisper_result['segments'])
+                }
         except Exception as e:
             logging.warning(f"Whisper transcription failed: {e}, trying Google Speech Recognition")
         
         try:
-            # Fallback to Google Speech Recognition
-            recognizer = sr.Recognizer()
-            
-            with sr.AudioFile(audio_path) as source:
-                # Adjust for ambient noise
-                recognizer.adjust_for_ambient_noise(source)
-                # Record the audio
-                audio = recognizer.record(source)
-            
+            # Fallback to Google Speech Recognition on silence-bounded segments in parallel
+            return self._transcribe_segments(pcm_audio)
+        except Exception as e:
+            logging.error(f"Error transcribing audio: {e}")
+            return "Audio transcription failed. Please check audio quality.", {'transcription_source': 'none'}
+    
+    def _segment_metadata(self, segments):
+        """Timestamps and text offsets for Whisper segments, matching the segmented-recognition format"""
+        _, offsets = stitch_transcripts([segment['text'] for segment in segments], max_overlap_words=0)
+        return [
+            {'start': round(segment['start'], 2), 'end': round(segment['end'], 2), 'text_offset': offset, 'source': 'whisper'}
+            for segment, offset in zip(segments, offsets)
+        ]
+    
+    def _transcribe_segments(self, pcm_audio):
+        """Split audio on silence, recognise segments concurrently and stitch the text back in order"""
+        segments = find_segments(
+            pcm_audio, WHISPER_SAMPLE_RATE,
+            max_seconds=Config.TRANSCRIBE_SEGMENT_SECONDS,
+            min_seconds=Config.TRANSCRIBE_SEGMENT_SECONDS / 3,
+            overlap_seconds=Config.TRANSCRIBE_OVERLAP_SECONDS
+        )
+        
+        # 16-bit samples: two bytes each
+        with ThreadPoolExecutor(max_workers=Config.TRANSCRIBE_WORKERS) as executor:
+            results = list(executor.map(
+                lambda segment: self._recognize_segment(pcm_audio[segment[0] * 2:segment[1] * 2]),
+                segments
+            ))
+        
+        texts = [text for text, _ in results]
+        sources = {source for text, source in results if text}
+        text, offsets = stitch_transcripts(texts)
+        
+        if not text:
+            return "Audio transcription failed - speech not clearly audible.", {'transcription_source': 'google'}
+        
+        return text, {
+            'transcription_source': sources.pop() if len(sources) == 1 else 'mixed',
+            'audio_seconds': round(len(pcm_audio) / 2 / WHISPER_SAMPLE_RATE, 2),
+            'segments': [
+                {
+                    'start': round(start / WHISPER_SAMPLE_RATE, 2),
+                    'end': round(end / WHISPER_SAMPLE_RATE, 2),
+                    'text_offset': offset,
+                    'source': source
+                }
+                for (start, end), offset, (_, source) in zip(segments, offsets, results)
+            ]
+        }
+    
+    def _recognize_segment(self, pcm_segment):
+        """Recognise one segment with Google, falling back to offline recognition; returns (text, source)"""
+        audio = sr.AudioData(pcm_segment, WHISPER_SAMPLE_RATE, 2)
+        recognizer = sr.Recognizer()
+        try:
             # Use Google Speech Recognition (free tier)
-            text = recognizer.recognize_google(audio)
-            return text
-            
+            return recognizer.recognize_google(audio), 'google'
         except sr.UnknownValueError:
-            logging.warning("Speech recognition could not understand audio")
-            return "Audio transcription failed - speech not clearly audible."
+            # Silence or unintelligible speech in this segment only
+            return '', 'google'
         except sr.RequestError as e:
             logging.error(f"Could not request results from Google Speech Recognition service: {e}")
             # Fallback to local speech recognition if available
-            return self._transcribe_with_local_recognition(audio_path)
-        except Exception as e:
-            logging.error(f"Error transcribing audio: {e}")
-            return "Audio transcription failed. Please check audio quality."
+            try:
+                return recognizer.recognize_sphinx(audio), 'sphinx'
+            except Exception as e:
+                logging.error(f"Local speech recognition error: {e}")
+                return '', 'failed'
     
-    def _transcribe_with_whisper(self, audio_path):
-        """Transcribe audio using OpenAI Whisper (if installed)"""
-        try:
-            import whisper
-            
-            # Load the model (base model for balance of speed and accuracy)
-            model = whisper.load_model("base")
-            
-            # Transcribe the audio
-            result = model.transcribe(audio_path)
-            
-            return result["text"]
-            
-        except ImportError:
+    def _transcribe_with_whisper(self, pcm_audio):
+        """Transcribe audio using OpenAI Whisper (if installed) via the shared worker that keeps the model loaded"""
+        worker = get_transcription_worker()
+        if not worker.is_available():
             logging.info("Whisper not installed, falling back to other methods")
             return None
-        except Exception as e:
-            logging.error(f"Whisper transcription error: {e}")
-            return None
-    
-    def _transcribe_with_local_recognition(self, audio_path):
-        """Fallback transcription using offline speech recognition"""
+        
         try:
-            recognizer = sr.Recognizer()
-            
-            with sr.AudioFile(audio_path) as source:
-                audio = recognizer.record(source)
-            
-            # Try offline recognition (requires additional setup)
-            # This is a fallback and may not work without proper setup
-            text = recognizer.recognize_sphinx(audio)
-            return text
+            import numpy as np
             
+            # Whisper takes float32 samples in [-1, 1]
+            samples = np.frombuffer(pcm_audio, dtype=np.int16).astype(np.float32) / 32768.0
+            return worker.transcribe(samples, timeout=Config.WHISPER_TIMEOUT)
         except Exception as e:
-            logging.error(f"Local speech recognition error: {e}")
-            return "Audio transcription service temporarily unavailable."
+            logging.error(f"Whisper transcription error: {e}")
+            return None
     
     def _clean_text(self, text):
         """Clean and format text content"""
@@ -0,0 +1,124 @@
+import queue
+import threading
+import logging
+import time
+import traceback
+from datetime import datetime, timedelta
+
+
+class JobQueue:
+    """Local worker pool that processes background jobs stored in MongoDB"""
+
+    def __init__(self, db, handler, num_workers=2, heartbeat_interval=60, stale_after=300):
+        self.db = db
+        self.handler = handler
+        self.num_workers = max(1, num_workers)
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self._queue = queue.Queue()
+        self._workers = []
+        self._running = set()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        """Start worker threads and re-enqueue jobs left over from a previous run
+
+        Safe to call repeatedly (e.g. on every request); only the first call does anything.
+        """
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+            for i in range(self.num_workers):
+                worker = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True).start()
+
+        try:
+            for job_id in self.db.get_pending_job_ids() + self.db.get_stale_job_ids(self._stale_before()):
+                self._queue.put(job_id)
+        except Exception as e:
+            logging.warning(f"Could not recover pending jobs: {e}")
+
+    def enqueue(self, user_id, content_id, job_type, payload):
+        """Persist a job record and hand it to the worker pool"""
+        job_id = self.db.create_job(user_id, content_id, job_type, payload)
+        self.start()
+        self._queue.put(job_id)
+        return job_id
+
+    def report_progress(self, job_id, stage, progress):
+        """Record the current stage and percentage of a running job"""
+        try:
+            self.db.update_job(job_id, {'stage': stage, 'progress': progress})
+        except Exception as e:
+            logging.warning(f"Could not update progress for job {job_id}: {e}")
+
+    def pending_count(self):
+        """Number of jobs waiting for a free worker"""
+        return self._queue.qsize()
+
+    def _worker_loop(self):
+        """Pull job IDs off the queue and run them until the process exits"""
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run_job(job_id)
+            finally:
+                self._queue.task_done()
+
+    def _heartbeat_loop(self):
+        """Keep this process's running jobs fresh and pick up jobs whose worker died"""
+        while True:
+            time.sleep(self.heartbeat_interval)
+            with self._lock:
+                running = list(self._running)
+            try:
+                if running:
+                    self.db.touch_jobs(running)
+                for job_id in self.db.get_stale_job_ids(self._stale_before()):
+                    self._queue.put(job_id)
+            except Exception as e:
+                logging.warning(f"Job heartbeat failed: {e}")
+
+    def _stale_before(self):
+        """Running jobs not updated since this time are assumed abandoned"""
+        return datetime.utcnow() - timedelta(seconds=self.stale_after)
+
+    def _run_job(self, job_id):
+        """Claim and execute a single job, recording the outcome"""
+        job = self.db.claim_job(job_id, stale_before=self._stale_before())
+        if not job:
+            # Already claimed by another worker or process
+            return
+
+        with self._lock:
+            self._running.add(job_id)
+        try:
+            self._execute(job_id, job)
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+
+    def _execute(self, job_id, job):
+        """Run the handler for a claimed job and record its outcome"""
+        try:
+            result = self.handler(job, lambda stage, progress: self.report_progress(job_id, stage, progress))
+            self.db.update_job(job_id, {
+                'status': 'completed',
+                'stage': 'completed',
+                'progress': 100,
+                'result': result or {}
+            })
+        except Exception as e:
+            logging.error(f"Job {job_id} failed: {e}\n{traceback.format_exc()}")
+            self.db.update_job(job_id, {
+                'status': 'failed',
+                'stage': 'failed',
+                'error': str(e)
+            })
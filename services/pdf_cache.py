@@ -0,0 +1,129 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+
+
+class PDFCache:
+    """Content-addressed on-disk store of rendered PDFs with size-bounded LRU eviction
+
+    Files are named by the hash of everything that shapes the document, so a key doubles
+    as a strong ETag. Last access time is tracked through the file mtime.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._scan())
+
+    @staticmethod
+    def make_key(kind, title, data, template_version):
+        """Hash of the document kind, title, artifact payload(s) and template version"""
+        descriptor = json.dumps({
+            'kind': kind,
+            'title': title,
+            'data': data,
+            'template': template_version
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(descriptor.encode('utf-8')).hexdigest()
+
+    def open(self, key):
+        """Open a cached PDF for reading, or return None
+
+        The open handle stays valid even if the file is evicted while it is being sent.
+        """
+        path = self._path(key)
+        try:
+            handle = open(path, 'rb')
+        except FileNotFoundError:
+            with self._lock:
+                self._stats['misses'] += 1
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self._stats['hits'] += 1
+        return handle
+
+    def put(self, key, pdf_bytes):
+        """Store rendered PDF bytes and return an open handle to them"""
+        def write(temp_path):
+            with open(temp_path, 'wb') as f:
+                f.write(pdf_bytes)
+        return self.put_file(key, write)
+
+    def put_file(self, key, write):
+        """Store a PDF produced by write(temp_path) and return an open handle to it
+
+        The renderer writes straight into the store, so the document is never held in memory.
+        """
+        path = self._path(key)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            write(temp_path)
+            size = os.path.getsize(temp_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        with self._lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temp_path, path)
+            self._total_bytes += size - previous
+            self._stats['stores'] += 1
+
+        handle = open(path, 'rb')
+        self._evict()
+        return handle
+
+    def stats(self):
+        """Hit/miss counters and current disk usage"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['total_bytes'] = self._total_bytes
+        stats['max_bytes'] = self.max_bytes
+        return stats
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _scan(self):
+        """(mtime, path, size) for every cached PDF"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.pdf'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def _evict(self):
+        """Delete least recently used PDFs until the store fits in max_bytes"""
+        with self._lock:
+            if self._total_bytes <= self.max_bytes:
+                return
+            entries = sorted(self._scan())
+            self._total_bytes = sum(size for _, _, size in entries)
+            for _, path, size in entries:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logging.warning(f"Could not evict cached PDF {path}: {e}")
+                    continue
+                self._total_bytes -= size
+                self._stats['evictions'] += 1
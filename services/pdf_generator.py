@@ -4,15 +4,24 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib.colors import Color, black, blue, green, red, orange
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
-from io import BytesIO
+import tempfile
 import json
 from datetime import datetime
+from config import Config
 
 class PDFGenerator:
+    # Bump when layout or styles change so cached renders are not reused
+    TEMPLATE_VERSION = 1
+    
     def __init__(self):
         self.styles = getSampleStyleSheet()
         self.custom_styles = self._create_custom_styles()
     
+    @staticmethod
+    def spooled_output():
+        """Output file kept in memory up to PDF_SPOOL_MAX_BYTES, then rolled over to disk"""
+        return tempfile.SpooledTemporaryFile(max_size=Config.PDF_SPOOL_MAX_BYTES)
+    
     def _create_custom_styles(self):
         """Create custom styles for different content types"""
         styles = {}
@@ -83,9 +92,9 @@ class PDFGenerator:
         
         return styles
     
-    def generate_summary_pdf(self, content, summary_data):
+    def generate_summary_pdf(self, content, summary_data, output=None):
         """Generate PDF for summary"""
-        buffer = BytesIO()
+        buffer = output if output is not None else self.spooled_output()
         doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72,
                               topMargin=72, bottomMargin=18)
         
@@ -142,9 +151,9 @@ class PDFGenerator:
         buffer.seek(0)
         return buffer
     
-    def generate_notes_pdf(self, content, notes_data):
+    def generate_notes_pdf(self, content, notes_data, output=None):
         """Generate PDF for notes"""
-        buffer = BytesIO()
+        buffer = output if output is not None else self.spooled_output()
         doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72,
                               topMargin=72, bottomMargin=18)
         
@@ -214,9 +223,9 @@ class PDFGenerator:
         buffer.seek(0)
         return buffer
     
-    def generate_quiz_pdf(self, content, quiz_data, user_answers=None):
+    def generate_quiz_pdf(self, content, quiz_data, user_answers=None, output=None):
         """Generate PDF for quiz"""
-        buffer = BytesIO()
+        buffer = output if output is not None else self.spooled_output()
         doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72,
                               topMargin=72, bottomMargin=18)
         
@@ -292,9 +301,9 @@ class PDFGenerator:
         buffer.seek(0)
         return buffer
     
-    def generate_report_pdf(self, content, summary_data, notes_data, quiz_data):
+    def generate_report_pdf(self, content, summary_data, notes_data, quiz_data, output=None):
         """Generate comprehensive report PDF"""
-        buffer = BytesIO()
+        buffer = output if output is not None else self.spooled_output()
         doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72,
                               topMargin=72, bottomMargin=18)
         
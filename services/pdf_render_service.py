@@ -0,0 +1,191 @@
+import bisect
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from config import Config
+
+# Upper bounds (seconds) of the render-time histogram buckets; the last bucket is unbounded
+RENDER_TIME_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Per-process generator, built once by the pool initializer so styles are ready for every render
+_generator = None
+
+
+def _init_worker():
+    global _generator
+    from services.pdf_generator import PDFGenerator
+    _generator = PDFGenerator()
+
+
+def _render(kind, args, output_path=None, generator=None):
+    """Run PDFGenerator.generate_<kind>_pdf, writing to output_path if given, else returning the PDF bytes"""
+    generate = getattr(generator or _generator, f'generate_{kind}_pdf')
+    if output_path is None:
+        with generate(*args) as output:
+            return output.read()
+
+    # Pages go straight to disk, so the document never crosses the process boundary
+    with open(output_path, 'wb') as output:
+        generate(*args, output=output)
+    return None
+
+
+def _ping():
+    return True
+
+
+class PDFRenderService:
+    """Renders PDFs in a pool of worker processes so ReportLab layout does not hold the request thread's GIL"""
+
+    def __init__(self, workers=None, timeout=None):
+        self.workers = Config.PDF_RENDER_WORKERS if workers is None else workers
+        self.timeout = timeout or Config.PDF_RENDER_TIMEOUT
+        self._pool = None
+        self._pool_futures = {}  # pool -> futures submitted to it that have not finished
+        self._pool_lock = threading.Lock()
+        # One slot per worker: a render is only submitted when a process is free to start it,
+        # so waiting for a worker never counts toward the render timeout
+        self._slots = threading.BoundedSemaphore(max(self.workers, 1))
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self._histograms = {}
+        self._stats = {'renders': 0, 'failures': 0, 'timeouts': 0, 'pool_restarts': 0}
+
+    def render(self, kind, content, *data, output_path=None):
+        """Render a summary, notes, quiz or report PDF
+
+        Only the title of content is shipped to the worker; data is the artifact payload(s).
+        With output_path the worker writes the file itself and None is returned, otherwise
+        the PDF bytes are returned. Raises TimeoutError if the render takes longer than the
+        configured timeout.
+        """
+        args = ({'title': content.get('title')},) + data
+        start = time.perf_counter()
+
+        with self._stats_lock:
+            self._in_flight += 1
+        try:
+            if self.workers <= 0:
+                # In-process rendering (PDF_RENDER_WORKERS=0)
+                from services.pdf_generator import PDFGenerator
+                return _render(kind, args, output_path, generator=PDFGenerator())
+
+            with self._slots:
+                pool, future = self._submit(kind, args, output_path)
+                try:
+                    return future.result(timeout=self.timeout)
+                except FutureTimeoutError:
+                    with self._stats_lock:
+                        self._stats['timeouts'] += 1
+                    # A process stuck in layout can't be cancelled, so retire its pool
+                    self._retire_pool(pool, future)
+                    raise TimeoutError(f"Rendering {kind} PDF took longer than {self.timeout}s")
+        except Exception:
+            with self._stats_lock:
+                self._stats['failures'] += 1
+            raise
+        finally:
+            self._record(kind, time.perf_counter() - start)
+
+    def warm(self):
+        """Start every worker process now so the first downloads don't pay for spawning and style setup"""
+        if self.workers <= 0:
+            return
+        pool = self._get_pool()
+        for future in [pool.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def stats(self):
+        """Queue depth, counters and per-kind render-time histograms"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            stats['workers'] = self.workers
+            stats['queue_depth'] = max(0, self._in_flight - max(self.workers, 1))
+            stats['in_flight'] = self._in_flight
+            stats['render_seconds'] = {
+                kind: {
+                    'count': histogram['count'],
+                    'sum': round(histogram['sum'], 3),
+                    'buckets': {
+                        (f'le_{bound}' if bound is not None else 'inf'): count
+                        for bound, count in zip(RENDER_TIME_BUCKETS + (None,), histogram['buckets'])
+                    }
+                }
+                for kind, histogram in self._histograms.items()
+            }
+        return stats
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _record(self, kind, seconds):
+        with self._stats_lock:
+            self._in_flight -= 1
+            self._stats['renders'] += 1
+            histogram = self._histograms.setdefault(kind, {
+                'count': 0,
+                'sum': 0.0,
+                'buckets': [0] * (len(RENDER_TIME_BUCKETS) + 1)
+            })
+            histogram['count'] += 1
+            histogram['sum'] += seconds
+            histogram['buckets'][bisect.bisect_left(RENDER_TIME_BUCKETS, seconds)] += 1
+
+    def _get_pool(self):
+        """Create the worker pool on first use"""
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn avoids forking a process that holds Flask, Mongo and thread state
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker
+                )
+                self._pool_futures[self._pool] = set()
+            return self._pool
+
+    def _submit(self, kind, args, output_path):
+        """Submit a render to the current pool and track it until it finishes"""
+        pool = self._get_pool()
+        future = pool.submit(_render, kind, args, output_path)
+        with self._pool_lock:
+            self._pool_futures.setdefault(pool, set()).add(future)
+
+        def untrack(done):
+            with self._pool_lock:
+                self._pool_futures.get(pool, set()).discard(done)
+        future.add_done_callback(untrack)
+        return pool, future
+
+    def _retire_pool(self, pool, hung_future):
+        """Send new renders to a fresh pool; stop the old one once its other renders have finished
+
+        Only the hung render fails: renders already running in the old pool complete normally
+        (or hit their own timeout) before its processes, including the hung one, are killed.
+        """
+        with self._pool_lock:
+            if self._pool is not pool:
+                return  # Already retired by another timed-out render
+            self._pool = None
+            others = [f for f in self._pool_futures.get(pool, ()) if f is not hung_future]
+
+        with self._stats_lock:
+            self._stats['pool_restarts'] += 1
+        logging.warning("Retiring PDF render pool after a render timed out")
+
+        def drain():
+            wait(others, timeout=self.timeout)
+            # ProcessPoolExecutor has no public way to stop a running task
+            processes = list((getattr(pool, '_processes', None) or {}).values())
+            pool.shutdown(wait=False, cancel_futures=True)
+            for process in processes:
+                process.terminate()
+            with self._pool_lock:
+                self._pool_futures.pop(pool, None)
+
+        threading.Thread(target=drain, name='pdf-render-pool-drain', daemon=True).start()
@@ -0,0 +1,151 @@
+import random
+import threading
+import time
+from datetime import datetime
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that the circuit breaker considers unhealthy"""
+
+
+class TokenBucketLimiter:
+    """Client-side limit on requests per minute and prompt tokens per minute
+
+    Each limit is a bucket that refills continuously; acquire() blocks until both
+    buckets hold enough for the call.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._stats = {'acquired': 0, 'throttled': 0, 'wait_seconds': 0.0}
+
+    def acquire(self, tokens=0):
+        """Block until one request and the given number of tokens are available"""
+        # A single prompt larger than the whole budget waits for a full bucket
+        tokens = min(tokens, self.tokens_per_minute)
+        waited = 0.0
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    self._stats['acquired'] += 1
+                    if waited:
+                        self._stats['throttled'] += 1
+                        self._stats['wait_seconds'] += waited
+                    return waited
+
+                wait = max(
+                    (1 - self._requests) * 60.0 / self.requests_per_minute,
+                    (tokens - self._tokens) * 60.0 / self.tokens_per_minute,
+                    0.01
+                )
+            time.sleep(wait)
+            waited += wait
+
+    def stats(self):
+        """Current bucket levels and how often callers had to wait"""
+        with self._lock:
+            self._refill()
+            stats = dict(self._stats)
+            stats['wait_seconds'] = round(stats['wait_seconds'], 3)
+            stats['requests_available'] = round(self._requests, 2)
+            stats['tokens_available'] = int(self._tokens)
+        stats['requests_per_minute'] = self.requests_per_minute
+        stats['tokens_per_minute'] = self.tokens_per_minute
+        return stats
+
+    def _refill(self):
+        """Top up both buckets for the time since the last refill (lock held)"""
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60.0)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60.0)
+
+
+class CircuitBreaker:
+    """Stops calling an upstream after repeated failures and probes it again after a cool-down
+
+    closed: calls pass through. open: calls fail fast with CircuitOpenError until
+    reset_seconds have passed. half_open: a single trial call decides whether to close
+    again or re-open.
+    """
+
+    def __init__(self, failure_threshold=5, reset_seconds=60):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._state = 'closed'
+        self._failures = 0
+        self._opened_at = None
+        self._opened_wall = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self._stats = {'times_opened': 0, 'rejected': 0}
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call must not reach the upstream"""
+        with self._lock:
+            if self._state == 'open':
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    self._stats['rejected'] += 1
+                    raise CircuitOpenError('AI service temporarily unavailable')
+                self._state = 'half_open'
+
+            if self._state == 'half_open':
+                if self._trial_in_flight:
+                    self._stats['rejected'] += 1
+                    raise CircuitOpenError('AI service temporarily unavailable')
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._state = 'closed'
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == 'half_open' or self._failures >= self.failure_threshold:
+                if self._state != 'open':
+                    self._stats['times_opened'] += 1
+                self._state = 'open'
+                self._opened_at = time.monotonic()
+                self._opened_wall = datetime.utcnow()
+
+    def release(self):
+        """End a call that neither proved nor disproved upstream health"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def stats(self):
+        """Breaker state, consecutive failures and when it last opened"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['state'] = self._state
+            stats['consecutive_failures'] = self._failures
+            stats['failure_threshold'] = self.failure_threshold
+            if self._state == 'open':
+                remaining = self.reset_seconds - (time.monotonic() - self._opened_at)
+                stats['retry_in_seconds'] = round(max(0.0, remaining), 1)
+                stats['opened_at'] = self._opened_wall.isoformat()
+        return stats
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    """Full-jitter exponential backoff: a random delay up to base_delay * 2^attempt, capped at max_delay"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
@@ -0,0 +1,52 @@
+import copy
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution whose result all callers share"""
+
+    def __init__(self):
+        self._calls = {}  # key -> Future of the in-flight call
+        self._lock = threading.Lock()
+        self._stats = {'executions': 0, 'collapsed': 0}
+
+    def do(self, key, fn):
+        """Run fn() unless an identical call is already in flight, in which case wait for its result
+
+        Exceptions from fn() are raised to every caller. Waiters get their own copy of the result.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self._stats['executions'] += 1
+            else:
+                self._stats['collapsed'] += 1
+
+        if not leader:
+            return copy.deepcopy(future.result())
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            # Waiters copy from a private snapshot, so the leader's caller may mutate its result freely
+            future.set_result(copy.deepcopy(result))
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self):
+        """How many calls ran and how many were served by joining an in-flight call"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        total = stats['executions'] + stats['collapsed']
+        stats['collapse_rate'] = round(stats['collapsed'] / total, 3) if total else 0.0
+        return stats
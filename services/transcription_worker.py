@@ -0,0 +1,149 @@
+import queue
+import threading
+import time
+import wave
+import logging
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from config import Config
+
+# Whisper always resamples input to 16 kHz mono
+WHISPER_SAMPLE_RATE = 16000
+
+
+class TranscriptionWorker:
+    """Long-lived worker thread that loads the Whisper model once and serves transcription jobs"""
+
+    def __init__(self, model_size=None):
+        self.model_size = model_size or Config.WHISPER_MODEL
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._model = None
+        self._stats = {
+            'model_size': self.model_size,
+            'model_loaded': False,
+            'load_seconds': None,
+            'jobs_completed': 0,
+            'jobs_failed': 0,
+            'audio_seconds': 0.0,
+            'processing_seconds': 0.0,
+            'last_real_time_factor': None
+        }
+
+    @staticmethod
+    def is_available():
+        """Whether the optional whisper package is installed"""
+        try:
+            import whisper  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def transcribe(self, audio, timeout=None):
+        """Queue audio (file path or 16 kHz float32 array) and wait for the transcription result
+
+        On timeout a job that has not started yet is cancelled, so the worker never spends
+        time on audio nobody is waiting for.
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((audio, future))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def stats(self):
+        """Model load time and real-time factor (processing time / audio duration) of served jobs"""
+        with self._lock:
+            stats = dict(self._stats)
+        if stats['audio_seconds']:
+            stats['average_real_time_factor'] = round(stats['processing_seconds'] / stats['audio_seconds'], 3)
+        stats['queue_depth'] = self._queue.qsize()
+        return stats
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='whisper-worker', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        """Serve jobs one at a time; the model is loaded on the first job and kept for the process lifetime"""
+        while True:
+            audio, future = self._queue.get()
+            # Skip jobs whose caller timed out while they were queued
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self._transcribe(audio))
+            except Exception as e:
+                with self._lock:
+                    self._stats['jobs_failed'] += 1
+                future.set_exception(e)
+
+    def _load_model(self):
+        if self._model is None:
+            import whisper
+
+            start = time.perf_counter()
+            self._model = whisper.load_model(self.model_size)
+            load_seconds = time.perf_counter() - start
+            logging.info(f"Loaded Whisper '{self.model_size}' model in {load_seconds:.1f}s")
+
+            with self._lock:
+                self._stats['model_loaded'] = True
+                self._stats['load_seconds'] = round(load_seconds, 2)
+        return self._model
+
+    def _transcribe(self, audio):
+        model = self._load_model()
+
+        start = time.perf_counter()
+        result = model.transcribe(audio)
+        processing_seconds = time.perf_counter() - start
+
+        audio_seconds = self._audio_duration(audio, result)
+        real_time_factor = round(processing_seconds / audio_seconds, 3) if audio_seconds else None
+
+        with self._lock:
+            self._stats['jobs_completed'] += 1
+            self._stats['audio_seconds'] += audio_seconds
+            self._stats['processing_seconds'] += processing_seconds
+            self._stats['last_real_time_factor'] = real_time_factor
+
+        return {
+            'text': result['text'],
+            'segments': [
+                {'start': segment['start'], 'end': segment['end'], 'text': segment['text']}
+                for segment in result.get('segments', [])
+            ],
+            'audio_seconds': round(audio_seconds, 2),
+            'processing_seconds': round(processing_seconds, 2),
+            'real_time_factor': real_time_factor
+        }
+
+    def _audio_duration(self, audio, result):
+        """Duration of the input audio in seconds"""
+        if not isinstance(audio, str):
+            return len(audio) / WHISPER_SAMPLE_RATE
+        try:
+            with wave.open(audio, 'rb') as wav:
+                return wav.getnframes() / float(wav.getframerate())
+        except Exception:
+            segments = result.get('segments') or []
+            return segments[-1]['end'] if segments else 0.0
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_transcription_worker():
+    """Process-wide transcription worker, so the model is shared by all requests and jobs"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = TranscriptionWorker()
+        return _worker
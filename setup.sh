@@ -41,7 +41,8 @@ echo "   - SERP_API_KEY (optional for web search enhancement)"
 echo "2. Install system dependencies:"
 echo "   - sudo apt-get install ffmpeg (for video processing)"
 echo "   - sudo apt-get install portaudio19-dev (for speech recognition)"
-echo "3. Run the application: python app.py"
+echo "3. Create database indexes: flask --app app create-indexes"
+echo "4. Run the application: python app.py"
 echo ""
 echo "API will be available at: http://localhost:5000"
 echo "API Documentation: See API_DOCUMENTATION.md"
@@ -116,8 +116,8 @@ function handleFileUpload(file, uploadArea) {
     .then(data => {
         if (data.content_id) {
             showSuccessMessage('File uploaded successfully!');
-            // Redirect to content options
-            window.location.href = `/content/${data.content_id}/options`;
+            // Redirect to processing page, which waits for the background job
+            window.location.href = `/processing/${data.content_id}`;
         } else {
             throw new Error(data.error || 'Upload failed');
         }
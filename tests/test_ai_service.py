@@ -0,0 +1,366 @@
+import json
+import time
+from services.ai_cache import AICache
+from services.ai_service import AIService
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeModel:
+    """Stand-in for the Gemini model that counts calls"""
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        return FakeResponse(json.dumps(self.payload))
+
+class TestAICache:
+    """Test the two-tier AI generation cache"""
+
+    def test_key_depends_on_params(self):
+        """Different parameters must not share a cache entry"""
+        key_5 = AICache.make_key('quiz', 'text', 'english', {'num_questions': 5}, 'model')
+        key_10 = AICache.make_key('quiz', 'text', 'english', {'num_questions': 10}, 'model')
+        key_hindi = AICache.make_key('quiz', 'text', 'hindi', {'num_questions': 5}, 'model')
+        assert len({key_5, key_10, key_hindi}) == 3
+
+    def test_lru_eviction(self):
+        """Least recently used entries are evicted first"""
+        cache = AICache(max_entries=2)
+        cache.set('a', {'v': 1})
+        cache.set('b', {'v': 2})
+        cache.get('a')
+        cache.set('c', {'v': 3})
+
+        assert cache.get('a') == {'v': 1}
+        assert cache.get('b') is None
+        assert cache.stats()['evictions'] == 1
+
+    def test_ttl_expiry(self):
+        """Expired entries are treated as misses"""
+        cache = AICache(ttl_seconds=-1)
+        cache.set('a', {'v': 1})
+        assert cache.get('a') is None
+
+    def test_returned_values_are_copies(self):
+        """Mutating a cached result must not change the stored entry"""
+        cache = AICache()
+        cache.set('a', {'points': [1]})
+        cache.get('a')['points'].append(2)
+        assert cache.get('a') == {'points': [1]}
+
+    def test_invalidate_content(self):
+        """Every entry generated from a content hash is dropped"""
+        import hashlib
+        cache = AICache()
+        summary_key = AICache.make_key('summary', 'doomed text', 'english')
+        quiz_key = AICache.make_key('quiz', 'doomed text', 'english', {'num_questions': 5})
+        other_key = AICache.make_key('summary', 'kept text', 'english')
+        for key in (summary_key, quiz_key, other_key):
+            cache.set(key, {'v': key})
+
+        cache.invalidate_content([hashlib.sha256(b'doomed text').hexdigest()])
+
+        assert cache.get(summary_key) is None
+        assert cache.get(quiz_key) is None
+        assert cache.get(other_key) == {'v': other_key}
+
+class TestAIServiceCaching:
+    """Test that AIService serves repeat generations from the cache"""
+
+    def test_summary_is_generated_once(self):
+        service = AIService(cache=AICache())
+        service.model = FakeModel({'main_topic': 'Topic', 'key_points': ['a']})
+
+        first = service.generate_summary('some content', 'english')
+        second = service.generate_summary('some content', 'english')
+
+        assert first == second
+        assert service.model.calls == 1
+        assert service.cache_stats()['memory_hits'] == 1
+
+    def test_errors_are_not_cached(self):
+        service = AIService(cache=AICache())
+        service.model = None
+
+        service.generate_notes('some content', 'english')
+        assert service.cache_stats()['stores'] == 0
+
+class TestSingleFlight:
+    """Test that identical concurrent generations share one model call"""
+
+    def test_concurrent_identical_requests_are_collapsed(self):
+        import threading
+
+        class SlowModel(FakeModel):
+            def generate_content(self, prompt):
+                time.sleep(0.3)
+                return super().generate_content(prompt)
+
+        service = AIService(cache=AICache())
+        service.model = SlowModel({'main_topic': 'Topic', 'key_points': ['a']})
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(service.generate_summary('shared lecture', 'english')))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert service.model.calls == 1
+        assert len(results) == 8
+        assert all(result['main_topic'] == 'Topic' for result in results)
+        stats = service.single_flight_stats()
+        assert stats['executions'] == 1
+        assert stats['collapsed'] == 7
+        assert stats['in_flight'] == 0
+
+    def test_request_after_flight_finished_reads_cache(self, monkeypatch):
+        service = AIService(cache=AICache())
+        service.model = FakeModel({'main_topic': 'Topic', 'key_points': ['a']})
+        service.generate_summary('shared lecture', 'english')
+
+        # Simulate a request whose first cache lookup raced the finishing flight
+        lookups = iter([None])
+        get = service.cache.get
+        monkeypatch.setattr(service.cache, 'get', lambda key: next(lookups, None) or get(key))
+
+        assert service.generate_summary('shared lecture', 'english')['main_topic'] == 'Topic'
+        assert service.model.calls == 1
+
+    def test_errors_reach_every_waiter_and_are_not_remembered(self):
+        import threading
+        from services.single_flight import SingleFlight
+
+        flight = SingleFlight()
+        started = threading.Event()
+        errors = []
+
+        def failing():
+            started.set()
+            time.sleep(0.2)
+            raise ValueError('upstream down')
+
+        def call():
+            try:
+                flight.do('key', failing)
+            except ValueError as e:
+                errors.append(str(e))
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=call)
+        follower.start()
+        leader.join()
+        follower.join()
+
+        assert errors == ['upstream down', 'upstream down']
+        assert flight.do('key', lambda: 'recovered') == 'recovered'
+
+class TestConcurrentGeneration:
+    """Test fan-out of independent generations"""
+
+    def test_tasks_run_in_parallel(self):
+        service = AIService(cache=AICache())
+
+        def slow(value):
+            time.sleep(0.3)
+            return {'value': value}
+
+        start = time.monotonic()
+        results = service.run_concurrently({
+            'a': lambda: slow(1),
+            'b': lambda: slow(2),
+            'c': lambda: slow(3)
+        })
+        elapsed = time.monotonic() - start
+
+        assert results == {'a': {'value': 1}, 'b': {'value': 2}, 'c': {'value': 3}}
+        assert elapsed < 0.8
+
+    def test_partial_results_on_failure_and_timeout(self):
+        service = AIService(cache=AICache())
+
+        def boom():
+            raise ValueError('bad')
+
+        results = service.run_concurrently({
+            'ok': lambda: {'value': 1},
+            'failed': boom,
+            'slow': lambda: time.sleep(1) or {'value': 2}
+        }, timeout=0.2)
+
+        assert results['ok'] == {'value': 1}
+        assert 'error' in results['failed']
+        assert 'error' in results['slow']
+
+    def test_timeout_starts_when_task_starts(self):
+        from concurrent.futures import ThreadPoolExecutor
+        service = AIService(cache=AICache())
+        executor = ThreadPoolExecutor(max_workers=1)
+
+        def slow(value):
+            time.sleep(0.15)
+            return {'value': value}
+
+        # Each task fits its timeout, but the last one only starts after the others
+        results = service.run_concurrently({name: (lambda name=name: slow(name)) for name in 'abc'},
+                                           timeout=0.3, executor=executor)
+        executor.shutdown()
+
+        assert results == {'a': {'value': 'a'}, 'b': {'value': 'b'}, 'c': {'value': 'c'}}
+
+    def test_study_materials(self):
+        service = AIService(cache=AICache())
+        service.model = FakeModel({'title': 'T', 'questions': [], 'main_topic': 'M'})
+
+        materials = service.generate_study_materials('some content', 'english', num_questions=5)
+        assert set(materials) == {'summary', 'notes', 'quiz'}
+        assert service.model.calls == 3
+
+class TestChunkedGeneration:
+    """Test map-reduce generation over long documents"""
+
+    def test_long_content_is_chunked(self, monkeypatch):
+        from config import Config
+        monkeypatch.setattr(Config, 'AI_CHUNK_TOKENS', 50)
+        service = AIService(cache=AICache())
+        service.model = FakeModel({'main_topic': 'Topic', 'key_points': ['a'], 'questions': [
+            {'id': 1, 'question': 'Same question?'}
+        ]})
+
+        content = ' '.join(f'Sentence {i} about the topic.' for i in range(100))
+        summary = service.generate_summary(content, 'english')
+        assert service.model.calls > 1
+        assert summary['main_topic'] == 'Topic'
+        assert summary['key_points'] == ['a']
+
+        quiz = service.generate_quiz(content, 'english', 5)
+        assert quiz['total_questions'] == 1
+
+    def test_quiz_with_more_chunks_than_questions(self, monkeypatch):
+        from config import Config
+        monkeypatch.setattr(Config, 'AI_CHUNK_TOKENS', 50)
+        service = AIService(cache=AICache())
+        service.model = FakeModel({'questions': [{'id': i, 'question': f'Question {i}?'} for i in range(3)]})
+
+        content = ' '.join(f'Sentence {i} about the topic.' for i in range(100))
+        quiz = service.generate_quiz(content, 'english', 2)
+        # Only the chunks given a question are sent to the model
+        assert service.model.calls == 2
+        assert quiz['total_questions'] <= 2
+
+    def test_partial_merge_is_marked_and_not_cached(self, monkeypatch):
+        from config import Config
+        monkeypatch.setattr(Config, 'AI_CHUNK_TOKENS', 50)
+        service = AIService(cache=AICache())
+        service.model = FakeModel({'main_topic': 'Topic', 'key_points': ['a']})
+        content = ' '.join(f'Sentence {i} about the topic.' for i in range(100))
+
+        failing = {'first': True}
+        generate = service._generate_summary
+
+        def flaky_summary(chunk, language):
+            if failing.pop('first', False):
+                return {'error': 'chunk failed'}
+            return generate(chunk, language)
+
+        monkeypatch.setattr(service, '_generate_summary', flaky_summary)
+        summary = service.generate_summary(content, 'english')
+        assert summary['partial'] is True
+        assert len(summary['missing_chunks']) == 1
+
+        calls = service.model.calls
+        assert 'partial' not in service.generate_summary(content, 'english')
+        assert service.model.calls > calls
+
+class FlakyModel(FakeModel):
+    """Fake model that raises the given errors before answering"""
+
+    def __init__(self, payload, errors):
+        super().__init__(payload)
+        self.errors = list(errors)
+
+    def generate_content(self, prompt):
+        if self.errors:
+            self.calls += 1
+            raise self.errors.pop(0)
+        return super().generate_content(prompt)
+
+class TestUpstreamResilience:
+    """Test rate limiting, retries and the circuit breaker around Gemini calls"""
+
+    def _service(self, monkeypatch, **settings):
+        from config import Config
+        monkeypatch.setattr(Config, 'AI_RETRY_BASE_DELAY', 0.001)
+        monkeypatch.setattr(Config, 'AI_RETRY_MAX_DELAY', 0.01)
+        for name, value in settings.items():
+            monkeypatch.setattr(Config, name, value)
+        return AIService(cache=AICache())
+
+    def test_transient_errors_are_retried(self, monkeypatch):
+        from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
+        service = self._service(monkeypatch)
+        service.model = FlakyModel({'main_topic': 'Topic'}, [ResourceExhausted('quota'), ServiceUnavailable('busy')])
+
+        summary = service.generate_summary('some content', 'english')
+        assert summary['main_topic'] == 'Topic'
+        assert service.model.calls == 3
+        stats = service.upstream_stats()
+        assert stats['retries'] == 2
+        assert stats['circuit_breaker']['state'] == 'closed'
+
+    def test_open_circuit_fails_fast_to_fallback_structure(self, monkeypatch):
+        from google.api_core.exceptions import ServiceUnavailable
+        service = self._service(monkeypatch, AI_MAX_RETRIES=0, AI_BREAKER_FAILURE_THRESHOLD=2)
+        service.model = FlakyModel({}, [ServiceUnavailable('down')] * 10)
+
+        for _ in range(2):
+            assert 'error' in service.generate_structured_content('first text', 'text', 'english')
+        assert service.upstream_stats()['circuit_breaker']['state'] == 'open'
+
+        calls = service.model.calls
+        structured = service.generate_structured_content('Plain text that still gets structured.', 'text', 'english')
+        assert 'error' not in structured
+        assert structured['title']
+        assert service.model.calls == calls
+        assert service.upstream_stats()['circuit_breaker']['rejected'] == 1
+
+    def test_half_open_trial_closes_circuit(self, monkeypatch):
+        from google.api_core.exceptions import ServiceUnavailable
+        service = self._service(monkeypatch, AI_MAX_RETRIES=0, AI_BREAKER_FAILURE_THRESHOLD=1,
+                                AI_BREAKER_RESET_SECONDS=0.05)
+        service.model = FlakyModel({'main_topic': 'Topic'}, [ServiceUnavailable('down')])
+
+        assert 'error' in service.generate_summary('some content', 'english')
+        assert service.upstream_stats()['circuit_breaker']['state'] == 'open'
+
+        time.sleep(0.06)
+        assert service.generate_summary('some content', 'english')['main_topic'] == 'Topic'
+        assert service.upstream_stats()['circuit_breaker']['state'] == 'closed'
+
+    def test_non_retryable_errors_do_not_trip_breaker(self, monkeypatch):
+        service = self._service(monkeypatch, AI_BREAKER_FAILURE_THRESHOLD=1)
+        service.model = FlakyModel({'main_topic': 'Topic'}, [ValueError('bad prompt')])
+
+        assert 'error' in service.generate_summary('some content', 'english')
+        assert service.model.calls == 1
+        assert service.upstream_stats()['circuit_breaker']['state'] == 'closed'
+
+    def test_limiter_throttles_bursts(self):
+        from services.resilience import TokenBucketLimiter
+        limiter = TokenBucketLimiter(requests_per_minute=600, tokens_per_minute=10 ** 6)
+        limiter._requests = 1.0
+
+        start = time.perf_counter()
+        limiter.acquire()
+        limiter.acquire()
+        assert time.perf_counter() - start >= 0.09
+        assert limiter.stats()['throttled'] == 1
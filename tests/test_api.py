@@ -2,8 +2,13 @@ import pytest
 import json
 import tempfile
 import os
-from app import app
-from database import Database
+import time
+from datetime import datetime, timedelta
+from app import app, db, ai_service
+from config import Config
+from utils.study_text import build_study_text
+from utils.graph_codec import decode_graph, COLUMNAR_FORMAT, COLUMNAR_MIMETYPE
+from database import Database, CONTENT_SCHEMA_VERSION
 
 @pytest.fixture
 def client():
@@ -30,6 +35,24 @@ def auth_headers(client):
     
     return {'Authorization': f'Bearer {token}'}
 
+def wait_for_job(client, headers, job_id, timeout=120):
+    """Poll a background job until it finishes"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        response = client.get(f'/api/jobs/{job_id}', headers=headers)
+        job = json.loads(response.data)
+        if job['status'] in ('completed', 'failed'):
+            return job
+        time.sleep(0.5)
+    raise AssertionError(f'Job {job_id} did not finish within {timeout}s')
+
+def upload_text(client, headers, text):
+    """Upload text content and wait until it has been processed"""
+    response = client.post('/api/upload', data={'type': 'text', 'content': text}, headers=headers)
+    data = json.loads(response.data)
+    wait_for_job(client, headers, data['job_id'])
+    return data['content_id']
+
 class TestAuth:
     """Test authentication endpoints"""
     
@@ -84,10 +107,45 @@ class TestContent:
             'content': 'This is a test content for processing.'
         }
         response = client.post('/api/upload', data=data, headers=auth_headers)
-        assert response.status_code == 201
+        assert response.status_code == 202
         data = json.loads(response.data)
         assert 'content_id' in data
-        assert 'title' in data
+        assert 'job_id' in data
+    
+    def test_job_status(self, client, auth_headers):
+        """Test polling a background processing job"""
+        data = {
+            'type': 'text',
+            'content': 'This is a test content for background processing.'
+        }
+        response = client.post('/api/upload', data=data, headers=auth_headers)
+        job_id = json.loads(response.data)['job_id']
+        
+        job = wait_for_job(client, auth_headers, job_id)
+        assert job['status'] == 'completed'
+        assert job['progress'] == 100
+    
+    def test_job_status_not_found(self, client, auth_headers):
+        """Test polling a job that does not exist"""
+        response = client.get('/api/jobs/000000000000000000000000', headers=auth_headers)
+        assert response.status_code == 404
+    
+    def test_stale_running_job_is_recovered(self):
+        """Test that a job left running by a dead worker is picked up again"""
+        from bson import ObjectId
+        from services.job_queue import JobQueue
+        job_id = db.create_job('user', 'content', 'process_upload', {})
+        db.claim_job(job_id)
+        db.jobs_collection.update_one({'_id': ObjectId(job_id)},
+                                      {'$set': {'updated_at': datetime.utcnow() - timedelta(hours=1)}})
+        
+        handled = []
+        queue = JobQueue(db, lambda job, report: handled.append(str(job['_id'])), num_workers=1, stale_after=60)
+        queue.start()
+        queue._queue.join()
+        
+        assert job_id in handled
+        assert db.get_job(job_id)['status'] == 'completed'
     
     def test_upload_invalid_type(self, client, auth_headers):
         """Test uploading with invalid content type"""
@@ -101,11 +159,7 @@ class TestContent:
     def test_list_content(self, client, auth_headers):
         """Test listing user content"""
         # First upload some content
-        data = {
-            'type': 'text',
-            'content': 'Test content for listing'
-        }
-        client.post('/api/upload', data=data, headers=auth_headers)
+        upload_text(client, auth_headers, 'Test content for listing')
         
         # Then list content
         response = client.get('/api/list', headers=auth_headers)
@@ -114,15 +168,52 @@ class TestContent:
         assert 'contents' in data
         assert len(data['contents']) > 0
     
+    def test_list_content_pagination(self, client):
+        """Test walking the content list page by page with cursors"""
+        credentials = {'username': 'pageuser', 'password': 'password123'}
+        client.post('/api/auth/register', json=credentials)
+        login = json.loads(client.post('/api/auth/login', json=credentials).data)
+        headers = {'Authorization': f"Bearer {login['access_token']}"}
+        
+        # Two items share a timestamp to exercise the _id tie-break
+        created = datetime(2024, 1, 1)
+        for i, minutes in enumerate([0, 1, 1, 2, 3]):
+            db.collection.insert_one({
+                'user_id': login['user_id'],
+                'title': f'Item {i}',
+                'content': 'text',
+                'content_type': 'text',
+                'metadata': {'word_count': i},
+                'created_at': created + timedelta(minutes=minutes)
+            })
+        
+        titles = []
+        after = None
+        while True:
+            url = '/api/list?limit=2' + (f'&after={after}' if after else '')
+            data = json.loads(client.get(url, headers=headers).data)
+            assert len(data['contents']) <= 2
+            titles.extend(item['title'] for item in data['contents'])
+            after = data['next_cursor']
+            if not after:
+                break
+        
+        assert titles == ['Item 4', 'Item 3', 'Item 2', 'Item 1', 'Item 0']
+        assert set(data['contents'][-1]) == {'_id', 'title', 'content_type', 'status', 'created_at', 'word_count'}
+        
+        count = json.loads(client.get('/api/list?count=true', headers=headers).data)
+        assert count == {'total': 5}
+        
+        response = client.get('/api/list?after=not-a-cursor', headers=headers)
+        assert response.status_code == 400
+    
     def test_generate_summary(self, client, auth_headers):
         """Test generating summary"""
         # First upload content
-        upload_data = {
-            'type': 'text',
-            'content': 'This is a comprehensive test content that discusses various aspects of machine learning and artificial intelligence.'
-        }
-        upload_response = client.post('/api/upload', data=upload_data, headers=auth_headers)
-        content_id = json.loads(upload_response.data)['content_id']
+        content_id = upload_text(
+            client, auth_headers,
+            'This is a comprehensive test content that discusses various aspects of machine learning and artificial intelligence.'
+        )
         
         # Generate summary
         summary_data = {
@@ -137,12 +228,10 @@ class TestContent:
     def test_generate_quiz(self, client, auth_headers):
         """Test generating quiz"""
         # First upload content
-        upload_data = {
-            'type': 'text',
-            'content': 'Machine learning is a subset of artificial intelligence that focuses on algorithms and statistical models.'
-        }
-        upload_response = client.post('/api/upload', data=upload_data, headers=auth_headers)
-        content_id = json.loads(upload_response.data)['content_id']
+        content_id = upload_text(
+            client, auth_headers,
+            'Machine learning is a subset of artificial intelligence that focuses on algorithms and statistical models.'
+        )
         
         # Generate quiz
         quiz_data = {
@@ -158,12 +247,10 @@ class TestContent:
     def test_generate_notes(self, client, auth_headers):
         """Test generating notes"""
         # First upload content
-        upload_data = {
-            'type': 'text',
-            'content': 'Python is a high-level programming language known for its simplicity and readability.'
-        }
-        upload_response = client.post('/api/upload', data=upload_data, headers=auth_headers)
-        content_id = json.loads(upload_response.data)['content_id']
+        content_id = upload_text(
+            client, auth_headers,
+            'Python is a high-level programming language known for its simplicity and readability.'
+        )
         
         # Generate notes
         notes_data = {
@@ -175,6 +262,303 @@ class TestContent:
         data = json.loads(response.data)
         assert 'notes' in data
 
+    def test_structured_content_projection(self, client, auth_headers):
+        """Test fetching only selected parts of the structured content"""
+        user_id = str(db.get_user('testuser')['_id'])
+        content_id = db.store_content(user_id, 'Photosynthesis', {
+            'title': 'Photosynthesis',
+            'executive_summary': 'Light becomes chemical energy.',
+            'main_sections': [{'section_title': 'Overview', 'content': 'Chlorophyll absorbs light.'}]
+        }, 'text')
+        
+        response = client.get(f'/api/content/{content_id}?fields=main_sections', headers=auth_headers)
+        assert response.status_code == 200
+        structured = json.loads(response.data)['structured_content']
+        assert isinstance(structured['main_sections'], list)
+        assert 'executive_summary' not in structured
+    
+    def test_projection_keeps_plain_text_content(self, client, auth_headers):
+        """Test that ?fields= on a plain-text row still returns its text"""
+        user_id = str(db.get_user('testuser')['_id'])
+        content_id = db.store_content(user_id, 'Notes', 'Just plain text.', 'text')
+        
+        response = client.get(f'/api/content/{content_id}?fields=main_sections', headers=auth_headers)
+        assert response.status_code == 200
+        assert json.loads(response.data)['structured_content']['content'] == 'Just plain text.'
+
+    def test_bulk_delete(self, client, auth_headers):
+        """Test deleting several items in one request with per-item results"""
+        user_id = str(db.get_user('testuser')['_id'])
+        first = db.store_content(user_id, 'First', 'first text', 'text')
+        second = db.store_content(user_id, 'Second', 'second text', 'text')
+        someone_elses = db.store_content('other-user', 'Other', 'other text', 'text')
+        
+        response = client.post('/api/content/bulk-delete', json={
+            'content_ids': [first, second, someone_elses, 'not-an-id']
+        }, headers=auth_headers)
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['deleted_count'] == 2
+        assert [result['status'] for result in data['results']] == ['deleted', 'deleted', 'not_found', 'invalid_id']
+        
+        assert db.get_content(first, user_id) is None
+        assert db.get_content(someone_elses, 'other-user') is not None
+    
+    def test_bulk_delete_validation(self, client, auth_headers):
+        """Test bulk delete rejects empty or oversized requests"""
+        response = client.post('/api/content/bulk-delete', json={'content_ids': []}, headers=auth_headers)
+        assert response.status_code == 400
+        
+        too_many = ['000000000000000000000000'] * (Config.BULK_DELETE_MAX + 1)
+        response = client.post('/api/content/bulk-delete', json={'content_ids': too_many}, headers=auth_headers)
+        assert response.status_code == 400
+        
+        response = client.post('/api/content/bulk-delete', json={'content_ids': ['x']})
+        assert response.status_code == 401
+
+class TestArtifacts:
+    """Test stored summaries, notes, quizzes and graphs"""
+    
+    def test_summary_is_stored_and_reused(self, client, auth_headers, monkeypatch):
+        """Test a generated summary is served from storage until refreshed or the content changes"""
+        monkeypatch.setattr(ai_service, 'generate_summary', lambda text, language: {'main_topic': text, 'key_points': []})
+        user_id = str(db.get_user('testuser')['_id'])
+        content_id = db.store_content(user_id, 'Artifacts', 'Enzymes speed up chemical reactions in cells.', 'text')
+        request_data = {'content_id': content_id, 'language': 'english'}
+        
+        first = json.loads(client.post('/api/summary', json=request_data, headers=auth_headers).data)
+        artifact = db.get_artifact(content_id, 'summary', 'english')
+        assert artifact['version'] == 1
+        assert artifact['payload'] == first['summary']
+        
+        # A stored payload is returned as-is without regenerating
+        db.artifacts_collection.update_one({'_id': artifact['_id']}, {'$set': {'payload.marker': 'stored'}})
+        second = json.loads(client.post('/api/summary', json=request_data, headers=auth_headers).data)
+        assert second['summary']['marker'] == 'stored'
+        
+        refreshed = json.loads(client.post('/api/summary', json=dict(request_data, refresh=True), headers=auth_headers).data)
+        assert 'marker' not in refreshed['summary']
+        assert db.get_artifact(content_id, 'summary', 'english')['version'] == 2
+        
+        # Changed source text makes the stored artifact stale
+        db.update_content(content_id, user_id, {'study_text': build_study_text('Different text entirely.')})
+        db.artifacts_collection.update_one({'content_id': content_id}, {'$set': {'payload.marker': 'stale'}})
+        changed = json.loads(client.post('/api/summary', json=request_data, headers=auth_headers).data)
+        assert 'marker' not in changed['summary']
+        
+        client.post('/api/content/bulk-delete', json={'content_ids': [content_id]}, headers=auth_headers)
+        assert db.get_artifact(content_id, 'summary', 'english') is None
+
+    def test_regenerate_link_redirects_and_keeps_other_kinds_cached(self, client, auth_headers, monkeypatch):
+        """Test ?refresh=1 on a page regenerates once, drops only that cache entry and redirects to the clean URL"""
+        calls = []
+        monkeypatch.setattr(ai_service, 'generate_summary',
+                            lambda text, language: calls.append(text) or {'main_topic': 'Enzymes', 'key_points': []})
+        user_id = str(db.get_user('testuser')['_id'])
+        content_id = db.store_content(user_id, 'Regenerate', 'Enzymes lower activation energy.', 'text')
+        text = db.get_study_text(content_id, user_id)['study_text']['text']
+        notes_key = ai_service.cache.make_key('notes', text, 'english', {}, ai_service.model_name)
+        ai_service.cache.set(notes_key, {'title': 'Cached notes'})
+        
+        client.post('/login', data={'username': 'testuser', 'password': 'testpassword'})
+        response = client.get(f'/summary/{content_id}?refresh=1')
+        assert response.status_code == 302
+        assert response.headers['Location'].endswith(f'/summary/{content_id}')
+        assert client.get(f'/summary/{content_id}').status_code == 200
+        assert len(calls) == 1
+        assert ai_service.cache.get(notes_key) == {'title': 'Cached notes'}
+    
+    def test_graph_is_precomputed_at_upload(self, client, auth_headers, monkeypatch):
+        """Test the graph is stored when an upload is processed and served without regenerating"""
+        calls = []
+        def hierarchy(content):
+            calls.append(content)
+            return {'main_topic': {'title': 'Cells'}, 'hierarchy_levels': [], 'relationships': []}
+        monkeypatch.setattr(ai_service, 'generate_hierarchical_graph_structure', hierarchy)
+        
+        content_id = upload_text(client, auth_headers, 'Cells are the basic unit of life.\n\nThey divide by mitosis.')
+        # The graph is built by a follow-up job once the upload has completed
+        graph_job = db.jobs_collection.find_one({'content_id': content_id, 'job_type': 'precompute_graph'})
+        assert wait_for_job(client, auth_headers, str(graph_job['_id']))['status'] == 'completed'
+        artifact = db.get_artifact(content_id, 'graph', None)
+        assert artifact is not None
+        assert artifact['payload']['nodes'][0]['name'] == 'Cells'
+        assert all('x' in node and 'y' in node for node in artifact['payload']['nodes'])
+        assert len(calls) == 1
+        
+        client.post('/login', data={'username': 'testuser', 'password': 'testpassword'})
+        response = client.get(f'/api/graph-data/{content_id}')
+        assert response.status_code == 200
+        assert json.loads(response.data) == artifact['payload']
+        assert len(calls) == 1
+        
+        # Compact encoding is negotiated by query parameter or Accept header
+        compact = client.get(f'/api/graph-data/{content_id}?format=compact')
+        assert compact.mimetype == COLUMNAR_MIMETYPE
+        assert decode_graph(json.loads(compact.data)) == artifact['payload']
+        accepted = client.get(f'/api/graph-data/{content_id}', headers={'Accept': COLUMNAR_MIMETYPE})
+        assert json.loads(accepted.data)['format'] == COLUMNAR_FORMAT
+        assert 'Accept' in accepted.headers['Vary']
+        
+        # Changed content invalidates the stored graph
+        user_id = str(db.get_user('testuser')['_id'])
+        db.update_content(content_id, user_id, {'content': 'Different text.', 'study_text': build_study_text('Different text.')})
+        client.get(f'/api/graph-data/{content_id}')
+        assert len(calls) == 2
+
+    def test_stored_graph_without_layout_is_laid_out_once(self, client, auth_headers):
+        """Test graphs stored before layouts existed get positions without regenerating"""
+        client.post('/login', data={'username': 'testuser', 'password': 'testpassword'})
+        user_id = str(db.get_user('testuser')['_id'])
+        content_id = db.store_content(user_id, 'Layout', 'Atoms are made of protons, neutrons and electrons.', 'text')
+        source_hash = db.get_study_text(content_id, user_id)['study_text']['hash']
+        db.save_artifact(content_id, 'graph', None, {}, 'test', source_hash, {
+            'nodes': [{'id': '0', 'name': 'Atoms', 'level': 0}, {'id': '1', 'name': 'Protons', 'level': 1}],
+            'links': [{'source': '0', 'target': '1', 'value': 3, 'type': 'hierarchy'}]
+        })
+        
+        graph = json.loads(client.get(f'/api/graph-data/{content_id}').data)
+        assert graph['nodes'][0]['name'] == 'Atoms'
+        assert all('x' in node for node in graph['nodes'])
+        stored = db.get_artifact(content_id, 'graph', None)
+        assert stored['payload'] == graph
+        assert stored['version'] == 2
+    
+    def test_graph_refresh_regenerates(self, client, auth_headers):
+        """Test ?refresh=1 on the graph API rebuilds and stores the graph"""
+        client.post('/login', data={'username': 'testuser', 'password': 'testpassword'})
+        user_id = str(db.get_user('testuser')['_id'])
+        content_id = db.store_content(user_id, 'Refresh', 'Atoms are made of protons, neutrons and electrons.', 'text')
+        source_hash = db.get_study_text(content_id, user_id)['study_text']['hash']
+        db.save_artifact(content_id, 'graph', None, {}, 'test', source_hash, {
+            'nodes': [{'id': '0', 'name': 'Stale', 'level': 0}], 'links': [], 'marker': 'stale'
+        })
+        
+        response = client.get(f'/api/graph-data/{content_id}?refresh=1')
+        assert response.status_code == 200
+        graph = json.loads(response.data)
+        assert 'marker' not in graph
+        assert db.get_artifact(content_id, 'graph', None)['payload'] == graph
+
+class TestPDFDownloads:
+    """Test cached PDF downloads with conditional GET"""
+    
+    def test_etag_and_not_modified(self, client):
+        """Test repeat downloads are answered with 304 when the ETag still matches"""
+        credentials = {'username': 'pdfuser', 'password': 'password123'}
+        client.post('/api/auth/register', json=credentials)
+        client.post('/login', data=credentials)
+        user_id = str(db.get_user('pdfuser')['_id'])
+        
+        content_id = db.store_content(user_id, 'Optics', 'Light bends when it changes medium.', 'text')
+        content = db.get_study_text(content_id, user_id)
+        db.save_artifact(content_id, 'summary', 'english', {}, 'test', content['study_text']['hash'], {
+            'main_topic': 'Refraction', 'key_points': ['Light bends'], 'concepts': {}, 'conclusion': 'Done'
+        })
+        
+        first = client.get(f'/download/summary/{content_id}/pdf')
+        assert first.status_code == 200
+        assert first.data.startswith(b'%PDF')
+        etag = first.headers['ETag']
+        assert not etag.startswith('W/')
+        
+        repeat = client.get(f'/download/summary/{content_id}/pdf', headers={'If-None-Match': etag})
+        assert repeat.status_code == 304
+        assert repeat.headers['ETag'] == etag
+        
+        # A changed artifact yields a different document and ETag
+        db.save_artifact(content_id, 'summary', 'english', {}, 'test', content['study_text']['hash'], {
+            'main_topic': 'Reflection', 'key_points': [], 'concepts': {}, 'conclusion': 'Done'
+        })
+        changed = client.get(f'/download/summary/{content_id}/pdf', headers={'If-None-Match': etag})
+        assert changed.status_code == 200
+        assert changed.headers['ETag'] != etag
+
+class TestContentStorage:
+    """Test native structured content storage and migration"""
+    
+    def test_legacy_json_string_is_migrated(self):
+        """Test migrating a JSON-string content row to a native document"""
+        structured = {'title': 'Legacy', 'executive_summary': 'Old row', 'main_sections': []}
+        legacy_id = db.collection.insert_one({
+            'user_id': 'legacy-user',
+            'title': 'Legacy',
+            'content': json.dumps(structured),
+            'content_type': 'text'
+        }).inserted_id
+        text_id = db.collection.insert_one({
+            'user_id': 'legacy-user',
+            'title': 'Plain',
+            'content': 'Just some plain text',
+            'content_type': 'text'
+        }).inserted_id
+        
+        assert db.migrate_content_documents() >= 2
+        assert db.migrate_content_documents() == 0
+        
+        legacy = db.collection.find_one({'_id': legacy_id})
+        assert legacy['content'] == structured
+        assert legacy['schema_version'] == CONTENT_SCHEMA_VERSION
+        assert legacy['study_text']['text'] == 'Old row'
+        assert db.collection.find_one({'_id': text_id})['content'] == 'Just some plain text'
+    
+    def test_study_text_is_stored_with_content(self):
+        """Test the flattened study text, word count and hash written alongside content"""
+        content_id = db.store_content('study-user', 'Cells', {
+            'executive_summary': 'Cells are the unit of life.',
+            'main_sections': [{'section_title': 'Organelles', 'content': 'Mitochondria make energy.'}],
+            'conclusion': 'Cells matter.'
+        }, 'text')
+        
+        content = db.get_study_text(content_id, 'study-user')
+        assert 'content' not in content
+        assert content['study_text']['text'] == 'Cells are the unit of life. Mitochondria make energy. Cells matter.'
+        assert content['study_text']['word_count'] == 11
+        assert len(content['study_text']['hash']) == 64
+    
+    def test_study_text_is_backfilled_on_first_read(self):
+        """Test rows without study text get it computed and saved when first read"""
+        content_id = str(db.collection.insert_one({
+            'user_id': 'study-user',
+            'title': 'Old',
+            'content': {'executive_summary': 'Backfilled text'},
+            'schema_version': 2
+        }).inserted_id)
+        
+        assert db.get_study_text(content_id, 'study-user')['study_text']['text'] == 'Backfilled text'
+        assert 'study_text' in db.collection.find_one({'user_id': 'study-user', 'title': 'Old'})
+        assert db.get_study_text(content_id, 'someone-else') is None
+    
+    def test_decode_content(self):
+        """Test decoding stored content of every shape"""
+        assert Database.decode_content({'title': 'A'}) == {'title': 'A'}
+        assert Database.decode_content('{"title": "A"}') == {'title': 'A'}
+        assert Database.decode_content('plain text') == 'plain text'
+        assert Database.decode_content('[1, 2]') == '[1, 2]'
+        # Only legacy rows are parsed; current rows keep text that happens to be JSON
+        assert Database.decode_content('{"title": "A"}', CONTENT_SCHEMA_VERSION) == '{"title": "A"}'
+
+class TestDatabaseStartup:
+    """Test the Mongo client is created lazily and indexes are created explicitly"""
+    
+    def test_client_is_created_on_first_use(self):
+        database = Database()
+        assert database._client is None
+        database.users_collection.find_one({})
+        assert database._client is not None
+    
+    def test_ensure_indexes_is_idempotent(self):
+        database = Database()
+        database.ensure_indexes()
+        database.ensure_indexes()
+        assert 'username_1' in database.users_collection.index_information()
+        assert 'user_id_1_created_at_-1' in database.collection.index_information()
+    
+    def test_create_indexes_command(self):
+        result = app.test_cli_runner().invoke(args=['create-indexes'])
+        assert result.exit_code == 0
+        assert 'username_1' in db.users_collection.index_information()
+
 class TestSecurity:
     """Test security and authorization"""
     
@@ -192,6 +576,12 @@ class TestSecurity:
         response = client.get('/api/list', headers=headers)
         assert response.status_code == 422  # Unprocessable Entity for invalid JWT
 
+    def test_malformed_token_on_optional_auth(self, client):
+        """Test that a malformed token is treated as missing credentials, not a server error"""
+        headers = {'Authorization': 'Bearer invalid-token'}
+        response = client.get('/api/jobs/000000000000000000000000', headers=headers)
+        assert response.status_code == 401
+
 class TestHealthCheck:
     """Test health check endpoint"""
     
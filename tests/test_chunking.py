@@ -0,0 +1,82 @@
+from services.chunking import (estimate_tokens, split_into_chunks, iter_chunks, allocate_questions,
+                               merge_summaries, merge_quizzes, merge_structured_content)
+
+class TestSplitIntoChunks:
+    """Test splitting long documents under a token budget"""
+
+    def test_short_text_is_single_chunk(self):
+        assert split_into_chunks('A short sentence.', 100) == ['A short sentence.']
+
+    def test_chunks_respect_budget_and_order(self):
+        sentences = [f'Sentence number {i} talks about topic {i}.' for i in range(500)]
+        text = ' '.join(sentences)
+        chunks = split_into_chunks(text, 200)
+
+        assert len(chunks) > 1
+        assert all(estimate_tokens(chunk) <= 200 for chunk in chunks)
+        assert ' '.join(chunks) == text
+
+    def test_paragraph_boundaries_preferred(self):
+        text = ('a' * 300) + '\n\n' + ('b' * 300)
+        assert split_into_chunks(text, 100) == ['a' * 300, 'b' * 300]
+
+    def test_run_on_text_is_hard_split(self):
+        chunks = split_into_chunks('x' * 1000, 50)
+        assert all(len(chunk) <= 200 for chunk in chunks)
+        assert ''.join(chunks) == 'x' * 1000
+
+    def test_iter_chunks_packs_pages_lazily(self):
+        def pages():
+            for i in range(10):
+                yield f'Page {i} text. ' * 10
+
+        chunks = iter_chunks(pages(), 100)
+        first = next(chunks)
+        assert first.startswith('Page 0 text.')
+        assert estimate_tokens(first) <= 100
+        assert all(estimate_tokens(chunk) <= 100 for chunk in chunks)
+
+class TestMerging:
+    """Test the reduce step over partial JSON results"""
+
+    def test_merge_summaries(self):
+        merged = merge_summaries([
+            {'main_topic': 'Physics', 'key_points': ['Force', 'Mass'], 'concepts': {'F': 'force'}, 'conclusion': 'One.'},
+            {'main_topic': 'Other', 'key_points': ['mass', 'Energy'], 'concepts': {'E': 'energy'}, 'conclusion': 'Two.'}
+        ])
+        assert merged['main_topic'] == 'Physics'
+        assert merged['key_points'] == ['Force', 'Mass', 'Energy']
+        assert merged['concepts'] == {'F': 'force', 'E': 'energy'}
+        assert merged['conclusion'] == 'One. Two.'
+
+    def test_merge_quizzes_trims_and_renumbers(self):
+        part = {'questions': [{'id': 1, 'question': 'Q1'}, {'id': 2, 'question': 'Q2'}, {'id': 3, 'question': 'Q9'}]}
+        other = {'questions': [{'id': 1, 'question': 'q1'}, {'id': 2, 'question': 'Q3'}]}
+        merged = merge_quizzes([part, other], [2, 1])
+        # Each chunk keeps its own budget, so later chunks are not crowded out
+        assert [q['question'] for q in merged['questions']] == ['Q1', 'Q2', 'Q3']
+        assert [q['id'] for q in merged['questions']] == [1, 2, 3]
+        assert merged['total_questions'] == 3
+
+    def test_merge_structured_content(self):
+        merged = merge_structured_content([
+            {'title': 'T', 'main_sections': [{'section_title': 'A'}], 'conclusion': 'first'},
+            {'title': 'X', 'main_sections': [{'section_title': 'B'}], 'conclusion': 'last'}
+        ])
+        assert merged['title'] == 'T'
+        assert [s['section_title'] for s in merged['main_sections']] == ['A', 'B']
+        assert merged['conclusion'] == 'last'
+        assert merged['metadata']['chunk_count'] == 2
+
+    def test_allocate_questions(self):
+        assert allocate_questions(['a' * 100, 'b' * 100], 10) == [5, 5]
+        assert allocate_questions(['a' * 200, 'b' * 100, 'c' * 100], 11) == [5, 3, 3]
+        assert allocate_questions(['a' * 10, 'b' * 1000], 2) == [1, 1]
+
+    def test_allocate_questions_with_more_chunks_than_questions(self):
+        chunks = ['x' * 1000] * 12
+        chunks[3] = 'y' * 2000
+        budgets = allocate_questions(chunks, 5)
+        assert sum(budgets) == 5
+        assert budgets[3] == 1
+        assert budgets.count(0) == 7
@@ -0,0 +1,74 @@
+from config import Config
+from services.ai_cache import AICache
+from services.ai_service import AIService
+from services.concept_extractor import extract_hierarchy, candidate_phrases
+
+LECTURE = """Photosynthesis is the process by which green plants convert light energy into chemical energy. It takes place in the chloroplasts of plant cells.
+
+The light reactions occur in the thylakoid membranes. During the light reactions, chlorophyll absorbs sunlight and water molecules are split, releasing oxygen. The light reactions produce ATP and NADPH.
+
+The Calvin cycle takes place in the stroma of the chloroplasts. The Calvin cycle uses ATP and NADPH to fix carbon dioxide into glucose. Rubisco is the enzyme that fixes carbon dioxide in the Calvin cycle.
+
+Cellular respiration is the reverse of photosynthesis. Cellular respiration breaks down glucose to release energy as ATP. Mitochondria are the site of cellular respiration.
+"""
+
+def titles(hierarchy):
+    return [node['title'] for level in hierarchy['hierarchy_levels'] for node in level['nodes']]
+
+class TestConceptExtractor:
+    """Test the offline concept hierarchy extractor"""
+
+    def test_candidate_phrases_stop_at_stopwords_and_punctuation(self):
+        keys = [key for key, _ in candidate_phrases('The Calvin cycle, in the stroma, fixes carbon dioxide.')]
+        assert 'calvin cycle' in keys
+        assert 'carbon dioxide' in keys
+        assert not any('stroma' in key and 'cycle' in key for key in keys)
+
+    def test_recurring_keyphrases_become_concepts(self):
+        hierarchy = extract_hierarchy(LECTURE)
+        extracted = [hierarchy['main_topic']['title']] + titles(hierarchy)
+        for concept in ('Light reactions', 'Calvin cycle', 'Cellular respiration', 'Carbon dioxide', 'ATP'):
+            assert concept in extracted
+        # One-off word runs are not concepts
+        assert 'Green plants convert' not in extracted
+
+    def test_schema_and_links(self):
+        hierarchy = extract_hierarchy(LECTURE)
+        levels = hierarchy['hierarchy_levels']
+        assert [level['level'] for level in levels] == [1, 2]
+        ids = {node['id'] for level in levels for node in level['nodes']}
+        level_one = {node['id'] for node in levels[0]['nodes']}
+
+        # Every level 2 concept hangs off a level 1 concept
+        parents = {r['target']: r['source'] for r in hierarchy['relationships'] if r['relationship_type'] == 'subtopic'}
+        assert set(parents) == {node['id'] for node in levels[1]['nodes']}
+        assert set(parents.values()) <= level_one
+        for relationship in hierarchy['relationships']:
+            assert relationship['source'] in ids and relationship['target'] in ids
+            assert relationship['strength'] in ('strong', 'medium', 'weak')
+        assert {step['focus'] for step in hierarchy['learning_path']} == level_one
+
+    def test_definitions_are_typed(self):
+        nodes = {node['title']: node for level in extract_hierarchy(LECTURE)['hierarchy_levels'] for node in level['nodes']}
+        assert nodes['Cellular respiration']['type'] == 'definition'
+
+    def test_whole_document_is_used(self):
+        filler = 'The lecture continues with general remarks about study habits. ' * 200
+        hierarchy = extract_hierarchy(filler + 'Quantum tunnelling matters. Quantum tunnelling explains decay.')
+        assert 'Quantum tunnelling' in [hierarchy['main_topic']['title']] + titles(hierarchy)
+
+    def test_deterministic_and_empty(self):
+        assert extract_hierarchy(LECTURE) == extract_hierarchy(LECTURE)
+        empty = extract_hierarchy('')
+        assert empty['hierarchy_levels'] == [] and empty['relationships'] == []
+
+    def test_graph_hierarchy_is_local_by_default(self, monkeypatch):
+        class NoCalls:
+            def generate_content(self, prompt):
+                raise AssertionError('model should not be called')
+
+        monkeypatch.setattr(Config, 'GRAPH_HIERARCHY_ENGINE', 'local')
+        service = AIService(cache=AICache())
+        service.model = NoCalls()
+        structured = {'title': 'Plants', 'executive_summary': LECTURE, 'main_sections': []}
+        assert service.generate_hierarchical_graph_structure(structured) == extract_hierarchy(LECTURE)
@@ -0,0 +1,242 @@
+import pytest
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from services.content_processor import ContentProcessor, PDFPageExtractor
+
+def make_pdf(path, pages):
+    """Write a small multi-page PDF with one numbered line per page"""
+    pdf = canvas.Canvas(str(path), pagesize=A4)
+    for page in range(pages):
+        pdf.drawString(72, 720, f"Page {page + 1} covers photosynthesis and respiration.")
+        pdf.showPage()
+    pdf.save()
+    return str(path)
+
+@pytest.fixture
+def sample_pdf(tmp_path):
+    return make_pdf(tmp_path / 'sample.pdf', 5)
+
+class TestPDFExtraction:
+    """Test PDF text extraction"""
+
+    def test_process_pdf(self, sample_pdf):
+        result = ContentProcessor(pdf_workers=1).process_pdf(sample_pdf)
+        assert result['metadata']['page_count'] == 5
+        assert result['text'].startswith('Page 1 covers')
+        assert 'Page 5 covers' in result['text']
+
+    def test_iter_pdf_pages_yields_in_order(self, sample_pdf):
+        pages = list(ContentProcessor().iter_pdf_pages(sample_pdf))
+        assert [page_number for page_number, _, _ in pages] == [1, 2, 3, 4, 5]
+        assert pages[2][1] == 'Page 3 covers photosynthesis and respiration.'
+        assert pages[2][2]['word_count'] == 6
+        assert pages[2][2]['page_count'] == 5
+
+    def test_iter_pdf_pages_is_lazy(self, sample_pdf):
+        pages = ContentProcessor().iter_pdf_pages(sample_pdf)
+        page_number, text, _ = next(pages)
+        assert page_number == 1
+        pages.close()
+
+    def test_unreadable_pdf_closes_file(self, tmp_path, monkeypatch):
+        path = tmp_path / 'broken.pdf'
+        path.write_bytes(b'not a pdf')
+        opened = []
+        real_open = open
+        monkeypatch.setattr('builtins.open', lambda *args, **kwargs: opened.append(real_open(*args, **kwargs)) or opened[-1])
+
+        with pytest.raises(Exception):
+            PDFPageExtractor(str(path))
+        assert opened and all(handle.closed for handle in opened)
+
+    def test_failed_page_falls_back_to_pdfplumber(self, sample_pdf, monkeypatch):
+        """Only the page PyPDF2 cannot read is re-extracted with pdfplumber"""
+        import PyPDF2
+        original = PyPDF2.PageObject.extract_text
+        calls = []
+
+        def flaky_extract_text(page, *args, **kwargs):
+            text = original(page, *args, **kwargs)
+            calls.append(text)
+            if 'Page 2 ' in text:
+                raise ValueError('corrupt content stream')
+            return text
+
+        monkeypatch.setattr(PyPDF2.PageObject, 'extract_text', flaky_extract_text)
+        result = ContentProcessor(pdf_workers=1).process_pdf(sample_pdf)
+
+        assert len(calls) == 5
+        assert 'Page 2 covers' in result['text']
+        assert result['metadata']['extraction_method'] == 'mixed'
+        assert result['metadata']['fallback_pages'] == [2]
+        assert result['metadata']['page_backends'] == {'PyPDF2': 4, 'pdfplumber': 1}
+
+class TestTranscriptionWorker:
+    """Test the shared Whisper transcription worker"""
+
+    def test_model_is_loaded_once(self, monkeypatch):
+        import sys
+        import types
+        import numpy as np
+        from services.transcription_worker import TranscriptionWorker
+
+        loads = []
+
+        class FakeWhisperModel:
+            def transcribe(self, audio):
+                return {'text': 'hello class', 'segments': [{'start': 0.0, 'end': 1.0, 'text': 'hello class'}]}
+
+        fake_whisper = types.ModuleType('whisper')
+        fake_whisper.load_model = lambda size: loads.append(size) or FakeWhisperModel()
+        monkeypatch.setitem(sys.modules, 'whisper', fake_whisper)
+
+        worker = TranscriptionWorker(model_size='tiny')
+        audio = np.zeros(16000, dtype=np.float32)
+        first = worker.transcribe(audio, timeout=5)
+        worker.transcribe(audio, timeout=5)
+
+        assert loads == ['tiny']
+        assert first['text'] == 'hello class'
+        assert first['audio_seconds'] == 1.0
+
+    def test_timed_out_job_is_not_run(self, monkeypatch):
+        import sys
+        import threading
+        import types
+        from concurrent.futures import TimeoutError as FutureTimeoutError
+        from services.transcription_worker import TranscriptionWorker
+
+        started = threading.Event()
+        release = threading.Event()
+        transcribed = []
+
+        class SlowWhisperModel:
+            def transcribe(self, audio):
+                started.set()
+                release.wait(5)
+                transcribed.append(audio)
+                return {'text': audio, 'segments': []}
+
+        fake_whisper = types.ModuleType('whisper')
+        fake_whisper.load_model = lambda size: SlowWhisperModel()
+        monkeypatch.setitem(sys.modules, 'whisper', fake_whisper)
+
+        worker = TranscriptionWorker(model_size='tiny')
+        first = threading.Thread(target=lambda: worker.transcribe('first.wav', timeout=5))
+        first.start()
+        started.wait(5)
+        with pytest.raises(FutureTimeoutError):
+            worker.transcribe('second.wav', timeout=0.1)
+        release.set()
+        first.join()
+        worker.transcribe('third.wav', timeout=5)
+
+        assert transcribed == ['first.wav', 'third.wav']
+        stats = worker.stats()
+        assert stats['jobs_completed'] == 2
+        assert stats['model_loaded'] is True
+
+class TestAudioExtraction:
+    """Test direct ffmpeg audio extraction"""
+
+    def test_ffmpeg_pipes_16khz_mono_pcm(self, tmp_path, monkeypatch):
+        import subprocess
+        from config import Config
+        imageio_ffmpeg = pytest.importorskip('imageio_ffmpeg')
+        ffmpeg = imageio_ffmpeg.get_ffmpeg_exe()
+        monkeypatch.setattr(Config, 'FFMPEG_BINARY', ffmpeg)
+
+        video_path = str(tmp_path / 'lecture.mp4')
+        subprocess.run([
+            ffmpeg, '-loglevel', 'error', '-y',
+            '-f', 'lavfi', '-i', 'testsrc=duration=2:size=160x120:rate=10',
+            '-f', 'lavfi', '-i', 'sine=frequency=440:duration=2:sample_rate=44100',
+            '-ac', '2', '-shortest', video_path
+        ], check=True)
+
+        pcm_audio, method = ContentProcessor()._extract_audio_from_video(video_path)
+
+        assert method == 'ffmpeg'
+        # 16-bit mono samples at 16 kHz: ~32000 bytes per second
+        assert abs(len(pcm_audio) / 32000 - 2.0) < 0.1
+
+    def test_ffmpeg_error_is_reported(self, tmp_path, monkeypatch):
+        from config import Config
+        imageio_ffmpeg = pytest.importorskip('imageio_ffmpeg')
+        monkeypatch.setattr(Config, 'FFMPEG_BINARY', imageio_ffmpeg.get_ffmpeg_exe())
+
+        with pytest.raises(Exception, match='FFmpeg error'):
+            ContentProcessor()._extract_audio_with_ffmpeg(str(tmp_path / 'missing.mp4'))
+
+class TestSegmentedTranscription:
+    """Test silence-based segmentation and parallel segment recognition"""
+
+    def make_pcm(self, pattern, sample_rate=16000):
+        """16-bit PCM from (seconds, is_speech) pairs: a loud tone for speech, near-silence otherwise"""
+        import numpy as np
+        parts = []
+        for seconds, is_speech in pattern:
+            t = np.arange(int(seconds * sample_rate)) / sample_rate
+            amplitude = 8000 if is_speech else 20
+            parts.append((amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.int16))
+        return np.concatenate(parts).tobytes()
+
+    def test_short_audio_is_one_segment(self):
+        from services.audio_segmentation import find_segments
+        pcm = self.make_pcm([(5, True)])
+        assert find_segments(pcm, 16000, max_seconds=45) == [(0, 80000)]
+
+    def test_cuts_land_in_silence(self):
+        from services.audio_segmentation import find_segments
+        # Speech with pauses at 20-21s and 50-51s
+        pcm = self.make_pcm([(20, True), (1, False), (29, True), (1, False), (19, True)])
+        segments = find_segments(pcm, 16000, max_seconds=45, min_seconds=15, overlap_seconds=0)
+
+        assert len(segments) == 3
+        assert segments[0][0] == 0 and segments[-1][1] == 70 * 16000
+        for (_, end), (start, _) in zip(segments, segments[1:]):
+            assert end == start
+        cuts = [end / 16000 for _, end in segments[:-1]]
+        assert 20 <= cuts[0] <= 21
+        assert 50 <= cuts[1] <= 51
+
+    def test_segments_never_exceed_max_length(self):
+        from services.audio_segmentation import find_segments
+        pcm = self.make_pcm([(130, True)])
+        segments = find_segments(pcm, 16000, max_seconds=45, min_seconds=15, overlap_seconds=0.5)
+
+        assert all(end - start <= 45 * 16000 for start, end in segments)
+        assert segments[-1][1] == 130 * 16000
+        for (_, end), (start, _) in zip(segments, segments[1:]):
+            assert end - start == 8000
+
+    def test_stitch_removes_overlap_duplicates(self):
+        from services.audio_segmentation import stitch_transcripts
+        text, offsets = stitch_transcripts(['the mitochondria is the', 'is the powerhouse of', '', 'the cell'])
+
+        assert text == 'the mitochondria is the powerhouse of the cell'
+        assert offsets[0] == 0
+        assert text[offsets[1]:].startswith('powerhouse')
+        assert text[offsets[3]:] == 'the cell'
+
+    def test_segments_are_recognised_and_stitched_in_order(self, monkeypatch):
+        import speech_recognition as sr
+        from config import Config
+        monkeypatch.setattr(Config, 'TRANSCRIBE_SEGMENT_SECONDS', 20)
+        monkeypatch.setattr(Config, 'TRANSCRIBE_OVERLAP_SECONDS', 0)
+
+        def fake_recognize(recognizer, audio):
+            seconds = len(audio.frame_data) / 32000
+            if seconds < 1:
+                raise sr.UnknownValueError()
+            return f"part of {round(seconds)} seconds"
+
+        monkeypatch.setattr(sr.Recognizer, 'recognize_google', fake_recognize)
+        pcm = self.make_pcm([(12, True), (1, False), (14, True), (1, False), (10, True)])
+        text, metadata = ContentProcessor()._transcribe_segments(pcm)
+
+        assert text.startswith('part of 1')
+        assert metadata['transcription_source'] == 'google'
+        assert [s['start'] for s in metadata['segments']] == sorted(s['start'] for s in metadata['segments'])
+        for segment in metadata['segments']:
+            assert text[segment['text_offset']:].startswith('part of')
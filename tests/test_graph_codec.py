@@ -0,0 +1,58 @@
+import json
+from utils.graph_codec import encode_graph, decode_graph, COLUMNAR_FORMAT
+
+def make_graph():
+    return {
+        'nodes': [
+            {'id': '0', 'name': 'Cells', 'type': 'main_topic', 'level': 0, 'size': 50, 'color': '#1e3a8a',
+             'complexity': 'intermediate'},
+            {'id': '1', 'name': 'Mitosis', 'type': 'concept', 'level': 1, 'size': 35, 'color': '#3b82f6',
+             'importance': 'high', 'prerequisites': [], 'examples': ['Skin cells'], 'applications': []},
+            {'id': '2', 'name': 'Meiosis', 'type': 'concept', 'level': 1, 'size': 28, 'color': '#3b82f6',
+             'importance': 'medium', 'prerequisites': ['Mitosis'], 'examples': [], 'applications': []}
+        ],
+        'links': [
+            {'source': '0', 'target': '1', 'value': 3, 'type': 'hierarchy'},
+            {'source': '0', 'target': '2', 'value': 3, 'type': 'hierarchy'},
+            {'source': '1', 'target': '2', 'value': 2, 'type': 'related', 'description': 'Both divide cells'}
+        ],
+        'learning_path': ['Mitosis', 'Meiosis'],
+        'metadata': {'total_concepts': 3}
+    }
+
+class TestGraphCodec:
+    """Test the columnar graph encoding"""
+
+    def test_round_trip(self):
+        graph = make_graph()
+        encoded = encode_graph(graph)
+        assert encoded['format'] == COLUMNAR_FORMAT
+        assert decode_graph(json.loads(json.dumps(encoded))) == graph
+
+    def test_layout(self):
+        encoded = encode_graph(make_graph())
+        # Row-number ids and link endpoints are implicit / integer indexes
+        assert 'ids' not in encoded['nodes']
+        assert encoded['links']['source'] == [0, 0, 1]
+        assert encoded['links']['target'] == [1, 2, 2]
+        # Repeated strings are stored once
+        assert encoded['dictionaries']['color'] == ['#1e3a8a', '#3b82f6']
+        assert encoded['nodes']['columns']['color'] == [0, 1, 1]
+        assert encoded['dictionaries']['type'] == ['main_topic', 'concept', 'hierarchy', 'related']
+        assert encoded['links']['columns']['description'] == [None, None, 'Both divide cells']
+
+    def test_custom_ids_and_dangling_links(self):
+        graph = {
+            'nodes': [{'id': 'a', 'name': 'A'}, {'id': 'b', 'name': 'B'}],
+            'links': [{'source': 'a', 'target': 'b', 'value': 1}, {'source': 'a', 'target': 'missing', 'value': 1}]
+        }
+        decoded = decode_graph(encode_graph(graph))
+        assert decoded['nodes'] == graph['nodes']
+        assert decoded['links'] == graph['links'][:1]
+
+    def test_smaller_than_verbose_json(self):
+        graph = make_graph()
+        graph['nodes'] *= 20
+        for i, node in enumerate(graph['nodes']):
+            graph['nodes'][i] = dict(node, id=str(i))
+        assert len(json.dumps(encode_graph(graph))) < len(json.dumps(graph))
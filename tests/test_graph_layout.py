@@ -0,0 +1,68 @@
+import copy
+import math
+from services.graph_layout import layout_graph, LAYOUT_VERSION
+
+def make_graph(children=12, grandchildren=3):
+    """Root with level-1 children, each with level-2 grandchildren"""
+    nodes = [{'id': '0', 'name': 'Root', 'level': 0, 'size': 50}]
+    links = []
+    for i in range(children):
+        child = str(len(nodes))
+        nodes.append({'id': child, 'name': f'Child {i}', 'level': 1, 'size': 28})
+        links.append({'source': '0', 'target': child, 'value': 3, 'type': 'hierarchy'})
+        for j in range(grandchildren):
+            grandchild = str(len(nodes))
+            nodes.append({'id': grandchild, 'name': f'Grandchild {i}.{j}', 'level': 2, 'size': 22})
+            links.append({'source': child, 'target': grandchild, 'value': 2, 'type': 'related'})
+    return {'nodes': nodes, 'links': links}
+
+def radius(node):
+    return math.hypot(node['x'], node['y'])
+
+class TestGraphLayout:
+    """Test the precomputed graph layout"""
+
+    def test_every_node_is_placed_deterministically(self):
+        first = layout_graph(make_graph())
+        second = layout_graph(make_graph())
+        assert first == second
+        assert first['layout']['version'] == LAYOUT_VERSION
+        assert all(isinstance(node['x'], float) and isinstance(node['y'], float) for node in first['nodes'])
+
+    def test_radial_rings_by_level(self):
+        graph = layout_graph(make_graph(), refine_iterations=0)
+        root, nodes = graph['nodes'][0], graph['nodes'][1:]
+        assert (root['x'], root['y']) == (0.0, 0.0)
+        inner = max(radius(node) for node in nodes if node['level'] == 1)
+        outer = min(radius(node) for node in nodes if node['level'] == 2)
+        assert inner < outer
+
+        # Grandchildren sit next to their parent
+        child, grandchild = graph['nodes'][1], graph['nodes'][2]
+        angle = lambda node: math.atan2(node['y'], node['x'])
+        assert abs(angle(child) - angle(grandchild)) < math.pi / 4
+
+    def test_refined_layout_has_no_overlaps(self):
+        graph = layout_graph(make_graph(children=30))
+        assert graph['layout']['refine_iterations'] > 0
+        nodes = graph['nodes']
+        for i, a in enumerate(nodes):
+            for b in nodes[i + 1:]:
+                assert math.hypot(a['x'] - b['x'], a['y'] - b['y']) >= a['size'] + b['size']
+
+    def test_large_graphs_skip_refinement(self):
+        graph = layout_graph(make_graph(), refine_max_nodes=10)
+        assert graph['layout']['refine_iterations'] == 0
+        assert graph == layout_graph(make_graph(), refine_iterations=0)
+
+    def test_missing_levels_and_dangling_links(self):
+        graph = {'nodes': [{'id': 'a'}, {'id': 'b', 'level': 'x'}], 'links': [{'source': 'a', 'target': 'gone'}]}
+        original = copy.deepcopy(graph)
+        layout_graph(graph)
+        assert [node['id'] for node in graph['nodes']] == [node['id'] for node in original['nodes']]
+        assert all('x' in node for node in graph['nodes'])
+
+    def test_empty_graph_is_marked_laid_out(self):
+        graph = layout_graph({'nodes': [], 'links': []})
+        assert graph['nodes'] == [] and graph['links'] == []
+        assert graph['layout']['version'] == LAYOUT_VERSION
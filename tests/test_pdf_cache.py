@@ -0,0 +1,50 @@
+import os
+import time
+from services.pdf_cache import PDFCache
+
+class TestPDFCache:
+    """Test the content-addressed rendered PDF store"""
+
+    def test_key_depends_on_data_and_template(self):
+        """Different payloads or template versions must not share a render"""
+        base = PDFCache.make_key('summary', 'Title', {'main_topic': 'A'}, 1)
+        assert base == PDFCache.make_key('summary', 'Title', {'main_topic': 'A'}, 1)
+        assert base != PDFCache.make_key('summary', 'Title', {'main_topic': 'B'}, 1)
+        assert base != PDFCache.make_key('summary', 'Title', {'main_topic': 'A'}, 2)
+        assert base != PDFCache.make_key('notes', 'Title', {'main_topic': 'A'}, 1)
+
+    def test_put_and_open(self, tmp_path):
+        cache = PDFCache(str(tmp_path))
+        assert cache.open('abc') is None
+
+        with cache.put('abc', b'%PDF-1.4 data') as f:
+            assert f.read() == b'%PDF-1.4 data'
+        with cache.open('abc') as f:
+            assert f.read() == b'%PDF-1.4 data'
+
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['total_bytes'] == 13
+
+    def test_least_recently_used_is_evicted(self, tmp_path):
+        cache = PDFCache(str(tmp_path), max_bytes=250)
+        cache.put('a', b'a' * 100).close()
+        cache.put('b', b'b' * 100).close()
+
+        # Make 'a' the most recently used
+        past = time.time() - 60
+        os.utime(tmp_path / 'b.pdf', (past, past))
+        os.utime(tmp_path / 'a.pdf', (past - 60, past - 60))
+        cache.open('a').close()
+
+        cache.put('c', b'c' * 100).close()
+
+        assert cache.open('b') is None
+        assert cache.open('a') is not None
+        assert cache.stats()['evictions'] == 1
+        assert cache.stats()['total_bytes'] == 200
+
+    def test_existing_files_count_towards_limit(self, tmp_path):
+        PDFCache(str(tmp_path)).put('old', b'x' * 300).close()
+        assert PDFCache(str(tmp_path)).stats()['total_bytes'] == 300
@@ -0,0 +1,77 @@
+import threading
+import time
+import pytest
+from services.pdf_render_service import PDFRenderService
+
+SUMMARY = {'main_topic': 'Refraction', 'key_points': ['Light bends'], 'concepts': {}, 'conclusion': 'Done'}
+
+class TestPDFRenderService:
+    """Test rendering PDFs in worker processes"""
+
+    def test_in_process_render(self):
+        service = PDFRenderService(workers=0)
+        pdf_bytes = service.render('summary', {'title': 'Optics'}, SUMMARY)
+
+        assert pdf_bytes.startswith(b'%PDF')
+        stats = service.stats()
+        assert stats['renders'] == 1
+        assert stats['render_seconds']['summary']['count'] == 1
+
+    def test_render_to_file(self, tmp_path):
+        """Worker processes write the PDF to the given path instead of returning it"""
+        service = PDFRenderService(workers=1, timeout=30)
+        try:
+            output_path = tmp_path / 'summary.pdf'
+            assert service.render('summary', {'title': 'Optics'}, SUMMARY, output_path=str(output_path)) is None
+            assert output_path.read_bytes().startswith(b'%PDF')
+        finally:
+            service.shutdown()
+
+    def test_large_output_spills_to_disk(self, monkeypatch):
+        """The default output buffer rolls over from memory to a temporary file above the threshold"""
+        from config import Config
+        from services.pdf_generator import PDFGenerator
+        monkeypatch.setattr(Config, 'PDF_SPOOL_MAX_BYTES', 100)
+
+        with PDFGenerator().generate_summary_pdf({'title': 'Optics'}, SUMMARY) as output:
+            assert output._rolled
+            assert output.read(4) == b'%PDF'
+
+    def test_pool_render_and_timeout_recovery(self):
+        service = PDFRenderService(workers=1, timeout=30)
+        try:
+            service.warm()
+            assert service.render('summary', {'title': 'Optics'}, SUMMARY).startswith(b'%PDF')
+
+            service.timeout = 0.0001
+            with pytest.raises(TimeoutError):
+                service.render('summary', {'title': 'Optics'}, SUMMARY)
+
+            # The hung pool is replaced and later renders still work
+            service.timeout = 30
+            assert service.render('summary', {'title': 'Optics'}, SUMMARY).startswith(b'%PDF')
+
+            stats = service.stats()
+            assert stats['timeouts'] == 1
+            assert stats['pool_restarts'] == 1
+            assert stats['renders'] == 3
+            assert stats['in_flight'] == 0
+            assert sum(stats['render_seconds']['summary']['buckets'].values()) == 3
+        finally:
+            service.shutdown()
+
+    def test_waiting_for_a_worker_does_not_count_toward_timeout(self):
+        service = PDFRenderService(workers=1, timeout=2)
+        try:
+            service.warm()
+            # Occupy the only worker slot for longer than the timeout
+            service._slots.acquire()
+            release = threading.Timer(2.5, service._slots.release)
+            release.start()
+
+            start = time.perf_counter()
+            assert service.render('summary', {'title': 'Optics'}, SUMMARY).startswith(b'%PDF')
+            assert time.perf_counter() - start >= 2.5
+            assert service.stats()['timeouts'] == 0
+        finally:
+            service.shutdown()
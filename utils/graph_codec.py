@@ -0,0 +1,95 @@
+"""Compact columnar encoding of graph payloads ({'nodes': [...], 'links': [...], ...})
+
+Nodes become an integer-indexed table of parallel columns, link endpoints become node
+indexes, and low-cardinality string fields are replaced by indexes into shared
+dictionaries. A value of None in a column means the record did not have that field.
+"""
+
+COLUMNAR_FORMAT = 'columnar-v1'
+COLUMNAR_MIMETYPE = 'application/vnd.studysahayak.graph+json'
+
+# Fields with few distinct values, stored once in 'dictionaries'
+INTERNED_FIELDS = ('type', 'color', 'importance', 'complexity')
+
+def _field_names(records, exclude):
+    """Every field used by any record, in first-seen order"""
+    names = {}
+    for record in records:
+        for name in record:
+            if name not in exclude:
+                names.setdefault(name, None)
+    return list(names)
+
+def _encode_columns(records, fields, dictionaries):
+    columns = {}
+    for field in fields:
+        values = [record.get(field) for record in records]
+        if field in INTERNED_FIELDS:
+            table = dictionaries.setdefault(field, {})
+            values = [None if value is None else table.setdefault(value, len(table)) for value in values]
+        columns[field] = values
+    return columns
+
+def _decode_columns(count, columns, dictionaries):
+    records = [{} for _ in range(count)]
+    for field, values in columns.items():
+        table = dictionaries.get(field) if field in INTERNED_FIELDS else None
+        for record, value in zip(records, values):
+            if value is not None:
+                record[field] = table[value] if table is not None else value
+    return records
+
+def encode_graph(graph):
+    """Columnar form of a graph payload; other top-level keys are passed through unchanged"""
+    nodes = graph.get('nodes', [])
+    index = {node.get('id'): i for i, node in enumerate(nodes)}
+    # Links to unknown nodes cannot be drawn, so they are not sent
+    links = [link for link in graph.get('links', [])
+             if link.get('source') in index and link.get('target') in index]
+    dictionaries = {}
+
+    encoded_nodes = {
+        'count': len(nodes),
+        'columns': _encode_columns(nodes, _field_names(nodes, ('id',)), dictionaries)
+    }
+    ids = [node.get('id') for node in nodes]
+    if ids != [str(i) for i in range(len(nodes))]:
+        # Only sent when ids are not simply the row numbers
+        encoded_nodes['ids'] = ids
+
+    encoded_links = {
+        'count': len(links),
+        'source': [index[link['source']] for link in links],
+        'target': [index[link['target']] for link in links],
+        'columns': _encode_columns(links, _field_names(links, ('source', 'target')), dictionaries)
+    }
+
+    encoded = {key: value for key, value in graph.items() if key not in ('nodes', 'links')}
+    encoded.update({
+        'format': COLUMNAR_FORMAT,
+        'nodes': encoded_nodes,
+        'links': encoded_links,
+        'dictionaries': {field: list(table) for field, table in dictionaries.items()}
+    })
+    return encoded
+
+def decode_graph(encoded):
+    """Inverse of encode_graph (mirrors decodeGraph in graph_content.html)"""
+    dictionaries = encoded.get('dictionaries', {})
+    encoded_nodes = encoded['nodes']
+    encoded_links = encoded['links']
+
+    nodes = _decode_columns(encoded_nodes['count'], encoded_nodes['columns'], dictionaries)
+    ids = encoded_nodes.get('ids') or [str(i) for i in range(len(nodes))]
+    for node, node_id in zip(nodes, ids):
+        node['id'] = node_id
+
+    links = _decode_columns(encoded_links['count'], encoded_links['columns'], dictionaries)
+    for link, source, target in zip(links, encoded_links['source'], encoded_links['target']):
+        link['source'] = ids[source]
+        link['target'] = ids[target]
+
+    graph = {key: value for key, value in encoded.items() if key not in ('format', 'nodes', 'links', 'dictionaries')}
+    graph['nodes'] = nodes
+    graph['links'] = links
+    return graph
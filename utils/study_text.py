@@ -0,0 +1,66 @@
+import hashlib
+import json
+
+def decode_content(content, schema_version=None):
+    """Structured content as a dict; plain text stays a string
+
+    Only legacy rows (no schema_version) can hold structure as a JSON string, so the
+    JSON parse is skipped for anything newer.
+    """
+    if isinstance(content, str) and schema_version is None:
+        try:
+            parsed = json.loads(content)
+        except json.JSONDecodeError:
+            return content
+        return parsed if isinstance(parsed, dict) else content
+    return content
+
+def extract_text_from_content(content_data, schema_version=None):
+    """Extract raw text from content data (handles both structured and raw text)"""
+    parsed_content = decode_content(content_data, schema_version)
+    if isinstance(parsed_content, dict):
+        # If it's structured content, extract text from various sections
+        text_parts = []
+        
+        # Add executive summary
+        if 'executive_summary' in parsed_content:
+            text_parts.append(parsed_content['executive_summary'])
+        
+        # Add introduction
+        if 'introduction' in parsed_content:
+            text_parts.append(parsed_content['introduction'])
+        
+        # Add main sections content
+        if 'main_sections' in parsed_content:
+            for section in parsed_content['main_sections']:
+                if 'content' in section:
+                    text_parts.append(section['content'])
+        
+        # Add conclusion
+        if 'conclusion' in parsed_content:
+            text_parts.append(parsed_content['conclusion'])
+        
+        # If we extracted parts, join them
+        if text_parts:
+            return ' '.join(text_parts)
+        
+        # If it's just a simple structure with 'content' field
+        if 'content' in parsed_content:
+            return parsed_content['content']
+        
+        # If none of the above, return the structure as a JSON string
+        return json.dumps(parsed_content)
+    elif isinstance(parsed_content, str):
+        return parsed_content
+    else:
+        # If it's neither structured nor text, convert to string
+        return str(parsed_content)
+
+def build_study_text(content_data, schema_version=None):
+    """Flattened study text with its word count and hash, stored alongside the content at ingest"""
+    text = extract_text_from_content(content_data, schema_version)
+    return {
+        'text': text,
+        'word_count': len(text.split()),
+        'hash': hashlib.sha256(text.encode('utf-8')).hexdigest()
+    }